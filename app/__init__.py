@@ -1,6 +1,4 @@
 from flask import Flask
-from app.models import User
-from app.users.routes import users_bp
 from config import Config
 from app.extensions import db, login_manager, migrate
 
@@ -13,13 +11,20 @@ def create_app(config_class=Config):
     login_manager.init_app(app)
     migrate.init_app(app, db)
 
+    from app import counters, ingest, ledger, notify, passwords, throttle
+    counters.init_app(app)
+    ingest.init_app(app)
+    ledger.init_app(app)
+    notify.init_app(app)
+    passwords.init_app(app)
+    throttle.init_app(app)
+
     login_manager.login_view = 'auth.login'
     login_manager.login_message_category = "warning"
 
-    # 🔑 USER LOADER (THIS FIXES YOUR ERROR)
-    @login_manager.user_loader
-    def load_user(user_id):
-        return User.query.get(int(user_id))
+    # 🔑 USER LOADER: one joined query, then cached (see app/identity.py)
+    from app import identity
+    identity.init_app(app)
 
     # Register Blueprints
     from app.auth.routes import auth_bp
@@ -32,5 +37,8 @@ def create_app(config_class=Config):
     app.register_blueprint(users_bp, url_prefix='/users')
     # app.register_blueprint(users_bp, url_prefix='/users')
 
+    from app import assets
+    assets.init_app(app)
+
     return app
 
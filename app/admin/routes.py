@@ -1,12 +1,22 @@
 # app/admin/routes.py
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify, abort
 from flask_login import login_required, current_user
 from app.models import (
     Application, Course, User, ContactMessage, StudentProfile,
-    Department, Notice, Payment, Exam, ExamResult, Enrollment, NoticeCategory
+    Department, Notice, Exam, Enrollment, NoticeCategory
 )
 from app.extensions import db
-from sqlalchemy import func, or_
+from app import exports, ingest, passwords, throttle
+from app.admin.services import (
+    KINDS as INBOX_KINDS, STATUSES as INBOX_STATUSES,
+    STUDENT_SORTS, StaleSheet, dashboard_stats, inbox_counts, inbox_page, inbox_search, invalidate_stats,
+    marks_sheet, parse_inbox_cursor, parse_marks, parse_marks_cursor, parse_student_cursor, save_marks, student_page,
+)
+from app.pagination import parse_limit
+from app.search import search_students
+from app.student_import import RosterError, import_students
+from app.catalog import get_catalog, rebuild as rebuild_catalog
+from app.ledger import ZERO, get_balance
 from datetime import datetime
 from sqlalchemy.orm import joinedload
 
@@ -25,20 +35,10 @@ def admin_guard():
 def dashboard():
     if not current_user.is_admin: return admin_guard()
     try:
-        stats = {
-            "total_apps": db.session.query(func.count(Application.id)).scalar() or 0,
-            "new_apps": db.session.query(func.count(Application.id)).filter(Application.status == "new").scalar() or 0,
-            "total_contacts": db.session.query(func.count(ContactMessage.id)).scalar() or 0,
-            "unread_contacts": db.session.query(func.count(ContactMessage.id)).filter(
-                ContactMessage.is_read == False).scalar() or 0,
-            "pending_users": db.session.query(func.count(User.id)).filter(User.is_active == False,
-                                                                          User.is_admin == False).scalar() or 0,
-            "total_users": db.session.query(func.count(User.id)).scalar() or 0,
-            "courses": db.session.query(func.count(Course.id)).scalar() or 0,
-            "students": db.session.query(func.count(StudentProfile.id)).scalar() or 0,
-
-        }
+        stats = dashboard_stats()
     except Exception:
+        db.session.rollback()
+        current_app.logger.exception("Dashboard stats failed")
         stats = {k: 0 for k in
                  ["total_apps", "new_apps", "total_contacts", "unread_contacts", "pending_users", "total_users",
                   "courses", "students", "faculty"]}
@@ -52,68 +52,64 @@ def dashboard():
                            recent_contacts=recent_contacts, recent_users=recent_users)
 
 
+@admin_bp.route("/api/stats")
+@login_required
+def api_stats():
+    """Dashboard counters as JSON, so the page can refresh them without re-rendering"""
+    if not current_user.is_admin: return jsonify({"status": "error"}), 403
+    return jsonify({"status": "ok", "stats": dashboard_stats()})
+
+
 
 # --------------------
 # APPLICATIONS & CONTACTS (Unified)
 # --------------------
+def _inbox_args():
+    """(kind, status, q, cursor, limit) from the query string; raises ValueError on a bad cursor."""
+    kind = request.args.get("type")
+    status = request.args.get("status")
+    cursor = request.args.get("cursor")
+    return (
+        kind if kind in INBOX_KINDS else None,
+        status if status in INBOX_STATUSES else None,
+        request.args.get("q", "").strip(),
+        parse_inbox_cursor(cursor) if cursor else None,
+        parse_limit(request.args.get("limit"), default=25, maximum=100),
+    )
+
+
 @admin_bp.route("/apps")
 @login_required
 def apps_page():
     if not current_user.is_admin: return admin_guard()
 
-    # Combined list logic
-    apps = Application.query.order_by(Application.created_at.desc()).limit(50).all()
-    contacts = ContactMessage.query.order_by(ContactMessage.created_at.desc()).limit(50).all()
-
-    combined = []
-    for a in apps:
-        combined.append({
-            "id": f"app-{a.id}", "type": "application", "pk": a.id,
-            "name": a.name, "email": a.email, "summary": a.short_message(140),
-            "status": a.status, "created_at": a.created_at,"phone": a.phone,
-        })
-    for c in contacts:
-        combined.append({
-            "id": f"contact-{c.id}", "type": "contact", "pk": c.id,
-            "name": c.name, "email": c.email,
-            "summary": (c.message[:140] + "…") if c.message else "",
-            "status": ("read" if c.is_read else "new"), "created_at": c.created_at
-        })
-
-    combined = sorted(combined, key=lambda r: r["created_at"] or datetime.min, reverse=True)
-    return render_template("admin/apps.html", items=combined)
+    # first page only; apps.js pages on through /admin/api/apps with the cursor
+    items, next_cursor = inbox_page(limit=25)
+    return render_template("admin/apps.html", items=items, next_cursor=next_cursor, counts=inbox_counts())
 
 
 # --- APIs for Apps.js ---
 @admin_bp.route("/api/apps")
 @login_required
 def api_apps():
+    """
+    Unified inbox page. Query args: type (application|contact), status (new|handled),
+    limit (default 25, max 100), cursor (from the previous page's next_cursor).
+    With q (name/email/phone search) the best matches come back ranked, without a cursor.
+    """
     if not current_user.is_admin: return jsonify({"status": "error"}), 403
-    q = request.args.get("q", "").strip()
-    limit = 80
-
-    apps_q = Application.query
-    contacts_q = ContactMessage.query
+    try:
+        kind, status, q, cursor, limit = _inbox_args()
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid cursor"}), 400
 
     if q:
-        term = f"%{q}%"
-        apps_q = apps_q.filter(or_(Application.name.ilike(term), Application.email.ilike(term)))
-        contacts_q = contacts_q.filter(or_(ContactMessage.name.ilike(term), ContactMessage.email.ilike(term)))
-
-    apps = apps_q.order_by(Application.created_at.desc()).limit(limit).all()
-    contacts = contacts_q.order_by(ContactMessage.created_at.desc()).limit(limit).all()
-
-    out = []
-    for a in apps:
-        out.append(
-            {"id": f"app-{a.id}", "type": "application", "name": a.name, "email": a.email, "summary": a.short_message(),
-             "status": a.status, "created_at": a.created_at.isoformat()})
-    for c in contacts:
-        out.append(
-            {"id": f"contact-{c.id}", "type": "contact", "name": c.name, "email": c.email, "summary": c.message[:100],
-             "status": "read" if c.is_read else "new", "created_at": c.created_at.isoformat()})
-
-    return jsonify({"status": "ok", "items": sorted(out, key=lambda x: x['created_at'], reverse=True)})
+        items, next_cursor = inbox_search(q, kind, status, limit), None
+    else:
+        items, next_cursor = inbox_page(kind, status, cursor, limit)
+    for it in items:
+        it["created_at"] = it["created_at"].isoformat() if it["created_at"] else None
+    return jsonify({"status": "ok", "items": items, "next_cursor": next_cursor, "counts": inbox_counts()})
 
 
 @admin_bp.route("/api/apps/<string:item_id>")
@@ -173,6 +169,30 @@ def api_delete_app(item_id):
     return jsonify({"status": "ok"})
 
 
+@admin_bp.route("/api/ingest/metrics")
+@login_required
+def api_ingest_metrics():
+    """Write-behind queue health for /apply and /contact submissions"""
+    if not current_user.is_admin: return jsonify({"status": "error"}), 403
+    return jsonify({"status": "ok", "metrics": ingest.metrics()})
+
+
+@admin_bp.route("/api/admission/metrics")
+@login_required
+def api_admission_metrics():
+    """Per-endpoint admission control counters (admitted / rejected / in flight)"""
+    if not current_user.is_admin: return jsonify({"status": "error"}), 403
+    return jsonify({"status": "ok", "metrics": throttle.metrics()})
+
+
+@admin_bp.route("/api/passwords/metrics")
+@login_required
+def api_password_metrics():
+    """Password hashing pool counters and latency"""
+    if not current_user.is_admin: return jsonify({"status": "error"}), 403
+    return jsonify({"status": "ok", "metrics": passwords.metrics()})
+
+
 # --------------------------
 # Pending Enrollments (AJAX)
 # --------------------------
@@ -222,6 +242,7 @@ def api_course_create():
         )
         db.session.add(c)
         db.session.commit()
+        rebuild_catalog()
 
         # Return the new row data for the frontend
         return jsonify({
@@ -268,6 +289,7 @@ def api_course_manage(course_id):
             c.department_id = data.get("department_id") or None
             c.description = data.get("description")
             db.session.commit()
+            rebuild_catalog()
 
             return jsonify({
                 "status": "success",
@@ -285,6 +307,7 @@ def api_course_manage(course_id):
         try:
             db.session.delete(c)
             db.session.commit()
+            rebuild_catalog()
             return jsonify({"status": "success", "id": course_id})
         except Exception as e:
             return jsonify(
@@ -401,68 +424,108 @@ def students_page():
     return render_template("admin/students.html", courses=courses)
 
 
+@admin_bp.route("/students/import")
+@login_required
+def students_import_page():
+    if not current_user.is_admin: return admin_guard()
+    return render_template("admin/students_import.html")
+
+
+@admin_bp.route("/api/students/import", methods=["POST"])
+@login_required
+def api_students_import():
+    """
+    Bulk-create students from an uploaded CSV/XLSX roster; returns a per-row report.
+    """
+    if not current_user.is_admin: return jsonify({"status": "error"}), 403
+
+    upload = request.files.get("file")
+    if not upload or not upload.filename:
+        return jsonify({"status": "error", "message": "Choose a file to import."}), 400
+    try:
+        result = import_students(upload.stream, upload.filename)
+    except RosterError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("Student import failed")
+        return jsonify({"status": "error", "message": "Import failed; rows committed before the error were kept."}), 500
+    finally:
+        invalidate_stats()  # bulk inserts don't fire the commit hooks
+    return jsonify({"status": "success", **result})
+
+
 @admin_bp.route("/api/students")
 @login_required
 def api_students_list():
     """
-    AJAX Endpoint for filtering and listing students.
+    AJAX Endpoint for filtering and listing students, one page at a time.
+    Query args: q, course_id, fee_status (paid|pending), sort (admission_no|name|newest|balance),
+    limit (default 50, max 200), cursor (from the previous page's next_cursor).
     """
     if not current_user.is_admin: return jsonify({"status": "error"}), 403
 
     # Filters
     search_q = request.args.get("q", "").strip()
-    course_id = request.args.get("course_id")
+    course_id = request.args.get("course_id", type=int)
     fee_status = request.args.get("fee_status")  # 'paid', 'pending'
+    sort = request.args.get("sort")
+    sort = sort if sort in STUDENT_SORTS else "admission_no"
+    limit = parse_limit(request.args.get("limit"), default=50, maximum=200)
+    try:
+        cursor = request.args.get("cursor")
+        cursor = parse_student_cursor(cursor, sort) if cursor else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid cursor"}), 400
 
-    # Base Query
-    query = StudentProfile.query.join(User).options(
-        joinedload(StudentProfile.user),
-        joinedload(StudentProfile.enrollments).joinedload(Enrollment.course),
-        joinedload(StudentProfile.payments)
-    )
-
-    # Apply Search (Name, Email, Admission No)
-    if search_q:
-        term = f"%{search_q}%"
-        query = query.filter(
-            (User.first_name.ilike(term)) |
-            (User.last_name.ilike(term)) |
-            (User.email.ilike(term)) |
-            (StudentProfile.admission_no.ilike(term))
-        )
-
-    # Apply Course Filter
-    if course_id:
-        query = query.join(Enrollment).filter(Enrollment.course_id == course_id)
+    # Search (Name, Email, Admission No) goes through the trigram index, best matches first
+    search_ids = [doc_id for _score, doc_id in search_students(search_q, limit=200)] if search_q else None
 
-    # Fetch all (for fee filtering in Python - easier for complex logic)
-    students = query.all()
+    rows, next_cursor, total = student_page(search_ids, course_id, fee_status, sort, cursor, limit)
 
     data = []
-    for s in students:
-        # Calculate Fees
-        total_fee = sum(e.course.fee for e in s.enrollments)
-        total_paid = sum(p.amount for p in s.payments)
-        balance = float(total_fee) - float(total_paid)
-
+    for s, ledger in rows:
+        balance = ledger.balance if ledger else ZERO
         is_paid = balance <= 0
 
-        # Apply Fee Filter
-        if fee_status == "paid" and not is_paid: continue
-        if fee_status == "pending" and is_paid: continue
-
         data.append({
             "id": s.id,
             "admission_no": s.admission_no,
             "name": s.user.full_name(),
             "email": s.user.email,
-            "courses_count": len(s.enrollments),
+            "courses_count": ledger.courses if ledger else 0,
             "fee_status": "Paid" if is_paid else f"Due: ${balance:.2f}",
             "is_paid": is_paid,
             "is_active": s.user.is_active
         })
 
-    return jsonify({"status": "success", "students": data})
+    return jsonify({"status": "success", "students": data, "total": total, "next_cursor": next_cursor})
+
+
+@admin_bp.route("/exports/departments/<int:department_id>/<kind>.<fmt>")
+@login_required
+def export_department(department_id, kind, fmt):
+    """Fee statements or transcripts for every student in a department, streamed."""
+    if not current_user.is_admin: return admin_guard()
+    if kind not in exports.KINDS or fmt not in exports.FORMATS:
+        abort(404)
+
+    dept = Department.query.get_or_404(department_id)
+    return exports.respond(kind, fmt, StudentProfile.department_id == dept.id,
+                           filename=f"{kind}-{dept.code}", subtitle=dept.name)
+
+
+@admin_bp.route("/exports/students/<int:student_id>/<kind>.<fmt>")
+@login_required
+def export_student(student_id, kind, fmt):
+    if not current_user.is_admin: return admin_guard()
+    if kind not in exports.KINDS or fmt not in exports.FORMATS:
+        abort(404)
+
+    s = StudentProfile.query.get_or_404(student_id)
+    return exports.respond(kind, fmt, StudentProfile.id == s.id,
+                           filename=f"{kind}-{s.admission_no}",
+                           subtitle=f"{s.user.full_name()} ({s.admission_no})")
 
 
 admin_bp.route("/api/students/<int:student_id>")
@@ -476,40 +539,35 @@ def api_student_detail(student_id):
 
     # 1. Academics
     enrollments_data = []
-    total_fee = 0.0
     for e in s.enrollments:
-        fee = float(e.course.fee)
-        total_fee += fee
         enrollments_data.append({
             "id": e.id,
             "course_title": e.course.title,
             "course_code": e.course.code,
-            "fee": fee,
+            "fee": float(e.course.fee),
             "enrolled_on": e.enrolled_on.strftime("%Y-%m-%d")
         })
 
     # 2. Payments
     payments_data = []
-    total_paid = 0.0
     for p in s.payments:
-        amt = float(p.amount)
-        total_paid += amt
         payments_data.append({
             "id": p.id,
-            "amount": amt,
+            "amount": float(p.amount),
             "date": p.paid_on.strftime("%Y-%m-%d"),
             "status": p.status
         })
 
-    # 3. FIX: Logic for Balance vs Credit
-    raw_balance = total_fee - total_paid
+    # 3. Balance vs Credit, from the fee ledger
+    ledger = get_balance(s.id)
+    raw_balance = ledger.balance
 
     if raw_balance > 0:
         balance_due = raw_balance
-        credit = 0.0
+        credit = ZERO
         status_label = "Pending"
     else:
-        balance_due = 0.0
+        balance_due = ZERO
         credit = abs(raw_balance)  # This is the "Extra" paid
         status_label = "Settled" if credit == 0 else "Overpaid"
 
@@ -530,10 +588,10 @@ def api_student_detail(student_id):
         },
         "academics": enrollments_data,
         "finance": {
-            "total_fee": total_fee,
-            "total_paid": total_paid,
-            "balance_due": balance_due,  # Now strictly >= 0
-            "credit": credit,  # Positive if overpaid
+            "total_fee": float(ledger.total_fee),
+            "total_paid": float(ledger.total_paid),
+            "balance_due": float(balance_due),  # Now strictly >= 0
+            "credit": float(credit),  # Positive if overpaid
             "status": status_label,
             "history": payments_data
         }
@@ -695,8 +753,8 @@ def enrollment_pending():
         joinedload(Enrollment.course)
     ).all()
 
-    # 3. Fetch all courses (for the 'Approve New Account' dropdown)
-    courses = Course.query.order_by(Course.code).all()
+    # 3. All courses (for the 'Approve New Account' dropdown), from the catalog snapshot
+    courses = get_catalog().code_order
 
     # DEBUG: Print to console to verify data is being fetched
     print(f"DEBUG: Found {len(pending_enrollments)} pending enrollments.")
@@ -743,11 +801,9 @@ def reject_enrollment(enrollment_id):
 def exams_page():
     if not current_user.is_admin: return admin_guard()
 
-    # Fetch all courses for the 'Create Exam' dropdown
-    courses = Course.query.order_by(Course.title).all()
-    departments = Department.query.order_by(Department.name).all()
-
-    return render_template("admin/exams.html", courses=courses, departments=departments)
+    # Courses for the 'Create Exam' dropdown come from the catalog snapshot
+    catalog = get_catalog()
+    return render_template("admin/exams.html", courses=catalog.courses, departments=catalog.departments)
 
 
 @admin_bp.route("/api/exams")
@@ -808,69 +864,47 @@ def api_exam_create():
 @admin_bp.route("/api/exams/<int:exam_id>/results", methods=["GET"])
 @login_required
 def api_exam_results(exam_id):
-    """Fetch students for marks entry"""
+    """Fetch students for marks entry (optionally paged with ?limit=&cursor=)"""
     if not current_user.is_admin: return jsonify({"status": "error"}), 403
 
     exam = Exam.query.get_or_404(exam_id)
 
-    # 1. Find all students enrolled in this Course
-    enrollments = Enrollment.query.filter_by(course_id=exam.course_id).options(joinedload(Enrollment.student)).all()
-
-    results_data = []
-    for enr in enrollments:
-        # 2. Check if mark already exists
-        res = ExamResult.query.filter_by(exam_id=exam.id, enrollment_id=enr.id).first()
-
-        # Get student user details
-        student_user = enr.student.user
-
-        results_data.append({
-            "enrollment_id": enr.id,
-            "admission_no": enr.student.admission_no,
-            "student_name": student_user.full_name(),
-            "marks_obtained": res.marks_obtained if res else "",
-            "remarks": res.remarks if res else ""
-        })
+    cursor = request.args.get("cursor")
+    limit = parse_limit(request.args.get("limit"), default=None, maximum=500)  # no limit: the whole sheet
+    try:
+        cursor = parse_marks_cursor(cursor) if cursor else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid cursor"}), 400
 
+    rows, next_cursor = marks_sheet(exam, cursor, limit)
     return jsonify({
         "status": "success",
         "exam": {"title": exam.name, "total_marks": exam.total_marks},
-        "students": results_data
+        "version": exam.results_version,
+        "students": rows,
+        "next_cursor": next_cursor,
     })
 
 
 @admin_bp.route("/api/exams/<int:exam_id>/results", methods=["POST"])
 @login_required
 def api_exam_results_save(exam_id):
-    """Save marks in bulk"""
+    """Save marks in bulk; 409 if the sheet's version is no longer current"""
     if not current_user.is_admin: return jsonify({"status": "error"}), 403
 
-    data = request.get_json()
-    rows = data.get("rows", [])
-
+    exam = Exam.query.get_or_404(exam_id)
     try:
-        for row in rows:
-            enrollment_id = row.get("enrollment_id")
-            marks = row.get("marks")
-
-            if not enrollment_id: continue
-
-            # Find or Create Result
-            res = ExamResult.query.filter_by(exam_id=exam_id, enrollment_id=enrollment_id).first()
-            if not res:
-                res = ExamResult(exam_id=exam_id, enrollment_id=enrollment_id)
-                db.session.add(res)
-
-            # Update values
-            if marks == "" or marks is None:
-                res.marks_obtained = None
-            else:
-                res.marks_obtained = float(marks)
-
-            res.remarks = row.get("remarks", "")
+        rows, version = parse_marks(request.get_json(silent=True), exam.total_marks)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
 
+    try:
+        version = save_marks(exam, rows, version)
         db.session.commit()
-        return jsonify({"status": "success", "message": "Results saved"})
+        return jsonify({"status": "success", "message": "Results saved", "version": version})
+    except StaleSheet as e:
+        return jsonify({"status": "conflict", "version": e.version,
+                        "message": "Marks were changed by someone else since this sheet was loaded."}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({"status": "error", "message": str(e)}), 500
@@ -0,0 +1,432 @@
+# app/admin/services.py
+"""
+Admin-side services that don't belong in the request handlers.
+
+Dashboard statistics
+--------------------
+``dashboard_stats`` computes every counter on the admin dashboard in one
+statement: one aggregate subquery per table (conditional counts for the
+"new"/"unread"/"pending" figures), cross-joined into a single row. The result
+is cached for ADMIN_STATS_CACHE_TTL seconds; commits that touch any of the
+counted models drop it, so the TTL only bounds staleness for writes made by
+other workers (or bulk SQL such as the student import).
+
+Inbox
+-----
+``inbox_page`` merges applications and contact messages with a UNION ALL
+ordered by (created_at, kind, id), newest first, and pages through it with an
+opaque keyset cursor. Each branch applies the cursor, the filters and its own
+LIMIT before the union, so it is an index range scan on
+``(created_at, id)`` / ``(status|is_read, created_at, id)`` and a page deep in
+last year's traffic costs the same as the first one. Searches go through
+``inbox_search``, ranked by the trigram index instead of LIKE '%term%'.
+
+Students directory
+------------------
+``student_page`` filters and sorts on the fee ledger in SQL and pages with a
+keyset cursor, returning one page plus the total number of matches.
+
+Marks entry
+-----------
+``marks_sheet`` returns the enrolled students of an exam's course with their
+existing marks in one outer-joined query, by admission number.
+``save_marks`` bumps ``Exam.results_version`` with a conditional UPDATE before
+writing, so a save made from a sheet older than the last save is refused.
+"""
+import math
+from datetime import datetime
+from decimal import Decimal
+
+from flask import current_app
+from sqlalchemy import and_, case, func, literal, null, select, true, union_all, update
+from sqlalchemy.orm import contains_eager
+
+from app.cache import TTLCache, on_commit
+from app.extensions import db
+from app.ledger import ZERO
+from app.models import (
+    Application, ContactMessage, Course, Enrollment, Exam, ExamResult, StudentBalance, StudentProfile, User,
+)
+from app.pagination import decode_cursor, encode_cursor, keyset_after
+from app.search import search_applications, search_contacts
+
+STATS_KEY = "dashboard"
+
+stats_cache = TTLCache(maxsize=1, ttl=15)
+
+
+def _counts():
+    apps = select(
+        func.count(Application.id).label("total_apps"),
+        func.count(case((Application.status == "new", 1))).label("new_apps"),
+    ).subquery()
+    contacts = select(
+        func.count(ContactMessage.id).label("total_contacts"),
+        func.count(case((ContactMessage.is_read == False, 1))).label("unread_contacts"),  # noqa: E712
+    ).subquery()
+    users = select(
+        func.count(User.id).label("total_users"),
+        func.count(case(((User.is_active == False) & (User.is_admin == False), 1))).label("pending_users"),  # noqa: E712
+    ).subquery()
+    courses = select(func.count(Course.id).label("courses")).subquery()
+    students = select(func.count(StudentProfile.id).label("students")).subquery()
+
+    # each subquery is a single aggregate row, so the cross join is one row too
+    joined = apps.join(contacts, true()).join(users, true()).join(courses, true()).join(students, true())
+    row = db.session.execute(
+        select(apps, contacts, users, courses, students).select_from(joined)
+    ).mappings().one()
+    return {key: int(value or 0) for key, value in row.items()}
+
+
+def dashboard_stats():
+    """{total_apps, new_apps, total_contacts, unread_contacts, total_users, pending_users, courses, students}"""
+    return stats_cache.get_or_set(
+        STATS_KEY, _counts, current_app.config.get("ADMIN_STATS_CACHE_TTL", stats_cache.ttl))
+
+
+def invalidate_stats():
+    stats_cache.clear()
+
+
+@on_commit(Application, ContactMessage, User, Course, StudentProfile)
+def _counted_rows_changed(keys):
+    invalidate_stats()
+
+
+# -------------------------
+# Inbox
+# -------------------------
+KINDS = ("application", "contact")
+STATUSES = ("new", "handled")
+SUMMARY_LENGTH = 140
+
+
+def _application_branch(status):
+    stmt = select(
+        literal("application").label("kind"), Application.id.label("pk"),
+        Application.name, Application.email, Application.phone,
+        func.substr(Application.message, 1, SUMMARY_LENGTH + 1).label("summary"),
+        Application.status.label("status"), Application.created_at,
+    )
+    if status == "new":
+        stmt = stmt.where(Application.status == "new")
+    elif status == "handled":
+        stmt = stmt.where(Application.status != "new")
+    return stmt, Application.created_at, Application.id
+
+
+def _contact_branch(status):
+    stmt = select(
+        literal("contact").label("kind"), ContactMessage.id.label("pk"),
+        ContactMessage.name, ContactMessage.email, null().label("phone"),
+        func.substr(ContactMessage.message, 1, SUMMARY_LENGTH + 1).label("summary"),
+        case((ContactMessage.is_read == True, "read"), else_="new").label("status"),  # noqa: E712
+        ContactMessage.created_at,
+    )
+    if status == "new":
+        stmt = stmt.where(ContactMessage.is_read == False)  # noqa: E712
+    elif status == "handled":
+        stmt = stmt.where(ContactMessage.is_read == True)  # noqa: E712
+    return stmt, ContactMessage.created_at, ContactMessage.id
+
+
+BRANCHES = {"application": _application_branch, "contact": _contact_branch}
+
+
+def _after(kind, created_at, pk, cursor):
+    """Rows of branch `kind` that come after `cursor` in (created_at, kind, id) DESC order."""
+    at, cursor_kind, cursor_pk = cursor
+    if kind < cursor_kind:
+        return created_at <= at
+    if kind > cursor_kind:
+        return created_at < at
+    return keyset_after((created_at, pk), (at, cursor_pk), descending=True)
+
+
+def parse_inbox_cursor(token):
+    """(created_at, kind, id) from an inbox cursor; raises ValueError if it is malformed."""
+    at, kind, pk = decode_cursor(token, 3)
+    if kind not in KINDS or not isinstance(pk, int) or not isinstance(at, str):
+        raise ValueError("Invalid cursor")
+    return datetime.fromisoformat(at), kind, pk
+
+
+def _item(row):
+    summary = row.summary or ""
+    if len(summary) > SUMMARY_LENGTH:
+        summary = summary[:SUMMARY_LENGTH] + "…"
+    prefix = "app" if row.kind == "application" else "contact"
+    return {
+        "id": f"{prefix}-{row.pk}", "type": row.kind, "pk": row.pk,
+        "name": row.name, "email": row.email, "phone": row.phone,
+        "summary": summary, "status": row.status, "created_at": row.created_at,
+    }
+
+
+def inbox_page(kind=None, status=None, cursor=None, limit=25):
+    """
+    One page of the unified inbox, newest first. Returns (items, next cursor or None).
+    `kind` limits it to "application" or "contact", `status` to "new" or "handled".
+    """
+    branches = []
+    for name in KINDS:
+        if kind and name != kind:
+            continue
+        stmt, created_at, pk = BRANCHES[name](status)
+        if cursor:
+            stmt = stmt.where(_after(name, created_at, pk, cursor))
+        # each branch is cut to the page size before the union
+        branches.append(select(stmt.order_by(created_at.desc(), pk.desc()).limit(limit + 1).subquery()))
+
+    merged = (union_all(*branches) if len(branches) > 1 else branches[0]).subquery()
+    rows = db.session.execute(
+        select(merged).order_by(merged.c.created_at.desc(), merged.c.kind.desc(), merged.c.pk.desc())
+        .limit(limit + 1)
+    ).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([last.created_at, last.kind, last.pk])
+    return [_item(r) for r in rows], next_cursor
+
+
+SEARCHERS = {"application": search_applications, "contact": search_contacts}
+
+
+def inbox_search(q, kind=None, status=None, limit=25):
+    """
+    Best matches for `q` by name/email (see app/search.py), best first, filtered
+    like inbox_page. Ranked results aren't paged.
+    """
+    hits = []
+    for name in KINDS:
+        if not kind or name == kind:
+            # over-fetch: the status filter below may drop some
+            hits += [(score, name, pk) for score, pk in SEARCHERS[name](q, limit * 4)]
+    hits.sort(reverse=True)
+
+    found = {}
+    for name in {name for _score, name, _pk in hits}:
+        stmt, _created_at, pk = BRANCHES[name](status)
+        ids = [doc_id for _score, n, doc_id in hits if n == name]
+        for row in db.session.execute(stmt.where(pk.in_(ids))):
+            found[(name, row.pk)] = row
+    return [_item(found[(name, pk)]) for _score, name, pk in hits if (name, pk) in found][:limit]
+
+
+def inbox_counts():
+    """Badge counts for the inbox filters, from the cached dashboard statistics."""
+    stats = dashboard_stats()
+    return {
+        "all": stats["total_apps"] + stats["total_contacts"],
+        "new": stats["new_apps"] + stats["unread_contacts"],
+        "application": stats["total_apps"], "application_new": stats["new_apps"],
+        "contact": stats["total_contacts"], "contact_new": stats["unread_contacts"],
+    }
+
+
+# -------------------------
+# Students directory
+# -------------------------
+_balance = func.coalesce(StudentBalance.balance, 0)
+
+# sort name -> (keyset columns, descending, cursor value parsers)
+STUDENT_SORTS = {
+    "admission_no": ((StudentProfile.admission_no, StudentProfile.id), False, (str, int)),
+    "name": ((User.first_name, StudentProfile.id), False, (str, int)),
+    "newest": ((StudentProfile.id,), True, (int,)),
+    "balance": ((_balance, StudentProfile.id), True, (Decimal, int)),  # largest dues first
+}
+
+
+def parse_student_cursor(token, sort):
+    """Cursor values for `sort`; raises ValueError if the cursor is malformed or from another sort."""
+    _columns, _descending, parsers = STUDENT_SORTS[sort]
+    values = decode_cursor(token, len(parsers))
+    try:
+        return [parse(v) for parse, v in zip(parsers, values)]
+    except (TypeError, ArithmeticError):
+        raise ValueError("Invalid cursor")
+
+
+def student_page(search_ids=None, course_id=None, fee_status=None, sort="admission_no", cursor=None, limit=50):
+    """
+    One page of (StudentProfile, StudentBalance or None) rows plus (next cursor, total matching).
+
+    Fees come from the ledger (app/ledger.py), so the fee filter and the balance
+    sort are plain indexed predicates. `search_ids` (ranked hits from the search
+    index) replaces sorting and paging: those rows come back in rank order.
+    """
+    query = (
+        db.session.query(StudentProfile, StudentBalance)
+        .join(User, User.id == StudentProfile.user_id)
+        .outerjoin(StudentBalance, StudentBalance.student_id == StudentProfile.id)
+        .options(contains_eager(StudentProfile.user))
+    )
+    if search_ids is not None:
+        query = query.filter(StudentProfile.id.in_(search_ids))
+    if course_id:
+        query = query.filter(StudentProfile.id.in_(
+            select(Enrollment.student_id).where(Enrollment.course_id == course_id)))
+    # a student without a ledger row owes nothing
+    if fee_status == "paid":
+        query = query.filter(_balance <= 0)
+    elif fee_status == "pending":
+        query = query.filter(StudentBalance.balance > 0)
+
+    total = query.with_entities(func.count(StudentProfile.id)).order_by(None).scalar() or 0
+
+    if search_ids is not None:
+        rank = {sid: i for i, sid in enumerate(search_ids)}
+        return sorted(query.all(), key=lambda r: rank[r[0].id]), None, total
+
+    columns, descending, _parsers = STUDENT_SORTS[sort]
+    if cursor:
+        query = query.filter(keyset_after(columns, cursor, descending=descending))
+    rows = query.order_by(*(c.desc() if descending else c for c in columns)).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        profile, ledger = rows[-1]
+        key = {
+            "admission_no": (profile.admission_no, profile.id),
+            "name": (profile.user.first_name, profile.id),
+            "newest": (profile.id,),
+            "balance": (str(ledger.balance if ledger else ZERO), profile.id),
+        }[sort]
+        next_cursor = encode_cursor(list(key))
+    return rows, next_cursor, total
+
+
+# -------------------------
+# Marks entry
+# -------------------------
+class StaleSheet(Exception):
+    """Marks were saved by someone else since the sheet was loaded."""
+
+    def __init__(self, version):
+        super().__init__("stale marks sheet")
+        self.version = version
+
+
+def marks_sheet(exam, cursor=None, limit=None):
+    """
+    Marks-entry rows for `exam`, by admission number, plus the next cursor (or None).
+    Without `limit` the whole course comes back in one go.
+    """
+    stmt = (
+        select(Enrollment.id, StudentProfile.admission_no, User.first_name, User.last_name,
+               ExamResult.marks_obtained, ExamResult.remarks)
+        .select_from(Enrollment)
+        .join(StudentProfile, StudentProfile.id == Enrollment.student_id)
+        .join(User, User.id == StudentProfile.user_id)
+        .outerjoin(ExamResult, and_(ExamResult.exam_id == exam.id, ExamResult.enrollment_id == Enrollment.id))
+        .where(Enrollment.course_id == exam.course_id)
+        .order_by(StudentProfile.admission_no)
+    )
+    if cursor:
+        stmt = stmt.where(StudentProfile.admission_no > cursor)
+    if limit:
+        stmt = stmt.limit(limit + 1)
+    rows = db.session.execute(stmt).all()
+
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1].admission_no])
+
+    return [{
+        "enrollment_id": r.id,
+        "admission_no": r.admission_no,
+        "student_name": f"{r.first_name} {r.last_name or ''}".strip(),
+        "marks_obtained": r.marks_obtained if r.marks_obtained is not None else "",
+        "remarks": r.remarks or "",
+    } for r in rows], next_cursor
+
+
+def parse_marks_cursor(token):
+    (admission_no,) = decode_cursor(token, 1)
+    if not isinstance(admission_no, str):
+        raise ValueError("Invalid cursor")
+    return admission_no
+
+
+def _whole(value, name):
+    """A non-negative int from a JSON number or digit string; bools and floats don't count."""
+    if isinstance(value, bool) or not isinstance(value, (int, str)) or not str(value).isdigit():
+        raise ValueError(f"{name} must be a whole number")
+    return int(value)
+
+
+def parse_marks(data, total_marks=None):
+    """
+    (rows, version) from a marks-save body {"rows": [{enrollment_id, marks, remarks}], "version"}.
+    Marks are blank or a number within 0..total_marks. Raises ValueError with a message for the client.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("rows", []), list):
+        raise ValueError("Expected {\"rows\": [...], \"version\": n}")
+    version = data.get("version")
+    version = _whole(version, "version") if version is not None else None
+
+    rows = []
+    for row in data.get("rows", []):
+        if not isinstance(row, dict):
+            raise ValueError("Each row must be an object")
+        marks = row.get("marks")
+        if marks in ("", None):
+            marks = None
+        else:
+            try:
+                marks = float(marks) if not isinstance(marks, bool) else None
+            except (TypeError, ValueError):
+                marks = None
+            if marks is None or not math.isfinite(marks):
+                raise ValueError("Marks must be a number")
+            if marks < 0 or (total_marks and marks > total_marks):
+                raise ValueError(f"Marks must be between 0 and {total_marks or 'the total'}")
+        remarks = row.get("remarks") or ""
+        if not isinstance(remarks, str):
+            raise ValueError("Remarks must be text")
+        rows.append({"enrollment_id": _whole(row.get("enrollment_id"), "enrollment_id"),
+                     "marks": marks, "remarks": remarks})
+    return rows, version
+
+
+def save_marks(exam, rows, version=None):
+    """
+    Upsert marks/remarks for `rows` (as returned by parse_marks) and return the
+    new results_version. Raises StaleSheet if `version` is given and no longer
+    current. The caller commits.
+    """
+    bump = update(Exam).where(Exam.id == exam.id)
+    if version is not None:
+        bump = bump.where(Exam.results_version == version)
+    # the row lock taken here also serializes concurrent saves of the same exam
+    if not db.session.execute(
+            bump.values(results_version=Exam.results_version + 1), execution_options={"synchronize_session": False}
+    ).rowcount:
+        db.session.rollback()
+        raise StaleSheet(db.session.get(Exam, exam.id).results_version)
+
+    ids = {r["enrollment_id"] for r in rows}
+    enrolled = set(db.session.execute(
+        select(Enrollment.id).where(Enrollment.id.in_(ids), Enrollment.course_id == exam.course_id)).scalars())
+    existing = {r.enrollment_id: r for r in db.session.execute(
+        select(ExamResult).where(ExamResult.exam_id == exam.id, ExamResult.enrollment_id.in_(enrolled))).scalars()}
+
+    for row in rows:
+        enrollment_id = row["enrollment_id"]
+        if enrollment_id not in enrolled:
+            continue
+        res = existing.get(enrollment_id)
+        if res is None:
+            res = existing[enrollment_id] = ExamResult(exam_id=exam.id, enrollment_id=enrollment_id)
+            db.session.add(res)
+        res.marks_obtained = row["marks"]
+        res.remarks = row["remarks"]
+
+    return db.session.execute(select(Exam.results_version).where(Exam.id == exam.id)).scalar_one()
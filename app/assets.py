@@ -0,0 +1,189 @@
+# app/assets.py
+"""
+Fingerprinted, pre-compressed static assets.
+
+``flask assets build`` copies every CSS/JS/image/font file under app/static to
+app/static/dist/ with a content hash in its name, writes a ``.gz`` next to each
+compressible file and records the mapping in dist/manifest.json:
+
+    {"css/public/index.css": "dist/css/public/index.3f2a9c1d7e.css", ...}
+
+Relative ``url(...)`` references in CSS are rewritten to the hashed files, so
+fonts and background images are fingerprinted too.
+
+At runtime ``url_for('static', filename=...)`` (and ``public.static``) resolves
+through the manifest, and anything under dist/ is sent with a one-year
+``immutable`` Cache-Control and the gzip variant when the client accepts it.
+Files missing from the manifest (uploaded avatars, a stale build) fall back to
+the original path and Flask's normal revalidating headers.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+
+import click
+from flask import current_app, request, send_from_directory
+from flask.cli import AppGroup
+
+DIST = "dist"
+MANIFEST = "manifest.json"
+ONE_YEAR = 31536000
+
+EXTENSIONS = {".css", ".js", ".svg", ".png", ".jpg", ".jpeg", ".gif", ".ico", ".webp",
+              ".woff", ".woff2", ".ttf", ".eot", ".otf"}
+COMPRESSIBLE = {".css", ".js", ".svg", ".ttf", ".eot", ".otf"}
+# runtime uploads change without a rebuild, so they are never fingerprinted
+SKIP_DIRS = {DIST, "images/avatars", "images/uploads"}
+
+CSS_URL_RE = re.compile(r"""url\(\s*(['"]?)([^'")]+?)\1\s*\)""")
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def _hashed_name(path, data):
+    stem, ext = posixpath.splitext(path)
+    return f"{DIST}/{stem}.{_digest(data)}{ext}"
+
+
+def _sources(static_folder):
+    for root, dirs, files in os.walk(static_folder):
+        rel_root = os.path.relpath(root, static_folder).replace(os.sep, "/")
+        rel_root = "" if rel_root == "." else rel_root
+        dirs[:] = sorted(d for d in dirs if posixpath.join(rel_root, d) not in SKIP_DIRS)
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in EXTENSIONS:
+                yield posixpath.join(rel_root, name)
+
+
+def _rewrite_css(css_path, text, manifest, static_url):
+    """Point relative url(...) references at their fingerprinted copies."""
+    base = posixpath.dirname(css_path)
+
+    def replace(m):
+        quote, ref = m.group(1), m.group(2).strip()
+        if ref.startswith(("data:", "http:", "https:", "//", "/", "#")):
+            return m.group(0)
+        path, sep, suffix = ref.partition("?")
+        if not sep:
+            path, sep, suffix = ref.partition("#")
+        target = manifest.get(posixpath.normpath(posixpath.join(base, path)))
+        if target is None:
+            return m.group(0)
+        return f"url({quote}{static_url}/{target}{sep}{suffix}{quote})"
+
+    return CSS_URL_RE.sub(replace, text)
+
+
+def build(static_folder, static_url="/static"):
+    """Write dist/ and its manifest; returns the manifest."""
+    dist = os.path.join(static_folder, DIST)
+    shutil.rmtree(dist, ignore_errors=True)
+
+    sources = list(_sources(static_folder))
+    # everything else first, so CSS can refer to the hashed fonts and images
+    sources.sort(key=lambda p: p.lower().endswith(".css"))
+
+    manifest = {}
+    for path in sources:
+        with open(os.path.join(static_folder, path), "rb") as f:
+            data = f.read()
+        if path.lower().endswith(".css"):
+            text = data.decode("utf-8", errors="surrogateescape")
+            data = _rewrite_css(path, text, manifest, static_url).encode("utf-8", errors="surrogateescape")
+
+        target = _hashed_name(path, data)
+        out = os.path.join(static_folder, *target.split("/"))
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        with open(out, "wb") as f:
+            f.write(data)
+
+        if os.path.splitext(path)[1].lower() in COMPRESSIBLE and len(data) > 1024:
+            packed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(packed) < len(data):
+                with open(out + ".gz", "wb") as f:
+                    f.write(packed)
+        manifest[path] = target
+
+    with open(os.path.join(dist, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+# -------------------------
+# Serving
+# -------------------------
+def _send_static(filename):
+    static_folder = current_app.static_folder
+    if not filename.startswith(DIST + "/"):
+        return current_app.send_static_file(filename)
+
+    gz = filename + ".gz"
+    if "gzip" in request.accept_encodings and os.path.isfile(os.path.join(static_folder, gz)):
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        resp = send_from_directory(static_folder, gz, mimetype=mimetype, max_age=ONE_YEAR)
+        resp.headers["Content-Encoding"] = "gzip"
+    else:
+        resp = send_from_directory(static_folder, filename, max_age=ONE_YEAR)
+    resp.vary.add("Accept-Encoding")
+    resp.cache_control.public = True
+    resp.cache_control.immutable = True
+    return resp
+
+
+def _url_defaults(endpoint, values):
+    if endpoint in ("static", "public.static"):
+        hashed = current_app.extensions["assets"].get(values.get("filename"))
+        if hashed:
+            values["filename"] = hashed
+
+
+# -------------------------
+# CLI
+# -------------------------
+assets_cli = AppGroup("assets", help="Build fingerprinted static assets.")
+
+
+@assets_cli.command("build")
+def build_command():
+    """Fingerprint and gzip app/static into app/static/dist."""
+    manifest = build(current_app.static_folder, current_app.static_url_path)
+    current_app.extensions["assets"] = manifest
+    click.echo(f"Built {len(manifest)} assets into {os.path.join(current_app.static_folder, DIST)}")
+
+
+@assets_cli.command("clean")
+def clean_command():
+    """Remove app/static/dist (URLs fall back to the unhashed files)."""
+    shutil.rmtree(os.path.join(current_app.static_folder, DIST), ignore_errors=True)
+    current_app.extensions["assets"] = {}
+    click.echo("Removed built assets")
+
+
+def init_app(app):
+    use_manifest = app.config.get("ASSETS_USE_MANIFEST")
+    if use_manifest is None:
+        # a stale build would hide CSS/JS edits while developing
+        use_manifest = not app.debug
+    app.extensions["assets"] = load_manifest(app.static_folder) if use_manifest else {}
+
+    # call after the blueprints are registered: public_bp serves the same folder
+    for endpoint in ("static", "public.static"):
+        if endpoint in app.view_functions:
+            app.view_functions[endpoint] = _send_static
+    app.url_defaults(_url_defaults)
+    app.cli.add_command(assets_cli)
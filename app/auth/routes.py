@@ -7,6 +7,8 @@ from . import auth_bp
 from app.auth.forms import LoginForm, RegisterForm
 from app.models import User
 from app.extensions import db
+from app.passwords import HasherBusy
+from app.throttle import admission_control
 
 
 def redirect_after_login(user):
@@ -18,6 +20,12 @@ def redirect_after_login(user):
     return redirect(url_for("users.dashboard"))
 
 
+def hasher_busy(template, form):
+    """Answer 503 when the password hashing pool is saturated, instead of queueing forever"""
+    flash("We're handling a lot of sign-ins right now. Please try again in a few seconds.", "warning")
+    return render_template(template, form=form), 503, {"Retry-After": "5"}
+
+
 @auth_bp.route("/login", methods=["GET", "POST"])
 def login():
     if current_user.is_authenticated:
@@ -30,7 +38,11 @@ def login():
         user = User.query.filter_by(email=email).first()
 
         # Check if user exists and password is correct
-        if not user or not user.check_password(form.password.data):
+        try:
+            valid = user is not None and user.check_password(form.password.data)
+        except HasherBusy:
+            return hasher_busy("auth/login.html", form)
+        if not valid:
             flash("Invalid email or password", "danger")
             return render_template("auth/login.html", form=form)
 
@@ -39,6 +51,14 @@ def login():
             flash("Your account is awaiting admin approval. Please wait for confirmation.", "warning")
             return render_template("auth/login.html", form=form)
 
+        # Upgrade hashes made with older parameters while we have the password
+        if user.password_needs_rehash():
+            try:
+                user.set_password(form.password.data)
+                db.session.commit()
+            except HasherBusy:
+                pass  # try again next login
+
         # Success
         login_user(user)
         flash("Logged in successfully", "success")
@@ -56,6 +76,7 @@ def login():
 
 
 @auth_bp.route("/register", methods=["GET", "POST"])
+@admission_control("auth.register")
 def register():
     if current_user.is_authenticated:
         return redirect_after_login(current_user)
@@ -79,7 +100,10 @@ def register():
             is_admin=False,
             is_active=False  # created as inactive / pending
         )
-        user.set_password(form.password.data)
+        try:
+            user.set_password(form.password.data)
+        except HasherBusy:
+            return hasher_busy("auth/register.html", form)
 
         db.session.add(user)
         db.session.commit()
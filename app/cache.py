@@ -0,0 +1,118 @@
+# app/cache.py
+"""
+In-process caching primitives.
+
+``TTLCache`` is a small thread-safe LRU whose entries also expire after ``ttl``
+seconds (the expiry bounds staleness when another worker did the write).
+
+``on_commit`` registers a callback that runs after a successful commit touched
+one of the given models, which is how caches get invalidated by writes:
+
+    @on_commit(Notice)
+    def _notices_changed(keys):
+        fragments.pop("notices")
+
+If ``key`` is given it is evaluated at flush time (while the instance is still
+loaded) and the callback receives the distinct keys in flush order; otherwise it
+gets ``[None]``.
+Callbacks run after the transaction is closed, so they must not query.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from itertools import chain
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+log = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize=256, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_set(self, key, factory, ttl=None):
+        """Return the cached value, building it with factory() on a miss."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value, ttl)
+        return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, _MISSING)
+        return default if item is _MISSING else item[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# -------------------------
+# Write-driven invalidation
+# -------------------------
+_hooks = []  # (models, key, callback)
+
+
+def on_commit(*models, key=None):
+    def decorator(fn):
+        _hooks.append((models, key, fn))
+        return fn
+    return decorator
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    if not _hooks:
+        return
+    pending = session.info.setdefault("commit_hooks", {})
+    for obj in chain(session.new, session.dirty, session.deleted):
+        for i, (models, key, _fn) in enumerate(_hooks):
+            if isinstance(obj, models):
+                pending.setdefault(i, {})[key(obj) if key else None] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _run_hooks(session):
+    pending = session.info.pop("commit_hooks", None)
+    for i, keys in (pending or {}).items():
+        try:
+            _hooks[i][2](list(keys))
+        except Exception:
+            log.exception("Commit hook %s failed", _hooks[i][2].__name__)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("commit_hooks", None)
@@ -0,0 +1,182 @@
+# app/catalog.py
+"""
+Immutable in-process snapshot of the academic catalog (departments + courses).
+
+The catalog changes a few times a term but is read on almost every page, so
+each worker keeps a read-only copy built from two queries and swaps in a new one
+when it changes:
+
+* admin course CRUD calls ``rebuild()`` right after its commit;
+* any other commit touching Course/Department marks the snapshot stale;
+* writes from other workers are picked up by comparing ``catalog_version``
+  (app/counters.py) at most every CATALOG_CHECK_SECONDS.
+
+Rows are NamedTuples (slotted, immutable) and every index is a read-only
+mapping, so readers never need a lock.
+"""
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime
+from decimal import Decimal
+from types import MappingProxyType
+from typing import NamedTuple, Optional
+
+from flask import current_app
+
+from app.cache import on_commit
+from app.counters import get_version, peek_version
+from app.models import Course, Department
+
+
+class DepartmentRow(NamedTuple):
+    id: int
+    code: str
+    name: str
+    description: Optional[str]
+
+
+class CourseRow(NamedTuple):
+    id: int
+    code: str
+    title: str
+    credits: int
+    fee: Decimal
+    description: Optional[str]
+    department_id: Optional[int]
+    department: Optional[DepartmentRow]
+
+
+def catalog_key(course):
+    """Public catalog order: (department_id, case-folded title, id)."""
+    return (course.department_id, course.title.casefold(), course.id)
+
+
+class CatalogSnapshot:
+    __slots__ = (
+        "version", "changed_at", "built_at",
+        "departments", "courses", "code_order", "catalog", "featured",
+        "by_id", "by_code", "by_department", "department_by_id", "ordinal",
+    )
+
+    def __init__(self, departments, courses, version=0, changed_at=None):
+        self.version = version
+        self.changed_at = changed_at
+        self.built_at = datetime.utcnow()
+
+        # names sort case-insensitively, roughly as the database's _ci collation would
+        self.departments = tuple(sorted(departments, key=lambda d: (d.name.casefold(), d.id)))
+        self.courses = tuple(sorted(courses, key=lambda c: (c.title.casefold(), c.id)))
+        self.code_order = tuple(sorted(courses, key=lambda c: c.code))
+        # only courses with a department appear in the public catalog
+        self.catalog = tuple(sorted((c for c in courses if c.department), key=catalog_key))
+        self.featured = tuple(sorted(
+            self.catalog, key=lambda c: (c.department.name.casefold(), c.title.casefold())))[:6]
+
+        self.by_id = MappingProxyType({c.id: c for c in courses})
+        self.by_code = MappingProxyType({c.code: c for c in courses})
+        self.department_by_id = MappingProxyType({d.id: d for d in departments})
+        by_department = {}
+        for c in self.catalog:
+            by_department.setdefault(c.department_id, []).append(c)
+        self.by_department = MappingProxyType({k: tuple(v) for k, v in by_department.items()})
+        # course id -> position in `courses`; bit i of an enrollment mask stands for courses[i]
+        self.ordinal = MappingProxyType({c.id: i for i, c in enumerate(self.courses)})
+
+    def mask(self, course_ids):
+        """Bitmap over course ordinals with a bit set for each of `course_ids` in the catalog."""
+        bits = 0
+        for course_id in course_ids:
+            i = self.ordinal.get(course_id)
+            if i is not None:
+                bits |= 1 << i
+        return bits
+
+    def unmasked(self, mask, start=0, limit=None):
+        """
+        Courses (title order) whose bit is clear in `mask`, from ordinal `start`.
+        Returns (rows, next start or None).
+        """
+        free = ~mask & ((1 << len(self.courses)) - 1)
+        free >>= start
+        rows = []
+        i = start
+        while free and (limit is None or len(rows) < limit):
+            skip = (free & -free).bit_length() - 1
+            i += skip
+            rows.append(self.courses[i])
+            free >>= skip + 1
+            i += 1
+        return rows, (i if free else None)
+
+    def page(self, department_id=None, after=None, limit=24):
+        """Keyset page of the public catalog. Returns (rows, has_more)."""
+        rows = self.by_department.get(department_id, ()) if department_id else self.catalog
+        start = bisect_right(rows, tuple(after), key=catalog_key) if after else 0
+        chunk = rows[start:start + limit + 1]
+        return chunk[:limit], len(chunk) > limit
+
+
+# -------------------------
+# Build / swap
+# -------------------------
+_snapshot = None
+_stale = True
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def build():
+    version, changed_at = get_version("catalog_version")
+
+    departments = {
+        d.id: DepartmentRow(d.id, d.code, d.name, d.description)
+        for d in Department.query.with_entities(
+            Department.id, Department.code, Department.name, Department.description)
+    }
+    courses = [
+        CourseRow(c.id, c.code, c.title, c.credits,
+                  Decimal(c.fee if c.fee is not None else 0), c.description,
+                  c.department_id, departments.get(c.department_id))
+        for c in Course.query.with_entities(
+            Course.id, Course.code, Course.title, Course.credits, Course.fee,
+            Course.description, Course.department_id)
+    ]
+    return CatalogSnapshot(list(departments.values()), courses, version, changed_at)
+
+
+def rebuild():
+    """Build a fresh snapshot and atomically swap it in."""
+    global _snapshot, _stale, _checked_at
+    with _lock:
+        # cleared before reading, so a commit landing during the build marks the result stale again
+        _stale = False
+        try:
+            snap = build()
+        except Exception:
+            _stale = True
+            raise
+        _snapshot, _checked_at = snap, time.monotonic()
+    return snap
+
+
+def get_catalog():
+    """Return the current snapshot; normally costs no queries at all."""
+    global _checked_at
+    snap = _snapshot
+    if snap is None or _stale:
+        return rebuild()
+
+    interval = current_app.config.get("CATALOG_CHECK_SECONDS", 30)
+    if time.monotonic() - _checked_at > interval:
+        _checked_at = time.monotonic()
+        version, _changed_at = peek_version("catalog_version")
+        if version != snap.version:
+            return rebuild()
+    return snap
+
+
+@on_commit(Course, Department)
+def _catalog_changed(keys):
+    global _stale
+    _stale = True
@@ -0,0 +1,181 @@
+# app/counters.py
+"""
+Materialized site counters.
+
+The public pages show how many courses and students we have. Instead of running
+a full-table COUNT on every hit, each tracked model bumps a row in
+``site_counters`` from its insert/delete events (inside the same transaction),
+and the views read those rows by primary key. ``reconcile()`` recounts from the
+source tables to repair drift from bulk deletes or manual SQL; it runs on a
+timer in every worker and is also available as ``flask counters reconcile``.
+
+The same table also holds write-bumped *versions* (``notices_version``,
+``catalog_version``): any insert/update/delete on the listed models increments
+them, which gives the JSON APIs a cheap validator for conditional GETs.
+"""
+import threading
+import time
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import event, func
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models import Course, Department, Notice, StudentProfile, SiteCounter
+
+# counter name -> model whose rows it counts
+TRACKED = {
+    "courses": Course,
+    "students": StudentProfile,
+}
+
+# version name -> models whose writes bump it
+VERSIONED = {
+    "notices_version": (Notice,),
+    "catalog_version": (Course, Department),
+}
+
+
+# -------------------------
+# Write side (ORM events)
+# -------------------------
+def adjust(connection, name, delta):
+    """Shift counter `name` by `delta` in the caller's transaction (bulk inserts skip the events)."""
+    table = SiteCounter.__table__
+    connection.execute(
+        table.update()
+        .where(table.c.name == name)
+        .values(value=table.c.value + delta, updated_at=datetime.utcnow())
+    )
+
+
+def _track(name, model):
+    @event.listens_for(model, "after_insert")
+    def _on_insert(mapper, connection, target):
+        adjust(connection, name, 1)
+
+    @event.listens_for(model, "after_delete")
+    def _on_delete(mapper, connection, target):
+        adjust(connection, name, -1)
+
+
+def _version(name, model):
+    def _bump(mapper, connection, target):
+        adjust(connection, name, 1)
+
+    for evt in ("after_insert", "after_update", "after_delete"):
+        event.listen(model, evt, _bump)
+
+
+for _name, _model in TRACKED.items():
+    _track(_name, _model)
+
+for _name, _models in VERSIONED.items():
+    for _model in _models:
+        _version(_name, _model)
+
+
+# -------------------------
+# Read side
+# -------------------------
+def get_counts():
+    """Return {counter name: value} using a primary-key lookup; missing rows are seeded once."""
+    rows = dict(
+        db.session.query(SiteCounter.name, SiteCounter.value)
+        .filter(SiteCounter.name.in_(list(TRACKED)))
+        .all()
+    )
+    missing = [name for name in TRACKED if name not in rows]
+    if missing:
+        rows.update(reconcile(missing))
+    return rows
+
+
+def peek_version(name):
+    """Return (version, last changed at) without seeding; (0, None) if the row does not exist yet."""
+    row = db.session.query(SiteCounter.value, SiteCounter.updated_at).filter(SiteCounter.name == name).first()
+    return (row.value, row.updated_at) if row else (0, None)
+
+
+def get_version(name):
+    """Return (version, last changed at) for a VERSIONED name, seeding the row on first use."""
+    version, changed_at = peek_version(name)
+    if changed_at is not None:
+        return version, changed_at
+
+    now = datetime.utcnow()
+    _store({name: 1}, now, overwrite=False)
+    return 1, now
+
+
+def reconcile(names=None):
+    """Recount the tracked tables and overwrite the stored values. Returns the fresh counts."""
+    fresh = {}
+    for name in names or TRACKED:
+        model = TRACKED[name]
+        fresh[name] = db.session.query(func.count(model.id)).scalar() or 0
+
+    _store(fresh, datetime.utcnow())
+    return fresh
+
+
+def _store(values, now, overwrite=True):
+    """
+    Write counter rows on a separate connection so the caller's session (which
+    may hold unrelated pending changes) is never committed from here.
+    """
+    table = SiteCounter.__table__
+    for name, value in values.items():
+        try:
+            with db.engine.begin() as conn:
+                updated = 0
+                if overwrite:
+                    updated = conn.execute(
+                        table.update().where(table.c.name == name).values(value=value, updated_at=now)
+                    ).rowcount
+                if not updated:
+                    conn.execute(table.insert().values(name=name, value=value, updated_at=now))
+        except IntegrityError:
+            # Another worker seeded the same row first; its value is just as good.
+            pass
+
+
+# -------------------------
+# Periodic reconcile
+# -------------------------
+def _reconcile_loop(app, interval):
+    while True:
+        time.sleep(interval)
+        with app.app_context():
+            try:
+                reconcile()
+            except Exception:
+                db.session.rollback()
+                app.logger.exception("Site counter reconcile failed")
+            finally:
+                db.session.remove()
+
+
+@click.group("counters")
+def counters_cli():
+    """Site counter maintenance."""
+
+
+@counters_cli.command("reconcile")
+@with_appcontext
+def reconcile_command():
+    """Recount courses/students into site_counters."""
+    for name, value in reconcile().items():
+        click.echo(f"{name}: {value}")
+
+
+def init_app(app):
+    app.cli.add_command(counters_cli)
+
+    interval = int(app.config.get("COUNTERS_RECONCILE_SECONDS", 0) or 0)
+    if interval > 0 and not app.testing:
+        t = threading.Thread(target=_reconcile_loop, args=(app, interval),
+                             name="counters-reconcile", daemon=True)
+        t.start()
@@ -0,0 +1,171 @@
+# app/exports.py
+"""
+Streaming statement exports (fee statement, transcript) as CSV or printable HTML.
+
+Rows are read with a server-side cursor (``yield_per``) and written out as they
+arrive, so an export runs in constant memory however long a student's history
+is, or however many students a department export covers. The printable HTML is
+split into fixed-size pages with print page breaks; browsers save it as PDF.
+
+Each export is scoped by a predicate on StudentProfile, e.g.
+``StudentProfile.id == 5`` for a student's own statement or
+``StudentProfile.department_id == 2`` for an admin department export.
+"""
+import csv
+from datetime import datetime
+from typing import Iterator, NamedTuple
+
+from flask import Response, stream_template, stream_with_context
+from sqlalchemy import String, cast, literal, select, union_all
+
+from app.extensions import db
+from app.ledger import ZERO, money
+from app.models import Course, Enrollment, Exam, ExamResult, Payment, StudentProfile, User
+
+YIELD_PER = 500
+CSV_CHUNK = 16 * 1024
+ROWS_PER_PAGE = 40
+
+KINDS = ("fees", "transcript")
+FORMATS = ("csv", "html")
+
+
+class Export(NamedTuple):
+    title: str
+    columns: tuple
+    rows: Iterator[tuple]
+
+
+def _stream(stmt):
+    return db.session.execute(stmt.execution_options(yield_per=YIELD_PER))
+
+
+def _student_name(first_name, last_name):
+    return f"{first_name} {last_name or ''}".strip()
+
+
+def _day(value):
+    return value.strftime("%Y-%m-%d") if value else ""
+
+
+# -------------------------
+# Fee statement
+# -------------------------
+def fee_statement(where):
+    """Charges (course fees) and payments per student, oldest first, with a running balance."""
+    entries = union_all(
+        select(Enrollment.student_id.label("student_id"), Enrollment.enrolled_on.label("at"),
+               literal("Charge").label("kind"), Course.code.label("ref"),
+               Course.title.label("detail"), Course.fee.label("amount"))
+        .join(Course, Course.id == Enrollment.course_id),
+        select(Payment.student_id, Payment.paid_on, literal("Payment"), cast(Payment.id, String(20)),
+               Payment.status, Payment.amount),
+    ).subquery()
+
+    stmt = (
+        select(StudentProfile.id, StudentProfile.admission_no, User.first_name, User.last_name,
+               entries.c.at, entries.c.kind, entries.c.ref, entries.c.detail, entries.c.amount)
+        .join(entries, entries.c.student_id == StudentProfile.id)
+        .join(User, User.id == StudentProfile.user_id)
+        .where(where)
+        .order_by(StudentProfile.id, entries.c.at, entries.c.kind)
+    )
+
+    def rows():
+        student, balance = None, ZERO
+        for sid, admission_no, first_name, last_name, at, kind, ref, detail, amount in _stream(stmt):
+            if sid != student:
+                student, balance = sid, ZERO
+            amount = money(amount)
+            if kind == "Charge":
+                balance += amount
+                yield (admission_no, _student_name(first_name, last_name), _day(at),
+                       kind, f"{ref} {detail}", amount, "", balance)
+            else:
+                balance -= amount
+                yield (admission_no, _student_name(first_name, last_name), _day(at),
+                       kind, f"Receipt #{ref} ({detail})", "", amount, balance)
+
+    columns = ("Admission No", "Student", "Date", "Type", "Description", "Charge", "Payment", "Balance")
+    return Export("Fee Statement", columns, rows())
+
+
+# -------------------------
+# Transcript
+# -------------------------
+def transcript(where):
+    """Every exam in each student's courses with marks and grade, by course then date."""
+    stmt = (
+        select(StudentProfile.admission_no, User.first_name, User.last_name,
+               Course.code, Course.title, Exam.name, Exam.exam_date, Exam.total_marks,
+               ExamResult.marks_obtained, ExamResult.grade, ExamResult.remarks)
+        .select_from(StudentProfile)
+        .join(User, User.id == StudentProfile.user_id)
+        .join(Enrollment, Enrollment.student_id == StudentProfile.id)
+        .join(Course, Course.id == Enrollment.course_id)
+        .join(Exam, Exam.course_id == Course.id)
+        .outerjoin(ExamResult, (ExamResult.exam_id == Exam.id) & (ExamResult.enrollment_id == Enrollment.id))
+        .where(where)
+        .order_by(StudentProfile.id, Course.code, Exam.exam_date, Exam.id)
+    )
+
+    def rows():
+        for (admission_no, first_name, last_name, code, title, exam, exam_date, total,
+             marks, grade, remarks) in _stream(stmt):
+            yield (admission_no, _student_name(first_name, last_name), code, title, exam,
+                   _day(exam_date), total if total is not None else "",
+                   marks if marks is not None else "", grade or "", remarks or "")
+
+    columns = ("Admission No", "Student", "Course Code", "Course", "Exam", "Date",
+               "Total Marks", "Marks", "Grade", "Remarks")
+    return Export("Transcript", columns, rows())
+
+
+BUILDERS = {
+    "fees": fee_statement,
+    "transcript": transcript,
+}
+
+
+# -------------------------
+# Responses
+# -------------------------
+class _Line:
+    """File-like object for csv.writer that hands back what it was given."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_chunks(export):
+    writer = csv.writer(_Line())
+    buf = [writer.writerow(export.columns)]
+    size = 0
+    for row in export.rows:
+        line = writer.writerow(row)
+        buf.append(line)
+        size += len(line)
+        if size >= CSV_CHUNK:
+            yield "".join(buf)
+            buf, size = [], 0
+    yield "".join(buf)
+
+
+def respond(kind, fmt, where, filename, subtitle=""):
+    """Stream export `kind` ('fees'/'transcript') as `fmt` ('csv'/'html')."""
+    export = BUILDERS[kind](where)
+    if fmt == "csv":
+        resp = Response(stream_with_context(_csv_chunks(export)), mimetype="text/csv")
+        resp.headers["Content-Disposition"] = f'attachment; filename="{filename}.csv"'
+    else:
+        resp = Response(stream_template(
+            "exports/print.html",
+            export=export,
+            subtitle=subtitle,
+            generated_at=datetime.utcnow(),
+            rows_per_page=ROWS_PER_PAGE,
+        ), mimetype="text/html")
+    resp.headers["Cache-Control"] = "private, no-store"
+    # let proxies pass chunks straight through instead of buffering the whole export
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
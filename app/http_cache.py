@@ -0,0 +1,44 @@
+# app/http_cache.py
+"""
+Conditional GET helpers (ETag / Last-Modified).
+
+Views compute a cheap validator first (usually a version from app/counters.py),
+call ``is_fresh()`` and return ``not_modified()`` before touching any ORM rows.
+Full responses go through ``with_validators()`` so the browser can revalidate
+on its next poll.
+"""
+from datetime import timezone
+
+from flask import request, make_response
+
+
+def _as_utc(dt):
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.replace(microsecond=0)  # HTTP dates have one-second resolution
+
+
+def is_fresh(etag, last_modified=None):
+    """True if the client's cached copy is still current (If-None-Match wins over If-Modified-Since)."""
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if last_modified is not None and request.if_modified_since:
+        return _as_utc(last_modified) <= request.if_modified_since
+    return False
+
+
+def with_validators(response, etag, last_modified=None, max_age=0):
+    """Attach ETag/Last-Modified; max_age=0 means the client must revalidate on every use."""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = _as_utc(last_modified)
+    response.cache_control.public = True
+    if max_age:
+        response.cache_control.max_age = max_age
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+def not_modified(etag, last_modified=None, max_age=0):
+    return with_validators(make_response("", 304), etag, last_modified, max_age)
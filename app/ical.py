@@ -0,0 +1,175 @@
+# app/ical.py
+"""
+Subscribable iCalendar (.ics) exam feeds, per course and per student.
+
+Feeds are rendered once and cached with their ETag, so calendar clients
+polling every few minutes get a 304 (or a cached body) without touching the
+exams table. Exam create/update/delete commits drop the affected course feed
+and every student feed; enrollment changes drop that student's feed; course
+renames clear everything. ICAL_CACHE_TTL bounds staleness across workers.
+
+The body is a pure function of the exam rows and config (DTSTAMP is each
+exam's updated_at, not the render time, and the UID domain comes from
+ICAL_UID_DOMAIN / SERVER_NAME rather than the Host header), so every worker derives the same ETag for
+the same feed and conditional GETs hit whichever worker answers.
+
+Student feeds are addressed by a signed token instead of the session, because
+calendar apps can't log in.
+"""
+import hashlib
+from datetime import datetime, time, timedelta
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import select
+
+from app.cache import TTLCache, on_commit
+from app.catalog import get_catalog
+from app.extensions import db
+from app.models import Course, Enrollment, Exam
+
+PRODID = "-//College Portal//Exam Calendar//EN"
+TOKEN_SALT = "exam-calendar"
+UID_DOMAIN = "college-portal"
+
+course_feeds = TTLCache(maxsize=512, ttl=3600)
+student_feeds = TTLCache(maxsize=4096, ttl=3600)
+
+
+# -------------------------
+# Student tokens
+# -------------------------
+def _serializer():
+    return URLSafeSerializer(current_app.config["SECRET_KEY"], salt=TOKEN_SALT)
+
+
+def student_token(student_id):
+    return _serializer().dumps(student_id)
+
+
+def student_from_token(token):
+    """Return the student id a feed token was issued for, or None if it's invalid."""
+    try:
+        student_id = _serializer().loads(token)
+    except BadSignature:
+        return None
+    return student_id if isinstance(student_id, int) else None
+
+
+# -------------------------
+# Rendering
+# -------------------------
+def _escape(text):
+    return (str(text or "").replace("\\", "\\\\").replace(";", "\\;")
+            .replace(",", "\\,").replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _fold(line):
+    """Fold content lines at 75 octets as RFC 5545 requires."""
+    raw = line.encode("utf-8")
+    if len(raw) <= 75:
+        return line
+    parts, start = [], 0
+    limit = 75
+    while start < len(raw):
+        end = min(start + limit, len(raw))
+        # don't split a multi-byte character
+        while end < len(raw) and (raw[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(raw[start:end].decode("utf-8"))
+        start, limit = end, 74  # continuation lines start with a space
+    return "\r\n ".join(parts)
+
+
+def _uid_domain():
+    """UID domain from config only: the body is cached, so it must not echo request headers."""
+    config = current_app.config
+    domain = config.get("ICAL_UID_DOMAIN") or config.get("SERVER_NAME") or UID_DOMAIN
+    return domain.split(":")[0]
+
+
+def render(name, exams, catalog):
+    host = _uid_domain()
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape(name)}",
+    ]
+    for exam_id, course_id, exam_name, exam_date, total_marks, updated_at in exams:
+        course = catalog.by_id.get(course_id)
+        label = f"{exam_name} ({course.code})" if course else exam_name
+        description = f"{course.title}. " if course else ""
+        if total_marks:
+            description += f"Total marks: {total_marks}"
+        modified = (updated_at or datetime.combine(exam_date, time.min)).strftime("%Y%m%dT%H%M%SZ")
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:exam-{exam_id}@{host}",
+            f"DTSTAMP:{modified}",
+            f"LAST-MODIFIED:{modified}",
+            f"DTSTART;VALUE=DATE:{exam_date.strftime('%Y%m%d')}",
+            f"DTEND;VALUE=DATE:{(exam_date + timedelta(days=1)).strftime('%Y%m%d')}",
+            f"SUMMARY:{_escape(label)}",
+            f"DESCRIPTION:{_escape(description)}",
+            "TRANSP:TRANSPARENT",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(_fold(line) for line in lines) + "\r\n"
+
+
+def _exams(where):
+    return db.session.execute(
+        select(Exam.id, Exam.course_id, Exam.name, Exam.exam_date, Exam.total_marks, Exam.updated_at)
+        .where(where, Exam.exam_date.is_not(None))
+        .order_by(Exam.exam_date, Exam.id)
+    ).all()
+
+
+def _cached(cache, key, build):
+    """Return (etag, body), building and caching the feed on a miss."""
+    def make():
+        body = build()
+        return hashlib.sha1(body.encode("utf-8")).hexdigest()[:20], body
+    return cache.get_or_set(key, make, current_app.config.get("ICAL_CACHE_TTL", cache.ttl))
+
+
+def course_feed(course_id):
+    """(etag, body) for a course, or None if the course doesn't exist."""
+    catalog = get_catalog()
+    course = catalog.by_id.get(course_id)
+    if course is None:
+        return None
+    return _cached(course_feeds, course_id, lambda: render(
+        f"{course.code} exams", _exams(Exam.course_id == course_id), catalog))
+
+
+def student_feed(student_id):
+    enrolled = select(Enrollment.course_id).where(Enrollment.student_id == student_id)
+    return _cached(student_feeds, student_id, lambda: render(
+        "My exams", _exams(Exam.course_id.in_(enrolled)), get_catalog()))
+
+
+# -------------------------
+# Invalidation
+# -------------------------
+@on_commit(Exam, key=lambda e: e.course_id)
+def _exams_changed(course_ids):
+    for course_id in course_ids:
+        course_feeds.pop(course_id)
+    student_feeds.clear()
+
+
+@on_commit(Enrollment, key=lambda e: e.student_id)
+def _enrollments_changed(student_ids):
+    for student_id in student_ids:
+        student_feeds.pop(student_id)
+
+
+@on_commit(Course)
+def _courses_changed(keys):
+    course_feeds.clear()
+    student_feeds.clear()
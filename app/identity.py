@@ -0,0 +1,92 @@
+# app/identity.py
+"""
+Flask-Login user loader backed by a short-lived identity cache.
+
+Every authenticated request needs the User and, on student pages, the
+StudentProfile. On a miss both are fetched in one joined query and their
+column values are stored as an immutable snapshot in a bounded TTLCache. On a
+hit the instances are rebuilt from the snapshot and attached to the request
+session with ``merge(load=False)``, which emits no SQL; they behave like normally
+loaded rows, so views can still modify and commit them.
+
+Commits that touch a User or StudentProfile (profile edits, block/unblock,
+approval, avatar updates) drop that user's snapshot; IDENTITY_CACHE_TTL bounds
+staleness when another worker did the write.
+"""
+from types import MappingProxyType
+from typing import NamedTuple, Optional
+
+from flask import current_app
+from sqlalchemy.orm import joinedload, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.cache import TTLCache, on_commit
+from app.extensions import db, login_manager
+from app.models import StudentProfile, User
+
+
+class Identity(NamedTuple):
+    user: MappingProxyType
+    profile: Optional[MappingProxyType]
+
+
+identities = TTLCache(maxsize=2048, ttl=30)
+
+
+def _columns(obj):
+    return MappingProxyType({attr.key: getattr(obj, attr.key) for attr in obj.__mapper__.column_attrs})
+
+
+def _fetch(user_id):
+    user = (
+        User.query.options(joinedload(User.student_profile))
+        .filter(User.id == user_id)
+        .first()
+    )
+    if user is None:
+        return None
+    profile = user.student_profile
+    return Identity(_columns(user), _columns(profile) if profile is not None else None)
+
+
+def _attach(model, values):
+    """Build a detached instance from committed column values and merge it without a query."""
+    obj = model.__mapper__.class_manager.new_instance()
+    for key, value in values.items():
+        set_committed_value(obj, key, value)
+    make_transient_to_detached(obj)
+    return db.session.merge(obj, load=False)
+
+
+def _materialize(identity):
+    user = _attach(User, identity.user)
+    profile = _attach(StudentProfile, identity.profile) if identity.profile is not None else None
+    set_committed_value(user, "student_profile", profile)
+    if profile is not None:
+        set_committed_value(profile, "user", user)
+    return user
+
+
+def load_user(user_id):
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+    identity = identities.get(user_id)
+    if identity is None:
+        identity = _fetch(user_id)
+        if identity is None:
+            return None
+        identities.set(user_id, identity, current_app.config.get("IDENTITY_CACHE_TTL", identities.ttl))
+    return _materialize(identity)
+
+
+@on_commit(User, StudentProfile, key=lambda obj: obj.id if isinstance(obj, User) else obj.user_id)
+def _identity_changed(user_ids):
+    for user_id in user_ids:
+        identities.pop(user_id)
+
+
+def init_app(app):
+    login_manager.user_loader(load_user)
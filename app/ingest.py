@@ -0,0 +1,351 @@
+# app/ingest.py
+"""
+Write-behind ingestion for public form submissions (/apply, /contact).
+
+The request validates the submission and appends it to a local spool (a SQLite
+database in WAL mode, synchronous=FULL) and returns straight away. A background
+flusher claims spooled rows in batches, inserts the Application /
+ContactMessage rows in one transaction and deletes them from the spool.
+
+Several workers can share one spool file: rows are claimed with an owner tag
+and a claim that is older than INGEST_CLAIM_TIMEOUT (a worker died mid-batch)
+is picked up again. Delivery is at-least-once; a crash between the database
+commit and the spool delete can repeat a batch. A spool delete that fails after
+the commit (e.g. "database is locked") is never treated as a failed insert: the
+rows stay owned by this worker and the delete is retried before the next claim.
+
+When the database refuses a batch (unreachable, read-only...), the batch is
+handed back and the flusher backs off: INGEST_FLUSH_SECONDS doubled per
+consecutive failure, up to INGEST_MAX_BACKOFF, ignoring new submissions until
+the next attempt.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.extensions import db
+from app.models import Application, ContactMessage
+
+
+def _application(payload, received_at):
+    return Application(
+        name=payload["name"],
+        email=payload["email"],
+        phone=payload.get("phone") or None,
+        program_id=payload.get("program_id"),
+        message=payload.get("message") or None,
+        status="new",
+        created_at=received_at,
+    )
+
+
+def _contact(payload, received_at):
+    return ContactMessage(
+        name=payload["name"],
+        email=payload["email"],
+        subject=payload.get("subject") or None,
+        message=payload["message"],
+        created_at=received_at,
+    )
+
+
+# spool kind -> builder(payload, received_at) returning an ORM row
+BUILDERS = {
+    "application": _application,
+    "contact": _contact,
+}
+
+
+# spool kind -> model, used to check field lengths before a submission is accepted
+MODELS = {
+    "application": Application,
+    "contact": ContactMessage,
+}
+
+
+def validate(kind, payload):
+    """Return an error message if the payload would be rejected by the database, else None."""
+    columns = MODELS[kind].__table__.columns
+    for field, value in payload.items():
+        length = getattr(columns[field].type, "length", None) if field in columns else None
+        if length and isinstance(value, str) and len(value) > length:
+            return f"{field.capitalize()} is too long (max {length} characters)."
+    return None
+
+
+def _build(row):
+    _id, kind, payload, received_at = row
+    return BUILDERS[kind](json.loads(payload), datetime.utcfromtimestamp(received_at))
+
+
+# -------------------------
+# Spool (local, durable)
+# -------------------------
+class Spool:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS spool ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " kind TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " received_at REAL NOT NULL,"
+            " claimed_by TEXT,"
+            " claimed_at REAL)"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            self._local.conn = conn
+        return conn
+
+    def append(self, kind, payload):
+        cur = self._conn().execute(
+            "INSERT INTO spool (kind, payload, received_at) VALUES (?, ?, ?)",
+            (kind, json.dumps(payload), time.time()),
+        )
+        return cur.lastrowid
+
+    def claim(self, owner, limit, stale_after):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE spool SET claimed_by = ?, claimed_at = ? WHERE id IN ("
+                " SELECT id FROM spool WHERE claimed_by IS NULL OR (claimed_by != 'dead' AND claimed_at < ?)"
+                " ORDER BY id LIMIT ?)",
+                (owner, now, now - stale_after, limit),
+            )
+            rows = conn.execute(
+                "SELECT id, kind, payload, received_at FROM spool WHERE claimed_by = ? ORDER BY id",
+                (owner,),
+            ).fetchall()
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    def bury(self, ids):
+        """Park rows the database rejects; they stay in the spool for inspection but are never claimed again."""
+        self._execute_ids("UPDATE spool SET claimed_by = 'dead', claimed_at = NULL WHERE id IN ({})", ids)
+
+    def release(self, ids):
+        self._execute_ids("UPDATE spool SET claimed_by = NULL, claimed_at = NULL WHERE id IN ({})", ids)
+
+    def delete(self, ids):
+        self._execute_ids("DELETE FROM spool WHERE id IN ({})", ids)
+
+    def _execute_ids(self, sql, ids):
+        if ids:
+            self._conn().execute(sql.format(",".join("?" * len(ids))), list(ids))
+
+    def depth(self):
+        """Return (pending rows, oldest pending received_at, dead rows)."""
+        return self._conn().execute(
+            "SELECT COALESCE(SUM(claimed_by IS NOT 'dead'), 0),"
+            " MIN(CASE WHEN claimed_by IS NOT 'dead' THEN received_at END),"
+            " COALESCE(SUM(claimed_by IS 'dead'), 0) FROM spool"
+        ).fetchone()
+
+
+# -------------------------
+# Flusher (background)
+# -------------------------
+class Pipeline:
+    def __init__(self, app, spool):
+        self.app = app
+        self.spool = spool
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.batch_size = int(app.config.get("INGEST_BATCH_SIZE", 50))
+        self.interval = float(app.config.get("INGEST_FLUSH_SECONDS", 1.0))
+        self.claim_timeout = float(app.config.get("INGEST_CLAIM_TIMEOUT", 60))
+        self.max_backoff = float(app.config.get("INGEST_MAX_BACKOFF", 60))
+        self.failures = 0  # consecutive flushes that had to hand rows back
+
+        self._committed = set()  # spool ids already in the database whose delete failed
+        self._wake = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "accepted": 0,
+            "flushed": 0,
+            "buried": 0,
+            "failed_batches": 0,
+            "last_batch_size": 0,
+            "last_flush_ms": None,
+            "max_flush_ms": None,
+            "last_flush_at": None,
+            "last_error": None,
+        }
+
+    def submit(self, kind, payload):
+        if kind not in BUILDERS:
+            raise ValueError(f"Unknown submission kind {kind!r}")
+        spool_id = self.spool.append(kind, payload)
+        with self._stats_lock:
+            self.stats["accepted"] += 1
+        self.start()
+        self._wake.set()
+        return spool_id
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ingest-flusher", daemon=True)
+                self._thread.start()
+
+    def backoff(self):
+        """Seconds to wait before the next claim after `failures` failed flushes in a row."""
+        return min(self.interval * 2 ** min(self.failures - 1, 16), self.max_backoff)
+
+    def _run(self):
+        while True:
+            if self.failures:
+                # the database refused the last batch; don't hammer it (or the log)
+                time.sleep(self.backoff())
+            else:
+                self._wake.wait(self.interval)
+            self._wake.clear()
+            # Let a burst accumulate into one batch instead of flushing row by row
+            time.sleep(min(self.interval, 0.05))
+            try:
+                while self.flush() >= self.batch_size:
+                    pass
+            except Exception:
+                self.app.logger.exception("Ingest flusher loop failed")
+
+    def flush(self):
+        """
+        Move one batch from the spool into the database. Returns the number of rows
+        that left the spool (written or buried); rows handed back don't count.
+        """
+        if self._committed:
+            self._forget(sorted(self._committed))
+        # our claim still covers committed-but-undeleted rows; never insert those again
+        rows = [r for r in self.spool.claim(self.owner, self.batch_size, self.claim_timeout)
+                if r[0] not in self._committed]
+        if not rows:
+            return 0
+
+        started = time.perf_counter()
+        with self.app.app_context():
+            try:
+                written, buried, released = self._insert(rows)
+            finally:
+                db.session.remove()
+
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        with self._stats_lock:
+            self.stats["flushed"] += written
+            self.stats["buried"] += buried
+            self.stats["last_batch_size"] = len(rows)
+            self.stats["last_flush_ms"] = elapsed_ms
+            self.stats["max_flush_ms"] = max(elapsed_ms, self.stats["max_flush_ms"] or 0)
+            self.stats["last_flush_at"] = datetime.utcnow().isoformat()
+        self.failures = self.failures + 1 if released else 0
+        return written + buried
+
+    def _insert(self, rows):
+        """Insert a claimed batch; returns (rows written, rows buried, rows handed back)."""
+        ids = [r[0] for r in rows]
+        try:
+            db.session.add_all([_build(r) for r in rows])
+            db.session.commit()
+        except (IntegrityError, DataError, KeyError, ValueError) as e:
+            # Something in this batch is bad; retry row by row so one submission can't block the queue
+            db.session.rollback()
+            self._failed(e)
+        except Exception as e:
+            # Database unavailable etc. -- hand the batch back and try again later
+            db.session.rollback()
+            self.spool.release(ids)
+            self._failed(e)
+            return 0, 0, len(ids)
+        else:
+            self._forget(ids)
+            return len(ids), 0, 0
+
+        written = buried = released = 0
+        for i, row in enumerate(rows):
+            try:
+                db.session.add(_build(row))
+                db.session.commit()
+            except (IntegrityError, DataError, KeyError, ValueError):
+                db.session.rollback()
+                self.spool.bury([row[0]])
+                self.app.logger.exception("Ingest row %s rejected; left in spool as dead", row[0])
+                buried += 1
+            except Exception as e:
+                db.session.rollback()
+                # the database went away mid-batch; hand back the rest rather than fail row by row
+                rest = [r[0] for r in rows[i:]]
+                self.spool.release(rest)
+                self._failed(e)
+                released = len(rest)
+                break
+            else:
+                self._forget([row[0]])
+                written += 1
+        return written, buried, released
+
+    def _forget(self, ids):
+        """Delete committed rows from the spool; if that fails, keep them claimed and retry later."""
+        try:
+            self.spool.delete(ids)
+        except sqlite3.Error:
+            self.app.logger.exception("Spool delete failed for committed rows %s; retrying on the next flush", ids)
+            self._committed.update(ids)
+        else:
+            self._committed.difference_update(ids)
+
+    def _failed(self, error):
+        with self._stats_lock:
+            self.stats["failed_batches"] += 1
+            self.stats["last_error"] = str(error)
+        self.app.logger.warning("Ingest flush failed: %s", error)
+
+    def metrics(self):
+        depth, oldest, dead = self.spool.depth()
+        with self._stats_lock:
+            out = dict(self.stats)
+        out["queue_depth"] = depth
+        out["dead_rows"] = dead
+        out["oldest_age_seconds"] = round(time.time() - oldest, 2) if oldest else 0
+        return out
+
+
+def submit(kind, payload):
+    """Spool a validated submission for the current app; returns the spool ticket id."""
+    return current_app.extensions["ingest"].submit(kind, payload)
+
+
+def metrics():
+    return current_app.extensions["ingest"].metrics()
+
+
+def init_app(app):
+    path = app.config.get("INGEST_SPOOL_PATH") or os.path.join(app.instance_path, "ingest_spool.db")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pipeline = Pipeline(app, Spool(path))
+    app.extensions["ingest"] = pipeline
+
+    # Drain anything left behind by a previous process
+    if pipeline.spool.depth()[0]:
+        pipeline.start()
@@ -0,0 +1,277 @@
+# app/ledger.py
+"""
+Incrementally maintained student fee ledger.
+
+``student_balances`` holds one row per student with the enrolled course count,
+the sum of their course fees, the sum of their payments and the difference.
+ORM events keep it current inside the same transaction as the write:
+
+* Enrollment insert/delete/move adds or removes the course fee,
+* Payment insert/delete/update adds or removes the amount,
+* a Course fee change shifts every enrolled student by the difference.
+
+Every update is a relative ``col = col + delta`` so concurrent writers can't
+lose each other's changes, and all arithmetic is Decimal. Bulk SQL bypasses the
+events; ``flask ledger verify`` reports drift and ``flask ledger rebuild``
+recomputes from the source tables.
+"""
+from datetime import datetime
+from decimal import Decimal
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models import Course, Enrollment, Payment, StudentBalance, StudentProfile
+
+CENT = Decimal("0.01")
+ZERO = Decimal("0.00")
+
+
+def money(value):
+    """Exact Decimal for a Numeric/float/str amount, rounded to cents."""
+    if value is None:
+        return ZERO
+    return Decimal(str(value)).quantize(CENT)
+
+
+# -------------------------
+# Write side (ORM events)
+# -------------------------
+def _apply(connection, student_ids, courses=0, fee=ZERO, paid=ZERO):
+    """Shift the ledger rows of `student_ids` (an id, list or subquery) by the given deltas."""
+    table = StudentBalance.__table__
+    where = (table.c.student_id.in_(student_ids) if not isinstance(student_ids, int)
+             else table.c.student_id == student_ids)
+    values = {"updated_at": datetime.utcnow()}
+    if courses:
+        values["courses"] = table.c.courses + courses
+    if fee:
+        values["total_fee"] = table.c.total_fee + fee
+    if fee or paid:
+        values["balance"] = table.c.balance + (fee - paid)
+    if paid:
+        values["total_paid"] = table.c.total_paid + paid
+    if len(values) == 1:
+        return
+
+    updated = connection.execute(table.update().where(where).values(**values)).rowcount
+    if not updated and isinstance(student_ids, int):
+        # Row predates the ledger. Only after_insert/after_delete get here, so the
+        # change is already visible on this connection; before_update hooks _ensure first.
+        _write(connection, _actuals(connection, [student_ids]), overwrite=False)
+
+
+def _ensure(connection, student_ids):
+    """Seed missing rows from the stored state *before* a pending UPDATE, so the deltas that follow apply on top."""
+    table = StudentBalance.__table__
+    have = set(connection.execute(
+        select(table.c.student_id).where(table.c.student_id.in_(student_ids))).scalars())
+    missing = [sid for sid in set(student_ids) if sid not in have]
+    if missing:
+        _write(connection, _actuals(connection, missing), overwrite=False)
+
+
+def _course_fee(connection, course_id):
+    return money(connection.execute(select(Course.fee).where(Course.id == course_id)).scalar())
+
+
+def _changed(target, *attrs):
+    state = inspect(target)
+    return any(state.attrs[a].history.has_changes() for a in attrs)
+
+
+def _stored(connection, *columns, where):
+    """Values as currently stored; read before the UPDATE because expired attributes carry no history."""
+    return connection.execute(select(*columns).where(where)).one()
+
+
+@event.listens_for(StudentProfile, "after_insert")
+def _profile_created(mapper, connection, target):
+    _write(connection, {target.id: (0, ZERO, ZERO)}, overwrite=False)
+
+
+@event.listens_for(StudentProfile, "before_delete")
+def _profile_deleted(mapper, connection, target):
+    table = StudentBalance.__table__
+    connection.execute(table.delete().where(table.c.student_id == target.id))
+
+
+@event.listens_for(Enrollment, "after_insert")
+def _enrolled(mapper, connection, target):
+    _apply(connection, target.student_id, courses=1, fee=_course_fee(connection, target.course_id))
+
+
+@event.listens_for(Enrollment, "after_delete")
+def _unenrolled(mapper, connection, target):
+    _apply(connection, target.student_id, courses=-1, fee=-_course_fee(connection, target.course_id))
+
+
+@event.listens_for(Enrollment, "before_update")
+def _enrollment_moved(mapper, connection, target):
+    if not _changed(target, "student_id", "course_id"):
+        return
+    old_student, old_course = _stored(connection, Enrollment.student_id, Enrollment.course_id,
+                                      where=Enrollment.id == target.id)
+    if (old_student, old_course) == (target.student_id, target.course_id):
+        return
+    _ensure(connection, [old_student, target.student_id])
+    _apply(connection, old_student, courses=-1, fee=-_course_fee(connection, old_course))
+    _apply(connection, target.student_id, courses=1, fee=_course_fee(connection, target.course_id))
+
+
+@event.listens_for(Payment, "after_insert")
+def _paid(mapper, connection, target):
+    _apply(connection, target.student_id, paid=money(target.amount))
+
+
+@event.listens_for(Payment, "after_delete")
+def _payment_deleted(mapper, connection, target):
+    _apply(connection, target.student_id, paid=-money(target.amount))
+
+
+@event.listens_for(Payment, "before_update")
+def _payment_changed(mapper, connection, target):
+    if not _changed(target, "student_id", "amount"):
+        return
+    old_student, old_amount = _stored(connection, Payment.student_id, Payment.amount,
+                                      where=Payment.id == target.id)
+    _ensure(connection, [old_student, target.student_id])
+    if old_student == target.student_id:
+        _apply(connection, target.student_id, paid=money(target.amount) - money(old_amount))
+    else:
+        _apply(connection, old_student, paid=-money(old_amount))
+        _apply(connection, target.student_id, paid=money(target.amount))
+
+
+@event.listens_for(Course, "before_update")
+def _fee_changed(mapper, connection, target):
+    if not _changed(target, "fee"):
+        return
+    (old_fee,) = _stored(connection, Course.fee, where=Course.id == target.id)
+    delta = money(target.fee) - money(old_fee)
+    if delta:
+        enrolled = select(Enrollment.student_id).where(Enrollment.course_id == target.id)
+        _apply(connection, enrolled, fee=delta)
+
+
+# -------------------------
+# Read side
+# -------------------------
+def get_balance(student_id):
+    """Return the StudentBalance row for a student (a primary-key lookup), creating it if missing."""
+    row = db.session.get(StudentBalance, student_id)
+    if row is None:
+        # Seed on a separate connection so the caller's session is never committed from here
+        with db.engine.begin() as conn:
+            values = _actuals(conn, [student_id])
+            _write(conn, values, overwrite=False)
+        courses, fee, paid = values.get(student_id, (0, ZERO, ZERO))
+        # transient copy: the caller's transaction may not see the new row yet
+        row = StudentBalance(student_id=student_id, courses=courses,
+                             total_fee=fee, total_paid=paid, balance=fee - paid)
+    return row
+
+
+def _actuals(connection, student_ids=None):
+    """Recompute {student id: (courses, total fee, total paid)} from the source tables."""
+    def scoped(query, column):
+        return query.where(column.in_(student_ids)) if student_ids is not None else query
+
+    students = connection.execute(scoped(select(StudentProfile.id), StudentProfile.id)).scalars()
+    out = {sid: (0, ZERO, ZERO) for sid in students}
+
+    fees = scoped(
+        select(Enrollment.student_id, func.count(Enrollment.id), func.sum(Course.fee))
+        .join(Course, Course.id == Enrollment.course_id)
+        .group_by(Enrollment.student_id),
+        Enrollment.student_id,
+    )
+    for sid, courses, fee in connection.execute(fees):
+        if sid in out:
+            out[sid] = (courses, money(fee), ZERO)
+
+    paid = scoped(
+        select(Payment.student_id, func.sum(Payment.amount)).group_by(Payment.student_id),
+        Payment.student_id,
+    )
+    for sid, amount in connection.execute(paid):
+        if sid in out:
+            courses, fee, _ = out[sid]
+            out[sid] = (courses, fee, money(amount))
+    return out
+
+
+def _write(connection, values, overwrite=True):
+    table = StudentBalance.__table__
+    now = datetime.utcnow()
+    for sid, (courses, fee, paid) in values.items():
+        row = {"courses": courses, "total_fee": fee, "total_paid": paid,
+               "balance": fee - paid, "updated_at": now}
+        updated = 0
+        if overwrite:
+            updated = connection.execute(
+                table.update().where(table.c.student_id == sid).values(**row)
+            ).rowcount
+        if not updated:
+            try:
+                with connection.begin_nested():
+                    connection.execute(table.insert().values(student_id=sid, **row))
+            except IntegrityError:
+                # Another transaction created the row first; its values are current.
+                pass
+
+
+def seed(connection, student_ids):
+    """Write ledger rows for students created with bulk SQL, inside the caller's transaction."""
+    _write(connection, _actuals(connection, student_ids))
+
+
+def verify():
+    """Return [(student id, stored (courses, fee, paid) or None, actual)] for rows that have drifted."""
+    stored = {
+        r.student_id: (r.courses, money(r.total_fee), money(r.total_paid))
+        for r in db.session.execute(select(
+            StudentBalance.student_id, StudentBalance.courses,
+            StudentBalance.total_fee, StudentBalance.total_paid))
+    }
+    actual = _actuals(db.session.connection())
+    return [(sid, stored.get(sid), values) for sid, values in actual.items() if stored.get(sid) != values]
+
+
+def rebuild(student_ids=None):
+    """Recompute ledger rows from the source tables. Returns the number of rows written."""
+    with db.engine.begin() as conn:
+        values = _actuals(conn, student_ids)
+        _write(conn, values)
+    return len(values)
+
+
+@click.group("ledger")
+def ledger_cli():
+    """Student fee ledger maintenance."""
+
+
+@ledger_cli.command("verify")
+@with_appcontext
+def verify_command():
+    """Report students whose ledger row differs from their enrollments/payments."""
+    drift = verify()
+    for sid, stored, actual in drift:
+        click.echo(f"student {sid}: stored={stored} actual={actual}")
+    click.echo(f"{len(drift)} drifted row(s)")
+    if drift:
+        raise SystemExit(1)
+
+
+@ledger_cli.command("rebuild")
+@with_appcontext
+def rebuild_command():
+    """Recompute every student's ledger row."""
+    click.echo(f"Rebuilt {rebuild()} ledger row(s)")
+
+
+def init_app(app):
+    app.cli.add_command(ledger_cli)
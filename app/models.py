@@ -5,8 +5,8 @@ from enum import Enum
 
 from flask import url_for
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 from app.extensions import db
+from app.passwords import hash_password, needs_rehash, verify_password
 
 
 # -------------------------
@@ -52,11 +52,17 @@ class User(UserMixin, TimestampMixin, db.Model):
                                       cascade="all,delete-orphan")
     notices_posted = db.relationship("Notice", back_populates="posted_by")
 
+    # admin search indexes catch up on rows changed since their last sync (app/search.py)
+    __table_args__ = (db.Index("ix_users_updated_at", "updated_at"),)
+
     def set_password(self, password: str):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password: str) -> bool:
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self) -> bool:
+        return needs_rehash(self.password_hash)
 
     def full_name(self):
         return f"{self.first_name} {self.last_name or ''}".strip()
@@ -68,6 +74,12 @@ class User(UserMixin, TimestampMixin, db.Model):
             return url_for('static', filename='images/avatars/default.png')
         return url_for('static', filename=f'images/avatars/{self.avatar}')
 
+    def avatar_url_at(self, size):
+        """Avatar URL at another rendition size (40/150/400); older uploads only have one size."""
+        if self.avatar and self.avatar.endswith("-150.webp"):
+            return url_for('static', filename=f'images/avatars/{self.avatar[:-9]}-{size}.webp')
+        return self.avatar_url
+
 
 # -------------------------
 # Academic Structure
@@ -118,6 +130,8 @@ class StudentProfile(TimestampMixin, db.Model):
     enrollments = db.relationship("Enrollment", back_populates="student", cascade="all,delete-orphan")
     payments = db.relationship("Payment", back_populates="student")
 
+    __table_args__ = (db.Index("ix_student_profiles_updated_at", "updated_at"),)
+
 
 # -------------------------
 # Enrollment & Results
@@ -143,10 +157,15 @@ class Exam(TimestampMixin, db.Model):
     name = db.Column(db.String(200), nullable=False)
     exam_date = db.Column(db.Date)
     total_marks = db.Column(db.Integer)
+    # bumped by every marks save; editors send it back to detect a stale sheet
+    results_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     course = db.relationship("Course", back_populates="exams")
     results = db.relationship("ExamResult", back_populates="exam", cascade="all,delete-orphan")
 
+    # Upcoming-exam lookups filter by course and range over the date
+    __table_args__ = (db.Index("ix_exams_course_date", "course_id", "exam_date"),)
+
 
 class ExamResult(TimestampMixin, db.Model):
     __tablename__ = "exam_results"
@@ -190,6 +209,26 @@ class Notice(TimestampMixin, db.Model):
     posted_by = db.relationship("User", back_populates="notices_posted")
 
 
+class StudentBalance(db.Model):
+    """Per-student fee ledger, kept current by ORM events (see app/ledger.py)."""
+    __tablename__ = "student_balances"
+    student_id = db.Column(db.Integer, db.ForeignKey("student_profiles.id", ondelete="CASCADE"), primary_key=True)
+    courses = db.Column(db.Integer, nullable=False, default=0)
+    total_fee = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    total_paid = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    # total_fee - total_paid; indexed for the admin fee-status filter
+    balance = db.Column(db.Numeric(12, 2), nullable=False, default=0, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class SiteCounter(db.Model):
+    """Materialized aggregate count, kept current by ORM events (see app/counters.py)."""
+    __tablename__ = "site_counters"
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
 class Application(db.Model):
     __tablename__ = "applications"
     id = db.Column(db.Integer, primary_key=True)
@@ -203,6 +242,12 @@ class Application(db.Model):
 
     program = db.relationship("Course", back_populates="applications")
 
+    # admin inbox: newest first, optionally by status (see app/admin/services.py)
+    __table_args__ = (
+        db.Index("ix_applications_created", "created_at", "id"),
+        db.Index("ix_applications_status_created", "status", "created_at", "id"),
+    )
+
     def short_message(self, length=140):
         if not self.message: return ""
         return (self.message[:length] + "…") if len(self.message) > length else self.message
@@ -216,4 +261,9 @@ class ContactMessage(db.Model):
     subject = db.Column(db.String(255))
     message = db.Column(db.Text, nullable=False)
     is_read = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index("ix_contact_messages_created", "created_at", "id"),
+        db.Index("ix_contact_messages_read_created", "is_read", "created_at", "id"),
+    )
@@ -0,0 +1,244 @@
+# app/notify.py
+"""
+In-process broadcast hub for notice updates, served as server-sent events.
+
+Commits that create, update or delete a Notice (admin api_notice_create /
+api_notice_update / api_notice_delete) publish an event to the hub of the
+worker that made them; a watcher thread (polling only while somebody is
+subscribed) compares ``notices_version`` every NOTIFY_POLL_SECONDS and
+publishes what other workers changed.
+
+The hub keeps the last NOTIFY_HISTORY events in a ring buffer. Subscribers
+don't get a queue each: they all wait on one Condition and read the ring from
+their own cursor. Event ids are ``<hub>-<seq>``; a client that reconnects with
+a Last-Event-ID this hub can still replay gets the missed events, anyone else
+gets a ``refresh`` event and reloads the list.
+
+An open stream still occupies whatever serves the request for up to
+NOTIFY_STREAM_SECONDS. That is a greenlet under gevent/eventlet but a request
+thread on sync/threaded workers, so streaming is only switched on when
+NOTIFY_STREAM_ENABLED is set *and* the process is monkey-patched; otherwise the
+stream endpoint is off and pages poll /api/notices (a 304 when unchanged).
+Only the logged-in dashboard subscribes; the public homepage always polls.
+"""
+import json
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy.orm import object_session
+
+from app.cache import on_commit
+from app.counters import peek_version
+from app.extensions import db
+from app.models import Notice
+
+
+def notice_payload(n):
+    """Same shape as the items of /api/notices."""
+    return {
+        "id": n.id,
+        "title": n.title,
+        "body": n.body,
+        "category": n.category.value if n.category else "General",
+        "is_pinned": bool(n.is_pinned),
+        "posted_on": n.posted_on.strftime('%d %b %Y') if n.posted_on else "New",
+    }
+
+
+class Hub:
+    def __init__(self, history=256, max_subscribers=8):
+        self.name = uuid.uuid4().hex[:8]
+        self.max_subscribers = max_subscribers
+        self.seq = 0
+        self.subscribers = 0
+        self._ring = deque(maxlen=history)  # (seq, encoded frame)
+        self._cond = threading.Condition()
+
+    def publish(self, event, data):
+        """Broadcast `data` (a dict, or a string already encoded as JSON) as an SSE event."""
+        payload = data if isinstance(data, str) else json.dumps(data)
+        with self._cond:
+            self.seq += 1
+            frame = f"id: {self.name}-{self.seq}\nevent: {event}\ndata: {payload}\n\n"
+            self._ring.append((self.seq, frame))
+            self._cond.notify_all()
+
+    def resume(self, last_event_id):
+        """Return (frames to send first, cursor) for a new subscriber."""
+        with self._cond:
+            if not last_event_id:
+                return [], self.seq
+            hub, _, seq = last_event_id.rpartition("-")
+            oldest = self._ring[0][0] if self._ring else self.seq + 1
+            if hub != self.name or not seq.isdigit() or int(seq) < oldest - 1 or int(seq) > self.seq:
+                # events were missed (or came from another worker/restart): reload instead of replaying
+                return [f"id: {self.name}-{self.seq}\nevent: refresh\ndata: {{}}\n\n"], self.seq
+            return [frame for s, frame in self._ring if s > int(seq)], self.seq
+
+    def wait(self, cursor, timeout):
+        """Block until there are events after `cursor` (or timeout). Returns (frames, new cursor)."""
+        with self._cond:
+            if self.seq == cursor:
+                self._cond.wait(timeout)
+            if self.seq == cursor:
+                return [], cursor
+            oldest = self._ring[0][0]
+            if cursor < oldest - 1:
+                # a slow reader fell off the ring
+                return [f"id: {self.name}-{self.seq}\nevent: refresh\ndata: {{}}\n\n"], self.seq
+            return [frame for s, frame in self._ring if s > cursor], self.seq
+
+    def subscribe(self):
+        with self._cond:
+            if self.subscribers >= self.max_subscribers:
+                return False
+            self.subscribers += 1
+            return True
+
+    def unsubscribe(self):
+        with self._cond:
+            self.subscribers -= 1
+
+
+# -------------------------
+# Streaming
+# -------------------------
+def stream(hub, last_event_id, heartbeat=15, max_seconds=600):
+    """
+    SSE generator for one connection. Ends after `max_seconds`; EventSource
+    reconnects with Last-Event-ID. The caller releases the subscription when the
+    response closes (a generator that never started wouldn't run a finally).
+    """
+    deadline = time.monotonic() + max_seconds
+    frames, cursor = hub.resume(last_event_id)
+    yield "retry: 5000\n\n" + "".join(frames)
+    while time.monotonic() < deadline:
+        frames, cursor = hub.wait(cursor, heartbeat)
+        yield "".join(frames) if frames else ": ping\n\n"
+
+
+# -------------------------
+# Publishing
+# -------------------------
+def _notice_change(n):
+    # evaluated at flush time, while the instance is still loaded; keys must be hashable, hence JSON
+    session = object_session(n)
+    if n in session.deleted:
+        return ("notice-deleted", n.id, json.dumps({"id": n.id}), None)
+    action = "created" if n in session.new else "updated"
+    return ("notice", n.id, json.dumps({**notice_payload(n), "action": action}), n.updated_at)
+
+
+def _second(dt):
+    # MySQL DATETIME drops the microseconds the flushed instance still has
+    return dt.replace(microsecond=0)
+
+
+_hubs = []  # (hub, watcher) per app in this process, usually one
+
+
+@on_commit(Notice, key=_notice_change)
+def _notices_changed(changes):
+    for hub, watcher in _hubs:
+        for event, _notice_id, payload, _updated_at in changes:
+            hub.publish(event, payload)
+        watcher.seen_locally(changes)
+
+
+class Watcher:
+    """Publishes notice changes made by other workers, noticed through notices_version."""
+
+    SLACK = 30  # seconds; covers transactions that committed a little after they stamped updated_at
+
+    def __init__(self, app, hub, interval):
+        self.app = app
+        self.hub = hub
+        self.interval = interval
+        self._version = None
+        self._since = datetime.utcnow()
+        self._seen = {}     # notice id -> updated_at already published
+        self._local = False  # a local commit was published since the last poll
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def seen_locally(self, changes):
+        with self._lock:
+            for _event, notice_id, _payload, updated_at in changes:
+                if updated_at is not None:
+                    self._seen[notice_id] = _second(updated_at)
+            self._local = True
+
+    def start(self):
+        with self._lock:
+            if self._thread is None and self.interval > 0:
+                self._thread = threading.Thread(target=self._run, name="notice-watcher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            if not self.hub.subscribers:
+                continue
+            with self.app.app_context():
+                try:
+                    self._poll()
+                except Exception:
+                    self.app.logger.exception("Notice watcher poll failed")
+                finally:
+                    db.session.remove()
+
+    def _poll(self):
+        version, _changed_at = peek_version("notices_version")
+        if self._version is None or version == self._version:
+            self._version = version
+            return
+        self._version = version
+
+        now = datetime.utcnow()
+        since = self._since - timedelta(seconds=self.SLACK)
+        changed = Notice.query.filter(Notice.updated_at >= since).order_by(Notice.updated_at).all()
+        with self._lock:
+            fresh = [n for n in changed if self._seen.get(n.id) != _second(n.updated_at)]
+            for n in fresh:
+                self._seen[n.id] = _second(n.updated_at)
+            self._seen = {k: v for k, v in self._seen.items() if v >= since}
+            local, self._local, self._since = self._local, False, now
+
+        for n in fresh:
+            self.hub.publish("notice", {**notice_payload(n), "action": "updated"})
+        if not fresh and not local:
+            # the version moved but no row did: another worker deleted something
+            self.hub.publish("refresh", {})
+
+
+def get_hub():
+    return current_app.extensions["notify"][0]
+
+
+def _async_worker():
+    """True when gevent or eventlet has patched this process, so a blocked stream costs a greenlet."""
+    if "gevent" in sys.modules:
+        from gevent import monkey
+        if monkey.is_module_patched("socket"):
+            return True
+    if "eventlet" in sys.modules:
+        from eventlet import patcher
+        return patcher.is_monkey_patched("socket")
+    return False
+
+
+def init_app(app):
+    if app.config.get("NOTIFY_STREAM_ENABLED") and not _async_worker():
+        app.logger.warning("NOTIFY_STREAM_ENABLED needs a gevent/eventlet worker; notice streaming stays off")
+        app.config["NOTIFY_STREAM_ENABLED"] = False
+
+    hub = Hub(history=app.config.get("NOTIFY_HISTORY", 256),
+              max_subscribers=app.config.get("NOTIFY_MAX_SUBSCRIBERS", 8))
+    watcher = Watcher(app, hub, int(app.config.get("NOTIFY_POLL_SECONDS", 5)))
+    app.extensions["notify"] = (hub, watcher)
+    _hubs.append((hub, watcher))
@@ -0,0 +1,137 @@
+# app/passwords.py
+"""
+Password hashing on a dedicated, bounded thread pool.
+
+Hashing is deliberately slow, and the login rush would otherwise run it on
+every request thread at once while dashboards wait. Here at most
+PASSWORD_HASH_WORKERS hashes run per worker process (hashlib releases the GIL
+while it works), at most PASSWORD_HASH_QUEUE more may wait, and a caller gives
+up after PASSWORD_HASH_TIMEOUT seconds. Anything beyond that raises
+``HasherBusy`` so the view can answer 503 straight away instead of piling up.
+
+New hashes use PASSWORD_HASH_METHOD / PASSWORD_SALT_LENGTH (Werkzeug
+formats, e.g. ``scrypt:32768:8:1`` or ``pbkdf2:sha256:1000000``).
+``needs_rehash`` tells whether a stored hash was made with other parameters;
+the login view upgrades it while it has the plain password in hand.
+
+Counters and latency percentiles are exposed through ``metrics()`` (see
+/admin/api/passwords/metrics).
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HasherBusy(RuntimeError):
+    """The hashing pool is full or didn't answer in time."""
+
+
+class Hasher:
+    def __init__(self, method, salt_length, workers=2, queue=32, timeout=5.0):
+        self.method = method
+        self.salt_length = salt_length
+        self.workers = workers
+        self.timeout = timeout
+        self.prefix = self._prefix(method, salt_length)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pwhash") if workers else None
+        self._slots = threading.BoundedSemaphore(workers + queue) if workers else None
+        self._latency = deque(maxlen=512)  # seconds from submit to result
+        self._lock = threading.Lock()
+        self.stats = {"hashed": 0, "verified": 0, "rejected": 0, "timeouts": 0, "in_flight": 0}
+
+    @staticmethod
+    def _prefix(method, salt_length):
+        # Werkzeug fills in default parameters ("scrypt" -> "scrypt:32768:8:1"), so ask it once
+        return generate_password_hash("", method=method, salt_length=salt_length).split("$", 1)[0]
+
+    def _run(self, kind, fn, *args):
+        if self._executor is None:
+            result = fn(*args)
+            with self._lock:
+                self.stats[kind] += 1
+            return result
+
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.stats["rejected"] += 1
+            raise HasherBusy("password hashing queue is full")
+
+        start = time.monotonic()
+        with self._lock:
+            self.stats["in_flight"] += 1
+
+        def done(_future):
+            with self._lock:
+                self.stats["in_flight"] -= 1
+            self._slots.release()
+
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(done)
+        try:
+            result = future.result(self.timeout)
+        except FutureTimeout:
+            future.cancel()  # only helps if it hasn't started yet
+            with self._lock:
+                self.stats["timeouts"] += 1
+            raise HasherBusy("password hashing timed out") from None
+        with self._lock:
+            self.stats[kind] += 1
+            self._latency.append(time.monotonic() - start)
+        return result
+
+    def hash(self, password):
+        return self._run("hashed", generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, stored, password):
+        return self._run("verified", check_password_hash, stored, password)
+
+    def needs_rehash(self, stored):
+        method, _, rest = (stored or "").partition("$")
+        salt = rest.partition("$")[0]
+        return method != self.prefix or len(salt) != self.salt_length
+
+    def metrics(self):
+        with self._lock:
+            out = dict(self.stats)
+            samples = sorted(self._latency)
+        if samples:
+            def pct(p):
+                return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 1)
+            out["latency_ms"] = {"p50": pct(0.50), "p95": pct(0.95), "max": pct(1.0), "samples": len(samples)}
+        out.update(method=self.prefix, workers=self.workers, timeout=self.timeout)
+        return out
+
+
+def _hasher():
+    return current_app.extensions["passwords"]
+
+
+def hash_password(password):
+    return _hasher().hash(password)
+
+
+def verify_password(stored, password):
+    return _hasher().verify(stored, password)
+
+
+def needs_rehash(stored):
+    return _hasher().needs_rehash(stored)
+
+
+def metrics():
+    hasher = current_app.extensions.get("passwords")
+    return hasher.metrics() if hasher else {}
+
+
+def init_app(app):
+    app.extensions["passwords"] = Hasher(
+        app.config.get("PASSWORD_HASH_METHOD", "scrypt"),
+        app.config.get("PASSWORD_SALT_LENGTH", 16),
+        workers=app.config.get("PASSWORD_HASH_WORKERS", 2),
+        queue=app.config.get("PASSWORD_HASH_QUEUE", 32),
+        timeout=app.config.get("PASSWORD_HASH_TIMEOUT", 5.0),
+    )
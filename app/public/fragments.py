@@ -0,0 +1,90 @@
+# app/public/fragments.py
+"""
+Rendered-fragment cache for the public homepage.
+
+Each section is rendered once from the macros in public/_home_sections.html and
+kept in memory until a commit touches the models it was built from (see the
+on_commit hooks below). The TTL only matters for writes made by other workers.
+"""
+from flask import current_app, get_template_attribute
+
+from app.cache import TTLCache, on_commit
+from app.catalog import get_catalog
+from app.counters import get_counts
+from app.models import Notice, Course, Department, StudentProfile
+
+SECTIONS_TEMPLATE = "public/_home_sections.html"
+
+fragments = TTLCache(maxsize=16, ttl=300)
+
+
+def _macro(name):
+    return get_template_attribute(SECTIONS_TEMPLATE, name)
+
+
+def _render_notices():
+    notices = Notice.query.order_by(Notice.posted_on.desc()).limit(4).all()
+    return {"counter": _macro("notices_counter")(notices)}
+
+
+def _render_departments():
+    departments = get_catalog().departments
+    return {
+        "filters": _macro("department_filters")(departments),
+        "options": _macro("department_options")(departments),
+    }
+
+
+def _render_courses():
+    courses = get_catalog().featured
+    return {
+        "cards": _macro("program_cards")(courses),
+        "options": _macro("program_options")(courses),
+    }
+
+
+SECTIONS = {
+    "notices": _render_notices,
+    "departments": _render_departments,
+    "courses": _render_courses,
+    "stats": get_counts,
+}
+
+
+def home_sections():
+    """Return {section: rendered pieces}, rendering only the sections that are not cached."""
+    ttl = current_app.config.get("HOME_FRAGMENT_TTL", fragments.ttl)
+    out = {}
+    for name, build in SECTIONS.items():
+        try:
+            out[name] = fragments.get_or_set(name, build, ttl)
+        except Exception:
+            # Failures are not cached; the next request tries again
+            current_app.logger.exception("Failed to render homepage section %s", name)
+            out[name] = {}
+    return out
+
+
+# -------------------------
+# Invalidation
+# -------------------------
+@on_commit(Notice)
+def _notices_changed(keys):
+    fragments.pop("notices")
+
+
+@on_commit(Department)
+def _departments_changed(keys):
+    fragments.pop("departments")
+    fragments.pop("courses")  # featured cards show the department name
+
+
+@on_commit(Course)
+def _courses_changed(keys):
+    fragments.pop("courses")
+    fragments.pop("stats")
+
+
+@on_commit(StudentProfile)
+def _students_changed(keys):
+    fragments.pop("stats")
@@ -1,51 +1,22 @@
 # app/public/routes.py
-from flask import Blueprint, render_template, jsonify, request, current_app, url_for,redirect,flash
-from datetime import datetime
-from app.models import Notice, Course, StudentProfile, Department, Application, ContactMessage
-from app.extensions import db
+from flask import Blueprint, render_template, jsonify, request, current_app, url_for,redirect,flash, Response, abort
+from app.models import Notice, NoticeCategory
+from app import ingest, notify
+from app.throttle import admission_control
+from app.counters import get_counts, get_version
+from app.http_cache import is_fresh, not_modified, with_validators
+from app.public.fragments import home_sections
+from app.pagination import decode_cursor, encode_cursor, parse_limit
+from app.catalog import catalog_key, get_catalog
+from app.search import search_notices
 
 public_bp = Blueprint("public", __name__, template_folder="../../templates/public", static_folder="../../static")
 
 
 @public_bp.route("/")
 def index():
-    # hero/stats logic unchanged — get dynamic counts
-    try:
-        courses_count = Course.query.count()
-    except Exception:
-        current_app.logger.exception("Failed to count courses")
-        courses_count = 0
-
-    try:
-        students_count = StudentProfile.query.count()
-    except Exception:
-        current_app.logger.exception("Failed to count students")
-        students_count = 0
-
-    try:
-        faculty_count = FacultyProfile.query.count()
-    except Exception:
-        current_app.logger.exception("Failed to count faculty")
-        faculty_count = 0
-
-    try:
-        notices = Notice.query.order_by(Notice.posted_on.desc()).limit(4).all()
-    except Exception:
-        notices = []
-
-    # departments and courses for earlier sections (if used)
-    try:
-        departments = Department.query.order_by(Department.name).all()
-    except Exception:
-        departments = []
-
-    try:
-        courses = Course.query.join(Department).order_by(Department.name, Course.title).limit(6).all()
-    except Exception:
-        courses = []
-
-    # Fetch a small list of faculty for server-render fallback
-
+    # notices, departments, featured courses and stats are cached rendered fragments
+    sections = home_sections()
 
     hero = {
         "title": current_app.config.get("HERO_TITLE", "Welcome to Our College"),
@@ -58,10 +29,8 @@ def index():
     return render_template(
         "public/index.html",
         hero=hero,
-        stats={"courses": courses_count, "students": students_count, "faculty": faculty_count},
-        notices=notices,
-        departments=departments,
-        courses=courses,
+        stats={**sections["stats"], "faculty": 0},  # no faculty model yet
+        fragments=sections,
 
     )
 
@@ -77,6 +46,12 @@ def api_notices():
         limit = 6
 
     try:
+        # Answer polls from the version stamp alone when nothing has changed
+        version, changed_at = get_version("notices_version")
+        etag = f"notices-{version}-{limit}"
+        if is_fresh(etag, changed_at):
+            return not_modified(etag, changed_at)
+
         # Sort by Pinned (descending) first, then Date (descending)
         q = Notice.query.order_by(Notice.is_pinned.desc(), Notice.posted_on.desc()).limit(limit).all()
         res = []
@@ -92,43 +67,97 @@ def api_notices():
                 "is_pinned": n.is_pinned,
                 "posted_on": n.posted_on.strftime('%d %b %Y') if n.posted_on else "New",
             })
-        return jsonify({"status": "ok", "notices": res})
+        return with_validators(jsonify({"status": "ok", "notices": res}), etag, changed_at)
     except Exception as e:
         current_app.logger.exception("Failed to fetch notices")
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+@public_bp.route("/api/notices/stream")
+def api_notice_stream():
+    """Server-sent events for new/changed notices; resumes from the Last-Event-ID header."""
+    if not current_app.config.get("NOTIFY_STREAM_ENABLED"):
+        abort(404)  # sync workers: clients poll /api/notices instead (see app/notify.py)
+    hub, watcher = current_app.extensions["notify"]
+    if not hub.subscribe():
+        resp = jsonify({"status": "error", "message": "Too many open streams"})
+        resp.status_code = 503
+        resp.headers["Retry-After"] = "30"
+        return resp
+    watcher.start()
+
+    cfg = current_app.config
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    resp = Response(
+        notify.stream(hub, last_event_id,
+                      heartbeat=cfg.get("NOTIFY_HEARTBEAT_SECONDS", 15),
+                      max_seconds=cfg.get("NOTIFY_STREAM_SECONDS", 600)),
+        mimetype="text/event-stream",
+    )
+    resp.call_on_close(hub.unsubscribe)
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
+
+
+@public_bp.route("/api/notices/search")
+def api_notice_search():
+    """
+    Ranked full-text search over notice titles and bodies.
+    Query args: q, category (e.g. "Exam"), limit (default 20, max 50).
+    """
+    q = request.args.get("q", "").strip()
+    category = request.args.get("category", "").strip() or None
+    limit = parse_limit(request.args.get("limit"), default=20, maximum=50)
+
+    if category and category not in {c.value for c in NoticeCategory}:
+        return jsonify({"status": "error", "message": "Unknown category"}), 400
+    if not q:
+        return jsonify({"status": "ok", "notices": []})
+
+    try:
+        hits = search_notices(q, category=category, limit=limit)
+    except Exception as e:
+        current_app.logger.exception("Notice search failed")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+    res = []
+    for score, n in hits:
+        res.append({
+            "id": n.id,
+            "title": n.title,
+            "body": n.body,
+            "category": n.category,
+            "is_pinned": n.is_pinned,
+            "posted_on": n.posted_on.strftime('%d %b %Y') if n.posted_on else "New",
+            "score": round(score, 3),
+        })
+    return jsonify({"status": "ok", "notices": res})
+
+
 @public_bp.route("/api/programs")
 def api_programs():
     """
     Returns featured programs (courses grouped by department)
     """
     try:
-        programs = (
-            db.session.query(
-                Course.id,
-                Course.title,
-                Course.code,
-                Department.name.label("department")
-            )
-            .join(Department, Course.department_id == Department.id)
-            .order_by(Department.name, Course.title)
-            .limit(6)
-            .all()
-        )
+        catalog = get_catalog()
+        etag = f"programs-{catalog.version}"
+        if is_fresh(etag, catalog.changed_at):
+            return not_modified(etag, catalog.changed_at)
 
         data = []
-        for p in programs:
+        for p in catalog.featured:
             data.append({
                 "id": p.id,
                 "title": p.title,
                 "code": p.code,
-                "department": p.department,
+                "department": p.department.name,
                 # dynamic image placeholder (no hardcoding)
                 "image": f"https://picsum.photos/seed/program-{p.id}/500/350"
             })
 
-        return jsonify({"status": "ok", "programs": data})
+        return with_validators(jsonify({"status": "ok", "programs": data}), etag, catalog.changed_at)
 
     except Exception as e:
         current_app.logger.exception("Programs API failed")
@@ -136,16 +165,28 @@ def api_programs():
 
 @public_bp.route("/api/programs/filter")
 def filter_programs():
+    """
+    Keyset-paginated program catalog, served from the in-process catalog snapshot.
+    Query args: department (id), limit (default 24, max 100), cursor (from the previous page's next_cursor).
+    """
     dept_id = request.args.get("department")
+    dept_id = int(dept_id) if dept_id and dept_id.isdigit() else None
+    limit = parse_limit(request.args.get("limit"), default=24, maximum=100)
 
-    q = Course.query.join(Department)
-    if dept_id and dept_id.isdigit():
-        q = q.filter(Course.department_id == int(dept_id))
+    after = None
+    cursor = request.args.get("cursor")
+    if cursor:
+        try:
+            after = decode_cursor(cursor, 3)
+            if not (isinstance(after[0], int) and isinstance(after[1], str) and isinstance(after[2], int)):
+                raise ValueError("Invalid cursor")
+        except ValueError:
+            return jsonify({"status": "error", "message": "Invalid cursor"}), 400
 
-    courses = q.order_by(Course.title).all()
+    rows, has_more = get_catalog().page(dept_id, after, limit)
 
     data = []
-    for c in courses:
+    for c in rows:
         data.append({
             "id": c.id,
             "title": c.title,
@@ -154,9 +195,11 @@ def filter_programs():
             "image": f"https://picsum.photos/seed/course-{c.id}/500/350"
         })
 
-    return jsonify({"status": "ok", "courses": data})
+    next_cursor = encode_cursor(catalog_key(rows[-1])) if has_more else None
+    return jsonify({"status": "ok", "courses": data, "next_cursor": next_cursor})
 
 @public_bp.route("/apply", methods=["POST"])
+@admission_control("public.apply")
 def apply():
     """
     Accepts application form from Enroll modal.
@@ -176,35 +219,33 @@ def apply():
         flash("Name and email are required.", "danger")
         return redirect(url_for("public.index"))
 
-    # Resolve program id to int if provided
+    # Resolve program id to int if provided (checked against the catalog snapshot, no query)
     program_id = None
     if program:
         try:
             program_id = int(program)
-            # optional: verify program exists
-            if not Course.query.get(program_id):
+            if program_id not in get_catalog().by_id:
                 program_id = None
         except Exception:
             program_id = None
 
-    # Persist application
-    app_row = Application(
-        name=name,
-        email=email,
-        phone=phone,
-        program_id=program_id,
-        message=message or None,
-        status="new",
-    )
-    db.session.add(app_row)
-    db.session.commit()
+    payload = {"name": name, "email": email, "phone": phone, "program_id": program_id, "message": message}
+    error = ingest.validate("application", payload)
+    if error:
+        if request.headers.get("X-Requested-With") == "XMLHttpRequest" or request.is_json:
+            return jsonify({"status": "error", "message": error}), 400
+        flash(error, "danger")
+        return redirect(url_for("public.index"))
+
+    # Spool the application; the ingest flusher inserts it in the next batch
+    ticket = ingest.submit("application", payload)
 
     # Logging + response
-    current_app.logger.info("Saved application id=%s name=%s email=%s", app_row.id, name, email)
+    current_app.logger.info("Queued application ticket=%s name=%s email=%s", ticket, name, email)
 
     # 🔑 THIS IS THE IMPORTANT PART
     if request.headers.get("X-Requested-With") == "XMLHttpRequest":
-        return jsonify({"status": "ok", "id": app_row.id})
+        return jsonify({"status": "ok", "ticket": ticket})
 
     flash("Application received — we will contact you soon.", "success")
     return redirect(url_for("public.index"))
@@ -214,15 +255,10 @@ def apply():
 def about():
     # dynamic content for facts
     try:
-        courses_count = Course.query.count()
+        counts = get_counts()
     except Exception:
-        current_app.logger.exception("Count courses failed")
-        courses_count = 0
-    try:
-        students_count = StudentProfile.query.count()
-    except Exception:
-        students_count = 0
-
+        current_app.logger.exception("Failed to read site counters")
+        counts = {}
 
     # Simple leadership sample (server fallback). Replace with real data when you have it.
     leadership = [
@@ -242,8 +278,8 @@ def about():
     ])
 
     facts = {
-        "courses": courses_count,
-        "students": students_count,
+        "courses": counts.get("courses", 0),
+        "students": counts.get("students", 0),
 
     }
 
@@ -259,6 +295,7 @@ def about():
 
 # CONTACT routes
 @public_bp.route("/contact", methods=["GET", "POST"])
+@admission_control("public.contact")
 def contact():
     if request.method == "POST":
         name = request.form.get("name", "").strip()
@@ -273,13 +310,19 @@ def contact():
             flash("Please fill required fields: name, email and message.", "danger")
             return redirect(url_for("public.contact"))
 
-        cm = ContactMessage(name=name, email=email, subject=subject or None, message=message)
-        db.session.add(cm)
-        db.session.commit()
-        current_app.logger.info("Saved contact message id=%s from %s", cm.id, cm.email)
+        payload = {"name": name, "email": email, "subject": subject, "message": message}
+        error = ingest.validate("contact", payload)
+        if error:
+            if request.headers.get("X-Requested-With") == "XMLHttpRequest":
+                return jsonify({"status": "error", "message": error}), 400
+            flash(error, "danger")
+            return redirect(url_for("public.contact"))
+
+        ticket = ingest.submit("contact", payload)
+        current_app.logger.info("Queued contact message ticket=%s from %s", ticket, email)
 
         if request.headers.get("X-Requested-With") == "XMLHttpRequest":
-            return jsonify({"status": "ok", "id": cm.id})
+            return jsonify({"status": "ok", "ticket": ticket})
 
         flash("Thank you — your message has been received.", "success")
         return redirect(url_for("public.contact"))
@@ -0,0 +1,539 @@
+# app/search.py
+"""
+In-process search indexes.
+
+``InvertedIndex`` is a small BM25-ranked inverted index: term -> {doc id: term
+frequency}, where title terms count ``TITLE_WEIGHT`` times. Documents are added
+and removed incrementally; the last query term also matches as a prefix so the
+search box works while the user is still typing.
+
+The notice index is built lazily from the database, kept current by commit
+hooks on Notice, and rebuilt when ``notices_version`` shows another worker
+wrote (checked at most every SEARCH_CHECK_SECONDS). Versions produced by this
+worker's own commits are recorded, so they don't trigger a rebuild.
+
+``TrigramIndex`` backs the admin search boxes (applications, contact messages,
+students): every word is split into trigrams, so a query matches anywhere
+inside a name, email or admission number, and misspelled queries still find
+rows sharing MIN_SIMILARITY of their trigrams. Leading-wildcard LIKE can't use
+an index; this answers from memory without touching those tables.
+"""
+import math
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from flask import current_app
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+
+from app.cache import on_commit
+from app.counters import get_version, peek_version
+from app.extensions import db
+from app.models import Application, ContactMessage, Notice, SiteCounter, StudentProfile, User
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+TITLE_WEIGHT = 3
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+class InvertedIndex:
+    def __init__(self):
+        self.docs = {}       # doc id -> stored document
+        self.lengths = {}    # doc id -> weighted token count
+        self.postings = {}   # term -> {doc id: weighted tf}
+        self.doc_terms = {}  # doc id -> its terms, so removal doesn't scan the vocabulary
+        self._terms = None   # sorted vocabulary for prefix lookups, rebuilt lazily
+        self._lock = threading.RLock()
+
+    def add(self, doc_id, doc, title, body):
+        counts = {}
+        for term in tokenize(title):
+            counts[term] = counts.get(term, 0) + TITLE_WEIGHT
+        for term in tokenize(body):
+            counts[term] = counts.get(term, 0) + 1
+
+        with self._lock:
+            self._remove(doc_id)
+            self.docs[doc_id] = doc
+            self.lengths[doc_id] = sum(counts.values())
+            self.doc_terms[doc_id] = tuple(counts)
+            for term, tf in counts.items():
+                if term not in self.postings:
+                    self._terms = None
+                self.postings.setdefault(term, {})[doc_id] = tf
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        if self.docs.pop(doc_id, None) is None:
+            return
+        self.lengths.pop(doc_id, None)
+        for term in self.doc_terms.pop(doc_id, ()):
+            del self.postings[term][doc_id]
+            if not self.postings[term]:
+                del self.postings[term]
+                self._terms = None
+
+    def _expand(self, prefix):
+        if self._terms is None:
+            self._terms = sorted(self.postings)
+        i = bisect_left(self._terms, prefix)
+        out = []
+        while i < len(self._terms) and self._terms[i].startswith(prefix) and len(out) < 50:
+            out.append(self._terms[i])
+            i += 1
+        return out
+
+    def search(self, query, where=None, limit=20):
+        """Return [(score, doc)] best first. `where(doc)` filters candidates."""
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            n = len(self.docs)
+            if not n:
+                return []
+            avg_len = sum(self.lengths.values()) / n
+
+            # every term but the last is matched exactly; the last also as a prefix
+            groups = [[t] for t in terms[:-1]]
+            groups.append(self._expand(terms[-1]) or [terms[-1]])
+
+            scores = {}
+            for group in groups:
+                for term in group:
+                    docs = self.postings.get(term)
+                    if not docs:
+                        continue
+                    idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+                    for doc_id, tf in docs.items():
+                        norm = tf + K1 * (1 - B + B * self.lengths[doc_id] / avg_len)
+                        scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (K1 + 1) / norm
+
+            hits = [(score, self.docs[doc_id]) for doc_id, score in scores.items()]
+
+        if where:
+            hits = [h for h in hits if where(h[1])]
+        hits.sort(key=lambda h: (h[0], h[1].posted_on or datetime.min), reverse=True)
+        return hits[:limit]
+
+
+# -------------------------
+# Notices
+# -------------------------
+class NoticeDoc(NamedTuple):
+    id: int
+    title: str
+    body: str
+    category: str
+    is_pinned: bool
+    posted_on: Optional[datetime]
+
+
+def _notice_doc(n):
+    category = n.category.value if n.category else "General"
+    return NoticeDoc(n.id, n.title, n.body, category, bool(n.is_pinned), n.posted_on)
+
+
+_notices = None
+_notices_version = None
+_notices_checked_at = 0.0
+_notices_lock = threading.Lock()
+_local_versions = set()  # notices_version values produced by this worker's commits
+
+
+def _build_notice_index():
+    global _notices, _notices_version, _notices_checked_at
+    with _notices_lock:
+        version, _changed_at = get_version("notices_version")
+        index = InvertedIndex()
+        for n in Notice.query.with_entities(Notice.id, Notice.title, Notice.body, Notice.category,
+                                            Notice.is_pinned, Notice.posted_on).yield_per(500):
+            doc = _notice_doc(n)
+            index.add(doc.id, doc, doc.title, doc.body)
+        _notices, _notices_version, _notices_checked_at = index, version, time.monotonic()
+        _local_versions.difference_update([v for v in _local_versions if v <= version])
+    return index
+
+
+def _only_local(version):
+    """True (and the index adopts `version`) if every bump since the index's version was a local commit."""
+    global _notices_version
+    with _notices_lock:
+        base = _notices_version
+        if base is None or version < base or not all(v in _local_versions for v in range(base + 1, version + 1)):
+            return False
+        _notices_version = version
+        _local_versions.difference_update([v for v in _local_versions if v <= version])
+        return True
+
+
+def notice_index():
+    global _notices_checked_at
+    index = _notices
+    if index is None:
+        return _build_notice_index()
+
+    interval = current_app.config.get("SEARCH_CHECK_SECONDS", 30)
+    if time.monotonic() - _notices_checked_at > interval:
+        _notices_checked_at = time.monotonic()
+        version, _changed_at = peek_version("notices_version")
+        if version != _notices_version and not _only_local(version):
+            return _build_notice_index()
+    return index
+
+
+def search_notices(query, category=None, limit=20):
+    where = (lambda d: d.category == category) if category else None
+    return notice_index().search(query, where=where, limit=limit)
+
+
+def _notice_change(n):
+    # evaluated at flush time, while the instance is still loaded
+    if n in object_session(n).deleted:
+        return (n.id, None)
+    return (n.id, _notice_doc(n))
+
+
+# Registered after app.counters' listeners (imported above), so each of these
+# runs right after the notices_version bump for the same row, on the same connection.
+def _version_bumped(mapper, connection, target):
+    version = connection.execute(
+        select(SiteCounter.value).where(SiteCounter.name == "notices_version")).scalar()
+    if version is not None:
+        object_session(target).info.setdefault("notice_versions", []).append(version)
+
+
+for _evt in ("after_insert", "after_update", "after_delete"):
+    event.listen(Notice, _evt, _version_bumped)
+
+
+@event.listens_for(Session, "after_commit")
+def _versions_committed(session):
+    versions = session.info.pop("notice_versions", None)
+    if versions:
+        with _notices_lock:
+            _local_versions.update(versions)
+
+
+@event.listens_for(Session, "after_rollback")
+def _versions_discarded(session):
+    session.info.pop("notice_versions", None)
+
+
+@on_commit(Notice, key=_notice_change)
+def _notices_changed(changes):
+    index = _notices
+    if index is None:
+        return
+    for doc_id, doc in changes:
+        if doc is None:
+            index.remove(doc_id)
+        else:
+            index.add(doc_id, doc, doc.title, doc.body)
+
+
+# -------------------------
+# Trigram index
+# -------------------------
+WORD_RE = re.compile(r"[^\W_]+")
+MIN_SIMILARITY = 0.3   # share of the query's trigrams a fuzzy hit must contain
+VERIFY_FACTOR = 8      # candidates re-scored exactly per requested hit
+
+
+def _grams(text, padded=True):
+    """Distinct trigrams of each word; padded words also yield ' ab'/'yz ' edge grams."""
+    out = set()
+    for word in WORD_RE.findall(text):
+        if padded:
+            word = f" {word} "
+        elif len(word) < 3:
+            # too short for an interior trigram: match it as a word prefix instead
+            word = f" {word}"
+        out.update(word[i:i + 3] for i in range(len(word) - 2))
+    return out
+
+
+class TrigramIndex:
+    """
+    Substring and typo-tolerant matching over short fields (names, emails,
+    admission numbers). Postings are compact arrays of doc ids that only grow;
+    a changed or removed document leaves stale entries behind, which scoring
+    ignores (it re-checks the current text) and which are compacted away once
+    they make up half of all postings.
+    """
+
+    def __init__(self):
+        self.docs = {}      # doc id -> normalized text
+        self.postings = {}  # trigram -> array of doc ids
+        self._size = 0      # posting entries in total
+        self._stale = 0     # of which point at old text
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, doc_id, *fields):
+        text = " ".join(str(f) for f in fields if f).lower()
+        with self._lock:
+            old = self.docs.get(doc_id)
+            if old == text:
+                return
+            if old is not None:
+                self._stale += len(_grams(old))
+            self.docs[doc_id] = text
+            for gram in _grams(text):
+                postings = self.postings.get(gram)
+                if postings is None:
+                    postings = self.postings[gram] = array("q")
+                postings.append(doc_id)
+                self._size += 1
+            self._maybe_compact()
+
+    def remove(self, doc_id):
+        with self._lock:
+            old = self.docs.pop(doc_id, None)
+            if old is not None:
+                self._stale += len(_grams(old))
+                self._maybe_compact()
+
+    def _maybe_compact(self):
+        if self._stale * 2 <= self._size or self._size < 1024:
+            return
+        postings = {}
+        for doc_id, text in self.docs.items():
+            for gram in _grams(text):
+                postings.setdefault(gram, array("q")).append(doc_id)
+        self.postings = postings
+        self._size = sum(len(p) for p in postings.values())
+        self._stale = 0
+
+    def search(self, query, limit=20):
+        """Return [(score, doc id)] best first. Substring matches score above 1, fuzzy ones in (0, 1]."""
+        query = (query or "").lower().strip()
+        grams = _grams(query, padded=False)
+        if not grams:
+            return []
+        words = WORD_RE.findall(query)
+
+        need = max(1, math.ceil(len(grams) * MIN_SIMILARITY))
+        with self._lock:
+            # a hit holds at least `need` of the query's grams, so it holds one of the
+            # len - need + 1 rarest: counting those skips the huge lists ("com", "adm")
+            lists = sorted((self.postings.get(g, ()) for g in grams), key=len)
+            counts = Counter()
+            for postings in lists[:len(grams) - need + 1]:
+                counts.update(postings)  # counting runs in C
+            docs = self.docs
+            candidates = counts.most_common(limit * VERIFY_FACTOR)
+
+            hits = []
+            for doc_id, _n in candidates:
+                text = docs.get(doc_id)
+                if text is None:
+                    continue  # removed; its postings are stale
+                if all(w in text for w in words):
+                    # every word is a substring; prefer matches at word starts and shorter texts
+                    starts = sum(1 for w in words if re.search(r"(?<![^\W_])" + re.escape(w), text))
+                    score = 2 + starts / len(words) - len(text) / 1000
+                else:
+                    matched = len(grams & _grams(text))
+                    if matched < need:
+                        continue  # stale postings inflated the count
+                    score = matched / len(grams)
+                hits.append((score, doc_id))
+
+        hits.sort(reverse=True)
+        return hits[:limit]
+
+
+# -------------------------
+# Admin entity indexes
+# -------------------------
+class EntityIndex:
+    """
+    A TrigramIndex over one table, built lazily. Local commits update it through
+    the hooks below. Other workers' writes are picked up every
+    SEARCH_CHECK_SECONDS by ``catch_up`` (new ids, or rows with a recent
+    updated_at), and the whole index is rebuilt in the background every
+    SEARCH_REBUILD_SECONDS for what that can't see (their edits and deletes of
+    applications/contacts). Callers re-read hits from the database, so a stale
+    entry can only cost a missing or extra candidate, never stale data on screen.
+    """
+
+    SLACK = 30  # seconds; covers transactions that committed a little after they stamped updated_at
+
+    def __init__(self, name, rows, catch_up):
+        self.name = name
+        self._rows = rows          # () -> iterable of (id, *fields)
+        self._catch_up = catch_up  # (last id, since datetime) -> iterable of (id, *fields)
+        self.index = None
+        self.last_id = 0
+        self.synced_at = None
+        self.checked_at = 0.0
+        self.built_at = 0.0
+        self.pending = False       # a local commit asked for a catch-up
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._rebuilding = False
+
+    @staticmethod
+    def _fill(index, rows, last_id):
+        for row in rows:
+            index.add(row[0], *row[1:])
+            last_id = max(last_id, row[0])
+        return last_id
+
+    def build(self):
+        started = datetime.utcnow()
+        index = TrigramIndex()
+        # the live index keeps its own cursor until the swap below
+        last_id = self._fill(index, self._rows(), 0)
+        with self._lock:
+            self.index, self.last_id, self.synced_at = index, last_id, started
+            self.checked_at = self.built_at = time.monotonic()
+        return index
+
+    def _rebuild_in_background(self, app):
+        def run():
+            with app.app_context():
+                try:
+                    self.build()
+                except Exception:
+                    app.logger.exception("Rebuilding the %s search index failed", self.name)
+                finally:
+                    db.session.remove()
+                    self._rebuilding = False
+
+        self._rebuilding = True
+        threading.Thread(target=run, name=f"search-{self.name}", daemon=True).start()
+
+    def get(self):
+        index = self.index
+        if index is None:
+            with self._build_lock:
+                # the first search in a worker builds it; concurrent ones wait for that build
+                return self.index or self.build()
+
+        config = current_app.config
+        now = time.monotonic()
+        if self.pending or now - self.checked_at > config.get("SEARCH_CHECK_SECONDS", 30):
+            self.pending = False
+            self.checked_at = now
+            started = datetime.utcnow()
+            since = self.synced_at - timedelta(seconds=self.SLACK)
+            last_id = self._fill(index, self._catch_up(self.last_id, since), self.last_id)
+            with self._lock:
+                if self.index is index:  # a rebuild swapped in meanwhile has its own cursor
+                    self.last_id, self.synced_at = last_id, started
+
+        rebuild_every = config.get("SEARCH_REBUILD_SECONDS", 900)
+        if rebuild_every and now - self.built_at > rebuild_every and not self._rebuilding:
+            self.built_at = now
+            self._rebuild_in_background(current_app._get_current_object())
+        return index
+
+    def search(self, query, limit=20):
+        return self.get().search(query, limit=limit)
+
+
+def _stream(stmt):
+    return db.session.execute(stmt.execution_options(yield_per=2000))
+
+
+def _application_rows(where=None):
+    stmt = select(Application.id, Application.name, Application.email, Application.phone)
+    return _stream(stmt.where(where) if where is not None else stmt)
+
+
+def _contact_rows(where=None):
+    stmt = select(ContactMessage.id, ContactMessage.name, ContactMessage.email)
+    return _stream(stmt.where(where) if where is not None else stmt)
+
+
+def _student_rows(where=None):
+    stmt = (select(StudentProfile.id, User.first_name, User.last_name, User.email, StudentProfile.admission_no)
+            .join(User, User.id == StudentProfile.user_id))
+    return _stream(stmt.where(where) if where is not None else stmt)
+
+
+def _student_catch_up(last_id, since):
+    # two indexed range scans rather than one OR across both tables
+    yield from _student_rows(StudentProfile.updated_at >= since)
+    yield from _student_rows(User.updated_at >= since)
+
+
+applications_index = EntityIndex(
+    "applications", _application_rows, lambda last_id, since: _application_rows(Application.id > last_id))
+contacts_index = EntityIndex(
+    "contacts", _contact_rows, lambda last_id, since: _contact_rows(ContactMessage.id > last_id))
+students_index = EntityIndex("students", _student_rows, _student_catch_up)
+
+
+def search_applications(query, limit=50):
+    return applications_index.search(query, limit)
+
+
+def search_contacts(query, limit=50):
+    return contacts_index.search(query, limit)
+
+
+def search_students(query, limit=50):
+    return students_index.search(query, limit)
+
+
+def _inbox_change(obj):
+    # evaluated at flush time, while the instance is still loaded
+    if obj in object_session(obj).deleted:
+        return (type(obj), obj.id, None)
+    fields = (obj.name, obj.email, obj.phone) if isinstance(obj, Application) else (obj.name, obj.email)
+    return (type(obj), obj.id, fields)
+
+
+@on_commit(Application, ContactMessage, key=_inbox_change)
+def _inbox_changed(changes):
+    for model, doc_id, fields in changes:
+        index = (applications_index if model is Application else contacts_index).index
+        if index is None:
+            continue
+        if fields is None:
+            index.remove(doc_id)
+        else:
+            index.add(doc_id, *fields)
+
+
+def _deleted_profile(obj):
+    if isinstance(obj, StudentProfile) and obj in object_session(obj).deleted:
+        return obj.id
+    return None
+
+
+@on_commit(User, StudentProfile, key=_deleted_profile)
+def _students_changed(removed):
+    index = students_index.index
+    if index is None:
+        return
+    for doc_id in removed:
+        if doc_id is not None:
+            index.remove(doc_id)
+    # names/emails/admission numbers are re-read on the next search (no queries in commit hooks)
+    students_index.pending = True
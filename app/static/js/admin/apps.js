@@ -9,50 +9,50 @@ document.addEventListener("DOMContentLoaded", function() {
 
     let currentItemId = null;
 
-    // View Item
-    document.querySelectorAll('.view-item').forEach(btn => {
-        btn.addEventListener('click', function() {
-            currentItemId = this.dataset.id;
-            modalBody.innerHTML = '<div class="text-center py-3">Loading...</div>';
-            modal.show();
+    // View Item (delegated, so rows loaded later work too)
+    document.getElementById('apps-list-body').addEventListener('click', function(e) {
+        const btn = e.target.closest('.view-item');
+        if (!btn) return;
+        currentItemId = btn.dataset.id;
+        modalBody.innerHTML = '<div class="text-center py-3">Loading...</div>';
+        modal.show();
 
-            fetch(`/admin/api/apps/${currentItemId}`)
-                .then(r => r.json())
-                .then(res => {
-                    if(res.status === 'ok') {
-                        const d = res.data;
-                        let content = `
-                            <div class="mb-3">
-                                <strong>From:</strong> ${d.name}<br>
-                                <strong>Phone:</strong> ${d.phone}<br>
-                                <strong>Email:</strong> ${d.email}<br>
-                                <strong>Date:</strong> ${d.created_at.replace('T', ' ')}
-                            </div>
-                            <hr>
-                            <div class="p-3 bg-light rounded border mb-3">
-                            <strong>Message:</strong><br>
-                                ${d.message || d.summary || '(No content)'}
-                            </div>
-                        `;
+        fetch(`/admin/api/apps/${currentItemId}`)
+            .then(r => r.json())
+            .then(res => {
+                if(res.status === 'ok') {
+                    const d = res.data;
+                    let content = `
+                        <div class="mb-3">
+                            <strong>From:</strong> ${d.name}<br>
+                            <strong>Phone:</strong> ${d.phone}<br>
+                            <strong>Email:</strong> ${d.email}<br>
+                            <strong>Date:</strong> ${d.created_at.replace('T', ' ')}
+                        </div>
+                        <hr>
+                        <div class="p-3 bg-light rounded border mb-3">
+                        <strong>Message:</strong><br>
+                            ${d.message || d.summary || '(No content)'}
+                        </div>
+                    `;
 
-                        if(res.type === 'application') {
-                            content = `
-                                <div class="alert alert-info">Program of Interest: <strong>${d.program}</strong></div>
-                                ${content}
-                                <div class="mt-2"><strong>Phone:</strong> ${d.phone || 'N/A'}</div>
-                            `;
-                            markBtn.textContent = (d.status === 'new') ? "Mark Accepted" : "Mark New";
-                        } else {
-                            content = `
-                                <h5>${d.subject || 'No Subject'}</h5>
-                                ${content}
-                            `;
-                            markBtn.textContent = (d.is_read) ? "Mark Unread" : "Mark Read";
-                        }
-                        modalBody.innerHTML = content;
+                    if(res.type === 'application') {
+                        content = `
+                            <div class="alert alert-info">Program of Interest: <strong>${d.program}</strong></div>
+                            ${content}
+                            <div class="mt-2"><strong>Phone:</strong> ${d.phone || 'N/A'}</div>
+                        `;
+                        markBtn.textContent = (d.status === 'new') ? "Mark Accepted" : "Mark New";
+                    } else {
+                        content = `
+                            <h5>${d.subject || 'No Subject'}</h5>
+                            ${content}
+                        `;
+                        markBtn.textContent = (d.is_read) ? "Mark Unread" : "Mark Read";
                     }
-                });
-        });
+                    modalBody.innerHTML = content;
+                }
+            });
     });
 
     // Mark as Read/Accepted
@@ -81,22 +81,77 @@ document.addEventListener("DOMContentLoaded", function() {
             });
     });
 
-    // Search / Refresh logic (simple reload for now)
-    document.getElementById('apps-refresh').addEventListener('click', () => location.reload());
-    document.getElementById('apps-search').addEventListener('change', function() {
-        const q = this.value;
-        fetch(`/admin/api/apps?q=${encodeURIComponent(q)}`)
+    // Filters, search and paging: everything goes through /admin/api/apps with a cursor
+    const tbody = document.getElementById('apps-list-body');
+    const moreWrap = document.getElementById('apps-more-wrap');
+    const moreBtn = document.getElementById('apps-more');
+
+    function escapeHtml(value) {
+        const div = document.createElement('div');
+        div.textContent = value == null ? '' : String(value);
+        return div.innerHTML;
+    }
+
+    function formatDate(iso) {
+        if (!iso) return '-';
+        const d = new Date(iso);
+        return d.toLocaleDateString(undefined, { day: '2-digit', month: 'short' }) + ' ' +
+               d.toLocaleTimeString(undefined, { hour: '2-digit', minute: '2-digit', hour12: false });
+    }
+
+    function renderRow(it) {
+        const typeBadge = it.type === 'application'
+            ? '<span class="badge bg-primary bg-opacity-10 text-primary">Application</span>'
+            : '<span class="badge bg-warning bg-opacity-10 text-warning">Message</span>';
+        const statusBadge = (it.status === 'new' || it.status === 'unread')
+            ? '<span class="badge bg-success">New</span>'
+            : `<span class="text-muted small">${escapeHtml(it.status)}</span>`;
+        const tr = document.createElement('tr');
+        tr.dataset.itemId = it.id;
+        tr.innerHTML = `
+            <td>${typeBadge}</td>
+            <td>
+                <div class="fw-bold text-dark">${escapeHtml(it.name)}</div>
+                <div class="small text-muted">${escapeHtml(it.email)}</div>
+            </td>
+            <td class="small text-secondary text-truncate" style="max-width: 300px;">${escapeHtml(it.phone)}</td>
+            <td class="small text-secondary text-truncate" style="max-width: 300px;">${escapeHtml(it.summary)}</td>
+            <td>${statusBadge}</td>
+            <td class="small text-muted">${formatDate(it.created_at)}</td>
+            <td class="text-end">
+                <button class="btn btn-sm btn-outline-primary view-item" data-id="${escapeHtml(it.id)}">View</button>
+            </td>
+        `;
+        return tr;
+    }
+
+    function loadPage(cursor) {
+        const params = new URLSearchParams({
+            type: document.getElementById('apps-type').value,
+            status: document.getElementById('apps-status').value,
+            q: document.getElementById('apps-search').value.trim(),
+        });
+        if (cursor) params.set('cursor', cursor);
+        moreBtn.disabled = true;
+
+        fetch(`/admin/api/apps?${params}`)
             .then(r => r.json())
             .then(res => {
-                const tbody = document.getElementById('apps-list-body');
-                tbody.innerHTML = '';
-                res.items.forEach(it => {
-                    // Rebuild rows (simplified for brevity)
-                    const tr = document.createElement('tr');
-                    tr.innerHTML = `<td>${it.type}</td><td>${it.name}</td><td>${it.summary}</td><td>${it.status}</td><td>${it.created_at}</td><td class="text-end"><button class="btn btn-sm btn-primary view-item" data-id="${it.id}">View</button></td>`;
-                    tbody.appendChild(tr);
-                });
-                // Re-bind click events for new buttons...
-            });
-    });
-});
\ No newline at end of file
+                if (res.status !== 'ok') return;
+                if (!cursor) tbody.innerHTML = '';
+                res.items.forEach(it => tbody.appendChild(renderRow(it)));
+                if (!cursor && res.items.length === 0) {
+                    tbody.innerHTML = '<tr><td colspan="7" class="text-center py-4 text-muted">No items found</td></tr>';
+                }
+                moreBtn.dataset.cursor = res.next_cursor || '';
+                moreWrap.classList.toggle('d-none', !res.next_cursor);
+            })
+            .finally(() => { moreBtn.disabled = false; });
+    }
+
+    moreBtn.addEventListener('click', () => loadPage(moreBtn.dataset.cursor));
+    document.getElementById('apps-refresh').addEventListener('click', () => loadPage(null));
+    document.getElementById('apps-type').addEventListener('change', () => loadPage(null));
+    document.getElementById('apps-status').addEventListener('change', () => loadPage(null));
+    document.getElementById('apps-search').addEventListener('change', () => loadPage(null));
+});
@@ -15,16 +15,11 @@ document.addEventListener("DOMContentLoaded", function () {
     try {
       const data = await fetchJson("/admin/api/stats");
       if (data && data.status === "ok" && data.stats) {
-        const s = data.stats;
-        document.getElementById("stat-total-apps").textContent = s.total_apps;
-        document.getElementById("stat-new-apps").textContent = s.new_apps;
-        document.getElementById("stat-total-contacts").textContent = s.total_contacts;
-        document.getElementById("stat-unread-contacts").textContent = s.unread_contacts;
-        document.getElementById("stat-pending-users").textContent = s.pending_users;
-        document.getElementById("stat-total-users").textContent = s.total_users;
-        document.getElementById("stat-courses").textContent = s.courses;
-        document.getElementById("stat-students").textContent = s.students;
-        document.getElementById("stat-faculty").textContent = s.faculty;
+        // keys map to elements "stat-<key with dashes>"; counters the page doesn't show are skipped
+        Object.entries(data.stats).forEach(([key, value]) => {
+          const el = document.getElementById("stat-" + key.replace(/_/g, "-"));
+          if (el) el.textContent = value;
+        });
       }
     } catch (err) {
       console.error("refreshStats error", err);
@@ -88,18 +83,28 @@ document.addEventListener("DOMContentLoaded", function () {
     }
   }
 
-  // initial load
-  refreshStats();
-  refreshRecentApps();
-  refreshRecentContacts();
+  function refreshAll() {
+    const jobs = [refreshStats()];
+    // the recent lists only refresh on pages that render them with these ids
+    if (document.getElementById("recent-apps-body")) jobs.push(refreshRecentApps());
+    if (document.getElementById("recent-contacts-body")) jobs.push(refreshRecentContacts());
+    return Promise.all(jobs);
+  }
+
+  // the counters come from a short-lived server cache, so polling them is cheap
+  setInterval(function () {
+    if (!document.hidden) refreshStats();
+  }, 30000);
 
   if (refreshBtn) {
-    refreshBtn.addEventListener("click", function () {
-      refreshBtn.disabled = true;
+    refreshBtn.addEventListener("click", function (e) {
+      e.preventDefault();
+      const label = refreshBtn.innerHTML;
+      refreshBtn.classList.add("disabled");
       refreshBtn.textContent = "Refreshing…";
-      Promise.all([refreshStats(), refreshRecentApps(), refreshRecentContacts()]).finally(() => {
-        refreshBtn.disabled = false;
-        refreshBtn.textContent = "Refresh";
+      refreshAll().finally(() => {
+        refreshBtn.classList.remove("disabled");
+        refreshBtn.innerHTML = label;
       });
     });
   }
@@ -3,6 +3,7 @@
 const createModal = new bootstrap.Modal(document.getElementById('createExamModal'));
 const marksModal = new bootstrap.Modal(document.getElementById('marksModal'));
 let currentExamId = null;
+let currentSheetVersion = null;  // results_version the open sheet was loaded at
 
 document.addEventListener("DOMContentLoaded", () => {
     loadExams();
@@ -90,6 +91,7 @@ function openMarksModal(examId) {
             if(res.status === 'success') {
                 document.getElementById('marksModalLabel').textContent = `Enter Marks: ${res.exam.title}`;
                 document.getElementById('marksModalSubtitle').textContent = `Max Marks: ${res.exam.total_marks}`;
+                currentSheetVersion = res.version;
 
                 tbody.innerHTML = '';
                 if(res.students.length === 0) {
@@ -132,13 +134,18 @@ function saveMarks() {
     fetch(`/admin/api/exams/${currentExamId}/results`, {
         method: 'POST',
         headers: {'Content-Type': 'application/json'},
-        body: JSON.stringify({ rows: rows })
+        body: JSON.stringify({ rows: rows, version: currentSheetVersion })
     })
     .then(r => r.json())
     .then(res => {
         if(res.status === 'success') {
+            currentSheetVersion = res.version;
             alert("Results saved successfully!");
             marksModal.hide();
+        } else if(res.status === 'conflict') {
+            // someone saved this exam after we loaded it; reload rather than overwrite their marks
+            alert(res.message + " The sheet will be reloaded; re-enter your changes.");
+            openMarksModal(currentExamId);
         } else {
             alert("Error saving results.");
         }
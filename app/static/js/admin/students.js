@@ -3,7 +3,11 @@
 document.addEventListener("DOMContentLoaded", function() {
     loadStudents();
 
-    document.getElementById('btn-filter').addEventListener('click', loadStudents);
+    document.getElementById('btn-filter').addEventListener('click', () => loadStudents());
+    document.getElementById('filter-sort').addEventListener('change', () => loadStudents());
+    document.getElementById('btn-more').addEventListener('click', function() {
+        loadStudents(this.dataset.cursor);
+    });
 
     // Enter key on search box triggers filter
     document.getElementById('filter-search').addEventListener('keyup', function(e) {
@@ -11,20 +15,34 @@ document.addEventListener("DOMContentLoaded", function() {
     });
 });
 
-function loadStudents() {
-    const q = document.getElementById('filter-search').value;
-    const course = document.getElementById('filter-course').value;
-    const fee = document.getElementById('filter-fee').value;
+// cursor: next_cursor of the previous page to append it, or nothing to start over
+function loadStudents(cursor) {
+    const params = new URLSearchParams({
+        q: document.getElementById('filter-search').value,
+        course_id: document.getElementById('filter-course').value,
+        fee_status: document.getElementById('filter-fee').value,
+        sort: document.getElementById('filter-sort').value,
+    });
+    if (cursor) params.set('cursor', cursor);
 
     const tbody = document.getElementById('students-body');
-    tbody.innerHTML = '<tr><td colspan="6" class="text-center py-5 text-muted"><div class="spinner-border spinner-border-sm"></div> Loading...</td></tr>';
+    const moreBtn = document.getElementById('btn-more');
+    if (!cursor) {
+        tbody.innerHTML = '<tr><td colspan="6" class="text-center py-5 text-muted"><div class="spinner-border spinner-border-sm"></div> Loading...</td></tr>';
+    }
+    moreBtn.disabled = true;
 
-    fetch(`/admin/api/students?q=${q}&course_id=${course}&fee_status=${fee}`)
+    fetch(`/admin/api/students?${params}`)
         .then(r => r.json())
         .then(res => {
             if(res.status === 'success') {
-                tbody.innerHTML = '';
-                if(res.students.length === 0) {
+                if (!cursor) tbody.innerHTML = '';
+                moreBtn.dataset.cursor = res.next_cursor || '';
+                moreBtn.classList.toggle('d-none', !res.next_cursor);
+                moreBtn.disabled = false;
+
+                if(!cursor && res.students.length === 0) {
+                    document.getElementById('students-count').textContent = '';
                     tbody.innerHTML = '<tr><td colspan="6" class="text-center py-5 text-muted">No students found matching filters.</td></tr>';
                     return;
                 }
@@ -54,6 +72,8 @@ function loadStudents() {
                     `;
                     tbody.appendChild(tr);
                 });
+                document.getElementById('students-count').textContent =
+                    `Showing ${tbody.children.length} of ${res.total} student(s)`;
             }
         });
 }
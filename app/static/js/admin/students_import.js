@@ -0,0 +1,74 @@
+// app/static/js/admin/students_import.js
+
+let lastReport = [];
+
+document.addEventListener("DOMContentLoaded", function() {
+    document.getElementById('import-form').addEventListener('submit', runImport);
+    document.getElementById('btn-report').addEventListener('click', downloadReport);
+});
+
+function escapeHtml(value) {
+    const div = document.createElement('div');
+    div.textContent = value == null ? '' : String(value);
+    return div.innerHTML;
+}
+
+function runImport(e) {
+    e.preventDefault();
+    const btn = document.getElementById('btn-import');
+    const formData = new FormData(e.target);
+
+    btn.disabled = true;
+    btn.innerHTML = '<span class="spinner-border spinner-border-sm"></span> Importing...';
+
+    fetch('/admin/api/students/import', { method: 'POST', body: formData })
+        .then(r => r.json())
+        .then(res => {
+            if (res.status !== 'success') {
+                alert(res.message || 'Import failed.');
+                return;
+            }
+            lastReport = res.rows;
+            let summary = `${res.created} created, ${res.failed} failed`;
+            if (res.stopped_at) summary += ` (stopped at row ${res.stopped_at}; import the rest separately)`;
+            document.getElementById('import-summary').textContent = summary;
+
+            const tbody = document.getElementById('import-body');
+            tbody.innerHTML = '';
+            // errors first: they are what needs attention
+            const rows = res.rows.filter(r => r.status === 'error').concat(res.rows.filter(r => r.status !== 'error'));
+            rows.forEach(r => {
+                const badge = r.status === 'created'
+                    ? '<span class="badge bg-success">Created</span>'
+                    : '<span class="badge bg-danger">Error</span>';
+                const tr = document.createElement('tr');
+                tr.innerHTML = `
+                    <td>${r.row}</td>
+                    <td>${escapeHtml(r.email)}</td>
+                    <td>${badge}</td>
+                    <td>${escapeHtml(r.admission_no)}</td>
+                    <td><code>${escapeHtml(r.password)}</code></td>
+                    <td class="text-danger small">${escapeHtml(r.error)}</td>
+                `;
+                tbody.appendChild(tr);
+            });
+            document.getElementById('import-result').classList.remove('d-none');
+        })
+        .catch(() => alert('Import failed.'))
+        .finally(() => {
+            btn.disabled = false;
+            btn.textContent = 'Import';
+        });
+}
+
+function downloadReport() {
+    const columns = ['row', 'email', 'status', 'admission_no', 'password', 'error'];
+    const quote = v => `"${String(v == null ? '' : v).replace(/"/g, '""')}"`;
+    const lines = [columns.join(',')].concat(lastReport.map(r => columns.map(c => quote(r[c])).join(',')));
+    const blob = new Blob([lines.join('\r\n') + '\r\n'], { type: 'text/csv' });
+    const a = document.createElement('a');
+    a.href = URL.createObjectURL(blob);
+    a.download = 'student-import-report.csv';
+    a.click();
+    URL.revokeObjectURL(a.href);
+}
@@ -0,0 +1,48 @@
+// static/js/partials/notice_stream.js
+// Re-dispatches every notice change as a "notices:changed" event on document.
+// With data-stream="1" (only rendered when the server runs async workers, see
+// app/notify.py) it subscribes to /api/notices/stream, and EventSource resumes with
+// Last-Event-ID by itself after a dropped connection. Otherwise it polls /api/notices
+// every data-poll-seconds and compares ETags; unchanged polls are answered with a 304.
+(function () {
+  const script = document.currentScript;
+
+  function changed(type, data) {
+    document.dispatchEvent(new CustomEvent("notices:changed", { detail: { type: type, notice: data } }));
+  }
+
+  if (script.dataset.stream === "1" && window.EventSource) {
+    const source = new EventSource("/api/notices/stream");
+
+    function relay(type) {
+      source.addEventListener(type, function (e) {
+        let data = {};
+        try { data = JSON.parse(e.data || "{}"); } catch (err) { /* keep empty */ }
+        changed(type, data);
+      });
+    }
+
+    relay("notice");
+    relay("notice-deleted");
+    relay("refresh");
+
+    window.addEventListener("beforeunload", function () { source.close(); });
+    return;
+  }
+
+  const seconds = parseInt(script.dataset.pollSeconds || "60", 10);
+  let etag = null;
+
+  function poll() {
+    fetch("/api/notices", { cache: "no-cache" })
+      .then(function (r) {
+        const tag = r.headers.get("ETag");
+        if (etag !== null && tag && tag !== etag) changed("refresh", {});
+        if (tag) etag = tag;
+      })
+      .catch(function () { /* try again next time */ });
+  }
+
+  poll();
+  setInterval(poll, seconds * 1000);
+})();
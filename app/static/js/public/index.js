@@ -40,6 +40,13 @@ if (heroImg) {
 
     loadNotices();
 
+    // Notice changes seen by js/partials/notice_stream.js (polling here); coalesce bursts into one reload
+    let noticeReload = null;
+    document.addEventListener('notices:changed', function() {
+        clearTimeout(noticeReload);
+        noticeReload = setTimeout(loadNotices, 300);
+    });
+
 //    document.getElementById('refresh-notices').addEventListener('click', function() {
 //        // Spin icon effect
 //        const icon = this.querySelector('.refresh-icon');
@@ -205,19 +212,23 @@ document.addEventListener("DOMContentLoaded", () => {
       btn.classList.add("active");
 
       const dept = btn.dataset.dept || "";
-
-      fetch(`/api/programs/filter?department=${dept}`)
-        .then(res => res.json())
-        .then(data => updateGrid(data.courses))
-        .catch(err => console.error(err));
+      loadPage(dept, null);
     });
   });
 
-  function updateGrid(courses) {
-    grid.style.opacity = "0";
+  // Catalog is keyset-paginated: each response carries the cursor for the next page
+  function loadPage(dept, cursor) {
+    let url = `/api/programs/filter?department=${dept}`;
+    if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
 
-    setTimeout(() => {
-      grid.innerHTML = courses.map(c => `
+    fetch(url)
+      .then(res => res.json())
+      .then(data => updateGrid(data.courses, data.next_cursor, dept, !!cursor))
+      .catch(err => console.error(err));
+  }
+
+  function updateGrid(courses, nextCursor, dept, append) {
+    const html = courses.map(c => `
         <div class="col-md-6 col-lg-4 program-item">
           <div class="program-card card h-100">
             <img src="${c.image}" class="card-img-top" alt="">
@@ -230,10 +241,34 @@ document.addEventListener("DOMContentLoaded", () => {
         </div>
       `).join("");
 
+    const more = nextCursor ? `
+        <div class="col-12 text-center programs-more">
+          <button class="btn btn-outline-primary rounded-pill px-4">Load more</button>
+        </div>` : "";
+
+    const oldMore = grid.querySelector(".programs-more");
+    if (oldMore) oldMore.remove();
+
+    if (append) {
+      grid.insertAdjacentHTML("beforeend", html + more);
+      bindMore(nextCursor, dept);
+      return;
+    }
+
+    grid.style.opacity = "0";
+
+    setTimeout(() => {
+      grid.innerHTML = html + more;
+      bindMore(nextCursor, dept);
       grid.style.opacity = "1";
     }, 200);
   }
 
+  function bindMore(nextCursor, dept) {
+    const btn = grid.querySelector(".programs-more button");
+    if (btn) btn.addEventListener("click", () => loadPage(dept, nextCursor));
+  }
+
   function escape(str) {
     return String(str)
       .replace(/&/g,"&amp;")
@@ -0,0 +1,373 @@
+# app/student_import.py
+"""
+Bulk student import from a CSV or XLSX roster.
+
+The file is read and validated one row at a time. Valid rows are collected into
+chunks of IMPORT_CHUNK_SIZE, and each chunk then goes through these steps:
+
+1. Look up which emails and admission numbers already exist, in one query each.
+2. Hash the initial passwords on a shared process pool (IMPORT_HASH_WORKERS),
+   using IMPORT_HASH_METHOD if set; login upgrades those hashes like any other.
+3. Write the User, StudentProfile and Enrollment rows with multi-row INSERTs
+   and commit them as one transaction.
+
+If a chunk hits a constraint that appeared after the lookup, it is retried one
+row at a time, so only the offending rows fail.
+
+Bulk INSERTs skip the ORM events. For that reason each chunk seeds its ledger
+rows and adjusts the ``students`` counter itself. Imported accounts are created
+active; the approval queue is for self-registrations.
+
+Columns (header names, case-insensitive): first_name, last_name, email, phone,
+admission_no, department (code), year, date_of_birth, gender, address, courses
+(course codes separated by ``;``), password. If the password is blank, a random
+one is generated and returned in the report so it can be handed out. A blank
+admission number becomes ``ADM<year><user id>``, with a ``-2``, ``-3``... suffix
+if that number is already taken.
+"""
+import csv
+import io
+import secrets
+import threading
+from datetime import date, datetime
+from functools import partial
+
+from email_validator import EmailNotValidError, validate_email
+from flask import current_app
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from app import counters, ledger
+from app.catalog import get_catalog
+from app.extensions import db
+from app.models import Department, Enrollment, StudentProfile, User, UserRole
+from app.tasks import hash_password, spawn_pool
+
+COLUMNS = ("first_name", "last_name", "email", "phone", "admission_no", "department",
+           "year", "date_of_birth", "gender", "address", "courses", "password")
+REQUIRED = ("first_name", "email")
+MIN_PASSWORD = 6
+
+
+class RosterError(ValueError):
+    """The file as a whole can't be imported (wrong format, empty, missing columns)."""
+
+
+# -------------------------
+# Reading
+# -------------------------
+def _csv_rows(stream):
+    return csv.reader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+
+
+def _xlsx_rows(stream):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RosterError("XLSX import needs the openpyxl package; upload a CSV instead.") from None
+    sheet = load_workbook(stream, read_only=True, data_only=True).active
+    for values in sheet.iter_rows(values_only=True):
+        yield ["" if v is None else v for v in values]
+
+
+def read_rows(stream, filename):
+    """Yield (line number, {column: value}) for each non-empty data row of the upload."""
+    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    if ext == "csv":
+        rows = _csv_rows(stream)
+    elif ext == "xlsx":
+        rows = _xlsx_rows(stream)
+    else:
+        raise RosterError("Upload a .csv or .xlsx file.")
+
+    header = next(rows, None)
+    if not header:
+        raise RosterError("The file is empty.")
+    header = [str(h or "").strip().lower().replace(" ", "_") for h in header]
+    missing = [c for c in REQUIRED if c not in header]
+    if missing:
+        raise RosterError(f"Missing column(s): {', '.join(missing)}.")
+
+    for line, values in enumerate(rows, start=2):
+        row = {h: values[i] for i, h in enumerate(header) if h in COLUMNS and i < len(values)}
+        if any(str(v).strip() for v in row.values()):
+            yield line, row
+
+
+# -------------------------
+# Validation
+# -------------------------
+def _limit(column):
+    return getattr(column.type, "length", None)
+
+
+LIMITS = {
+    "first_name": _limit(User.first_name), "last_name": _limit(User.last_name),
+    "email": _limit(User.email), "phone": _limit(User.phone),
+    "admission_no": _limit(StudentProfile.admission_no), "year": _limit(StudentProfile.year),
+    "gender": _limit(StudentProfile.gender),
+}
+
+
+def _text(row, key):
+    value = row.get(key)
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # spreadsheet numbers (phone, admission no) come back as floats
+    return str(value).strip() if value not in (None, "") else ""
+
+
+def _date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value).strip(), "%Y-%m-%d").date()
+
+
+class Validator:
+    """Checks one row at a time, remembering emails/admission numbers already seen in the file."""
+
+    def __init__(self, departments, catalog):
+        self.departments = departments  # code -> id
+        self.courses = {code.upper(): c.id for code, c in catalog.by_code.items()}
+        self.emails = set()
+        self.admission_nos = set()
+
+    def __call__(self, row):
+        """Return (clean values, None) or (None, error message)."""
+        clean = {key: _text(row, key) for key in COLUMNS if key not in ("date_of_birth", "courses")}
+        for key in REQUIRED:
+            if not clean[key]:
+                return None, f"{key} is required"
+        for key, limit in LIMITS.items():
+            if limit and len(clean[key]) > limit:
+                return None, f"{key} is longer than {limit} characters"
+
+        try:
+            clean["email"] = validate_email(clean["email"], check_deliverability=False).normalized.lower()
+        except EmailNotValidError as e:
+            return None, f"invalid email: {e}"
+        if clean["email"] in self.emails:
+            return None, "email appears earlier in the file"
+        if clean["admission_no"] and clean["admission_no"] in self.admission_nos:
+            return None, "admission_no appears earlier in the file"
+
+        department = clean.pop("department")
+        clean["department_id"] = None
+        if department:
+            clean["department_id"] = self.departments.get(department.upper())
+            if clean["department_id"] is None:
+                return None, f"unknown department {department}"
+
+        clean["date_of_birth"] = None
+        if row.get("date_of_birth") not in (None, ""):
+            try:
+                clean["date_of_birth"] = _date(row["date_of_birth"])
+            except ValueError:
+                return None, "date_of_birth must be YYYY-MM-DD"
+
+        clean["course_ids"] = []
+        for code in filter(None, (c.strip().upper() for c in _text(row, "courses").split(";"))):
+            course_id = self.courses.get(code)
+            if course_id is None:
+                return None, f"unknown course {code}"
+            if course_id not in clean["course_ids"]:
+                clean["course_ids"].append(course_id)
+
+        if clean["password"] and len(clean["password"]) < MIN_PASSWORD:
+            return None, f"password must be at least {MIN_PASSWORD} characters"
+
+        self.emails.add(clean["email"])
+        if clean["admission_no"]:
+            self.admission_nos.add(clean["admission_no"])
+        return clean, None
+
+
+# -------------------------
+# Writing
+# -------------------------
+def _existing(column, values):
+    values = [v for v in values if v]
+    if not values:
+        return set()
+    return set(db.session.execute(select(column).where(column.in_(values))).scalars())
+
+
+def _admission_numbers(rows, user_ids, year):
+    """Given admission numbers, or generated ones that skip numbers already in use."""
+    generated = {r["email"]: f"ADM{year}{user_ids[r['email']]:04d}" for r in rows if not r["admission_no"]}
+    taken = {r["admission_no"] for r in rows if r["admission_no"]}
+    taken |= _existing(StudentProfile.admission_no, list(generated.values()))
+
+    out = []
+    for r in rows:
+        adm = r["admission_no"]
+        if not adm:
+            base = adm = generated[r["email"]]
+            suffix = 1
+            while adm in taken:  # entered by hand earlier, or given to another row of this file
+                suffix += 1
+                adm = f"{base}-{suffix}"
+                taken |= _existing(StudentProfile.admission_no, [adm])
+            taken.add(adm)
+        out.append(adm)
+    return out
+
+
+def _insert(rows, hashes):
+    """Insert one chunk of validated rows in the current transaction. Returns admission numbers."""
+    now = datetime.utcnow()
+    db.session.execute(insert(User), [{
+        "email": r["email"], "password_hash": h, "first_name": r["first_name"],
+        "last_name": r["last_name"] or None, "phone": r["phone"] or None,
+        "is_admin": False, "is_active": True, "role": UserRole.STUDENT, "requested_at": now,
+    } for r, h in zip(rows, hashes)])
+    user_ids = dict(db.session.execute(
+        select(User.email, User.id).where(User.email.in_([r["email"] for r in rows]))).all())
+
+    admission_nos = _admission_numbers(rows, user_ids, now.year)
+    db.session.execute(insert(StudentProfile), [{
+        "user_id": user_ids[r["email"]], "admission_no": adm, "department_id": r["department_id"],
+        "year": r["year"] or "1st Year", "date_of_birth": r["date_of_birth"],
+        "gender": r["gender"] or None, "address": r["address"] or None,
+    } for r, adm in zip(rows, admission_nos)])
+    student_ids = dict(db.session.execute(
+        select(StudentProfile.user_id, StudentProfile.id)
+        .where(StudentProfile.user_id.in_(list(user_ids.values())))).all())
+
+    enrollments = [{"student_id": student_ids[user_ids[r["email"]]], "course_id": cid,
+                    "enrolled_on": now, "status": "active"}
+                   for r in rows for cid in r["course_ids"]]
+    if enrollments:
+        db.session.execute(insert(Enrollment), enrollments)
+
+    connection = db.session.connection()
+    ledger.seed(connection, list(student_ids.values()))
+    counters.adjust(connection, "students", len(rows))
+    return admission_nos
+
+
+class Importer:
+    def __init__(self, pool, hash_method, salt_length, chunk_size):
+        self.hash = partial(hash_password, method=hash_method, salt_length=salt_length)
+        self.pool = pool
+        self.chunk_size = chunk_size
+        self.report = []   # one dict per data row
+        self.created = 0
+        self.failed = 0
+
+    def fail(self, line, email, error):
+        self.failed += 1
+        self.report.append({"row": line, "email": email, "status": "error", "error": error})
+
+    def flush(self, chunk):
+        """chunk: [(line, clean row)]"""
+        if not chunk:
+            return
+        taken_emails = _existing(User.email, [r["email"] for _, r in chunk])
+        taken_adm = _existing(StudentProfile.admission_no, [r["admission_no"] for _, r in chunk])
+        todo = []
+        for line, r in chunk:
+            if r["email"] in taken_emails:
+                self.fail(line, r["email"], "email is already registered")
+            elif r["admission_no"] in taken_adm:
+                self.fail(line, r["email"], "admission_no is already in use")
+            else:
+                todo.append((line, r))
+        db.session.rollback()  # end the read transaction before the slow part
+        if not todo:
+            return
+
+        passwords = [r["password"] or secrets.token_urlsafe(9) for _, r in todo]
+        if self.pool is not None:
+            hashes = list(self.pool.map(self.hash, passwords, chunksize=max(1, len(passwords) // 32)))
+        else:
+            hashes = [self.hash(p) for p in passwords]
+
+        rows = [r for _, r in todo]
+        try:
+            admission_nos = _insert(rows, hashes)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            if len(todo) == 1:
+                self.fail(todo[0][0], rows[0]["email"], "conflicts with an existing account")
+                return
+            # someone registered one of these meanwhile; isolate it
+            for item, password, h in zip(todo, passwords, hashes):
+                self._single(item, password, h)
+            return
+
+        for (line, r), password, adm in zip(todo, passwords, admission_nos):
+            self._created(line, r, password, adm)
+
+    def _single(self, item, password, hashed):
+        line, r = item
+        try:
+            (adm,) = _insert([r], [hashed])
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            self.fail(line, r["email"], "conflicts with an existing account")
+            return
+        self._created(line, r, password, adm)
+
+    def _created(self, line, r, password, admission_no):
+        self.created += 1
+        self.report.append({
+            "row": line, "email": r["email"], "status": "created", "admission_no": admission_no,
+            # only passwords we generated are echoed back; uploaded ones the admin already has
+            "password": "" if r["password"] else password,
+        })
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers):
+    """One hashing pool per worker process, shared by every import; started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = spawn_pool(workers)  # hashes with app.tasks.hash_password, which imports no app code
+        return _pool
+
+
+def import_students(stream, filename):
+    """Import a roster upload. Returns {"created", "failed", "rows": per-row report, "stopped_at"}.
+
+    Raises RosterError if the file can't be read at all.
+    """
+    config = current_app.config
+    chunk_size = config.get("IMPORT_CHUNK_SIZE", 500)
+    max_rows = config.get("IMPORT_MAX_ROWS", 5000)
+    workers = config.get("IMPORT_HASH_WORKERS")
+    hasher = current_app.extensions["passwords"]
+
+    departments = {code.upper(): did for did, code in db.session.execute(select(Department.id, Department.code))}
+    validate = Validator(departments, get_catalog())
+
+    pool = _get_pool(workers) if workers != 0 else None
+    method = config.get("IMPORT_HASH_METHOD") or hasher.method
+    importer = Importer(pool, method, hasher.salt_length, chunk_size)
+    chunk, seen, truncated = [], 0, None
+    for line, row in read_rows(stream, filename):
+        seen += 1
+        if seen > max_rows:
+            truncated = line
+            break
+        clean, error = validate(row)
+        if error:
+            importer.fail(line, _text(row, "email"), error)
+            continue
+        chunk.append((line, clean))
+        if len(chunk) >= chunk_size:
+            importer.flush(chunk)
+            chunk = []
+    importer.flush(chunk)
+
+    importer.report.sort(key=lambda r: r["row"])
+    return {"created": importer.created, "failed": importer.failed, "rows": importer.report,
+            # rows from this line on were not read; upload them as a separate file
+            "stopped_at": truncated}
@@ -0,0 +1,59 @@
+# app/tasks.py
+"""
+Functions that run in the process pools: avatar renditions (app/users/services.py)
+and password hashing for roster imports (app/student_import.py).
+
+The pools use the spawn start method, so every child starts a fresh interpreter
+and imports only what the submitted function needs. Keep this module free of app
+imports (models, extensions, services, ``create_app``): a child should load
+Pillow or Werkzeug, not build a whole application with its flusher threads and
+database engines. For the same reason the entry script must only create the app
+under ``if __name__ == "__main__":`` (see run.py), since spawned children
+re-import it.
+"""
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+from werkzeug.security import generate_password_hash
+
+AVATAR_SIZES = (40, 150, 400)
+AVATAR_DEFAULT_SIZE = 150
+AVATAR_QUALITY = 82
+
+
+def spawn_pool(workers):
+    """A ProcessPoolExecutor whose children are spawned, not forked (forking a threaded server can copy held locks)."""
+    return ProcessPoolExecutor(max_workers=workers or None, mp_context=multiprocessing.get_context("spawn"))
+
+
+def rendition_name(digest, size=AVATAR_DEFAULT_SIZE):
+    return f"{digest}-{size}.webp"
+
+
+def render_avatar(data, folder, digest, sizes=AVATAR_SIZES):
+    """Write square WebP renditions of an uploaded image. Runs in a pool worker."""
+    with Image.open(io.BytesIO(data)) as img:
+        # JPEG can decode at a reduced scale, which is most of the cost for phone photos
+        img.draft("RGB", (max(sizes) * 2, max(sizes) * 2))
+        img = ImageOps.exif_transpose(img)
+        img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+
+    side = min(img.size)
+    left, top = (img.width - side) // 2, (img.height - side) // 2
+    square = img.crop((left, top, left + side, top + side))
+
+    os.makedirs(folder, exist_ok=True)
+    for size in sizes:
+        out = square.resize((size, size), Image.LANCZOS) if size < side else square
+        path = os.path.join(folder, rendition_name(digest, size))
+        tmp = f"{path}.{os.getpid()}.tmp"
+        out.save(tmp, "WEBP", quality=AVATAR_QUALITY, method=4)
+        os.replace(tmp, path)
+    return rendition_name(digest)
+
+
+def hash_password(password, method, salt_length):
+    return generate_password_hash(password, method=method, salt_length=salt_length)
@@ -0,0 +1,181 @@
+# app/throttle.py
+"""
+In-process admission control for the unauthenticated write endpoints.
+
+Each protected endpoint gets a Gate with:
+
+* a token bucket per client IP (burst + sustained rate),
+* one global token bucket for the endpoint,
+* a cap on requests running concurrently in this worker.
+
+A request that fails any check is answered 429 (with Retry-After) before the
+view runs, so a bot flood never reaches the database or the password hasher
+and can't tie up the worker threads the student dashboards need.
+
+Limits come from ADMISSION_LIMITS in config; counters are exposed through
+``metrics()`` (see /admin/api/admission/metrics).
+
+Clients are told apart by ``request.remote_addr``. Behind a reverse proxy that
+is the proxy's address, so PROXY_FIX_HOPS must be set to the number of trusted
+proxies: ``init_app`` then wraps the app in Werkzeug's ``ProxyFix`` and
+remote_addr becomes the forwarded client address. Without it, a request that
+arrives with X-Forwarded-For logs a warning (once per worker).
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request, jsonify, make_response
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "stamp")
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.stamp = now
+
+    def take(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def retry_after(self):
+        return (1 - self.tokens) / self.rate if self.rate else 60
+
+
+class Gate:
+    def __init__(self, name, ip_rate, ip_burst, global_rate, global_burst, concurrency, max_clients=10000):
+        now = time.monotonic()
+        self.name = name
+        self.ip_rate = ip_rate
+        self.ip_burst = ip_burst
+        self.max_clients = max_clients
+        self.global_bucket = TokenBucket(global_rate, global_burst, now)
+        self.concurrency = concurrency
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._clients = OrderedDict()  # ip -> TokenBucket, least recently seen first
+        self._lock = threading.Lock()
+        self.stats = {"admitted": 0, "rejected_ip": 0, "rejected_global": 0,
+                      "rejected_concurrency": 0, "in_flight": 0}
+
+    def admit(self, ip):
+        """Return (admitted, reason, retry_after seconds). Call release() after an admitted request."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.stats["rejected_concurrency"] += 1
+            return False, "concurrency", 1
+
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._clients.get(ip)
+            if bucket is None:
+                bucket = self._clients[ip] = TokenBucket(self.ip_rate, self.ip_burst, now)
+                if len(self._clients) > self.max_clients:
+                    self._clients.popitem(last=False)
+            else:
+                self._clients.move_to_end(ip)
+
+            # per-IP first, so one noisy client can't drain the global budget
+            if not bucket.take(now):
+                self.stats["rejected_ip"] += 1
+                reason, retry = "ip", bucket.retry_after()
+            elif not self.global_bucket.take(now):
+                self.stats["rejected_global"] += 1
+                reason, retry = "global", self.global_bucket.retry_after()
+            else:
+                self.stats["admitted"] += 1
+                self.stats["in_flight"] += 1
+                return True, None, 0
+
+        self._slots.release()
+        return False, reason, retry
+
+    def release(self):
+        with self._lock:
+            self.stats["in_flight"] -= 1
+        self._slots.release()
+
+    def metrics(self):
+        with self._lock:
+            out = dict(self.stats)
+            out["tracked_clients"] = len(self._clients)
+        out["concurrency_limit"] = self.concurrency
+        return out
+
+
+class AdmissionControl:
+    def __init__(self, limits, enabled=True, behind_proxy=False):
+        self.enabled = enabled
+        self.behind_proxy = behind_proxy
+        self.warned = False
+        self.gates = {name: Gate(name, **cfg) for name, cfg in (limits or {}).items()}
+
+    def client(self):
+        """Key for the per-IP buckets."""
+        if not self.behind_proxy and not self.warned and request.headers.get("X-Forwarded-For"):
+            self.warned = True
+            current_app.logger.warning(
+                "Requests carry X-Forwarded-For but PROXY_FIX_HOPS is 0; per-IP admission limits "
+                "see only the proxy's address")
+        return request.remote_addr or "-"
+
+    def metrics(self):
+        return {name: gate.metrics() for name, gate in self.gates.items()}
+
+
+def _reject(reason, retry_after):
+    retry_after = max(1, math.ceil(retry_after))
+    message = "Too many requests. Please try again in a moment."
+    if request.headers.get("X-Requested-With") == "XMLHttpRequest" or request.accept_mimetypes.best == "application/json":
+        resp = jsonify({"status": "error", "message": message, "reason": reason})
+    else:
+        resp = make_response(message)
+    resp.status_code = 429
+    resp.headers["Retry-After"] = str(retry_after)
+    return resp
+
+
+def admission_control(name, methods=("POST",)):
+    """Guard a view with the Gate configured under `name`; other HTTP methods pass straight through."""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            control = current_app.extensions.get("admission")
+            gate = control.gates.get(name) if control and control.enabled else None
+            if gate is None or request.method not in methods:
+                return view(*args, **kwargs)
+
+            admitted, reason, retry_after = gate.admit(control.client())
+            if not admitted:
+                return _reject(reason, retry_after)
+            try:
+                return view(*args, **kwargs)
+            finally:
+                gate.release()
+        return wrapped
+    return decorator
+
+
+def metrics():
+    control = current_app.extensions.get("admission")
+    return control.metrics() if control else {}
+
+
+def init_app(app):
+    hops = app.config.get("PROXY_FIX_HOPS", 0)
+    if hops:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+    app.extensions["admission"] = AdmissionControl(
+        app.config.get("ADMISSION_LIMITS"),
+        enabled=app.config.get("ADMISSION_CONTROL_ENABLED", True),
+        behind_proxy=bool(hops),
+    )
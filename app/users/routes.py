@@ -1,18 +1,20 @@
 # app/users/routes.py
-import os
-import secrets
-from tkinter import Image
-from PIL import Image
-
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, jsonify, abort, Response
 from flask_login import login_required, current_user
 
+from app import exports, ical
 from app.extensions import db
-from app.models import StudentProfile, Enrollment, Exam, ExamResult, Payment, Notice, Course
+from app.catalog import get_catalog
+from app.ledger import ZERO, get_balance
+from app.models import StudentProfile, Enrollment, Notice
 from datetime import date
-from sqlalchemy import func
 
 from app.users.forms import EditProfileForm
+from app.http_cache import is_fresh, not_modified, with_validators
+from app.pagination import parse_limit
+from app.users.services import (
+    available_courses, dashboard_summary, enrolled_courses, exam_records, get_transcript, queue_avatar
+)
 
 users_bp = Blueprint("users", __name__, template_folder="../../templates/users", url_prefix="/student")
 
@@ -32,34 +34,24 @@ def dashboard():
     if not profile:
         return render_template("users/no_profile.html")
 
-    # 1. Stats
-    enrolled_count = len(profile.enrollments)
-
-    # Calculate Fees
-    total_fee = sum(e.course.fee for e in profile.enrollments)
-    total_paid = sum(p.amount for p in profile.payments)
-    balance = float(total_fee) - float(total_paid)
-
-    # 2. Upcoming Exams (Filter exams for enrolled courses where date >= today)
-    enrolled_course_ids = [e.course_id for e in profile.enrollments]
-    upcoming_exams = Exam.query.filter(
-        Exam.course_id.in_(enrolled_course_ids),
-        Exam.exam_date >= date.today()
-    ).order_by(Exam.exam_date).limit(5).all()
+    # 1. Stats and upcoming exams, aggregated in SQL
+    summary = dashboard_summary(profile.id)
+    upcoming_exams = summary["upcoming_exams"]
 
-    # 3. Recent Notices
+    # 2. Recent Notices
     notices = Notice.query.order_by(Notice.posted_on.desc()).limit(3).all()
 
     return render_template(
         "users/dashboard.html",
         profile=profile,
         stats={
-            "courses": enrolled_count,
-            "balance": balance,
+            "courses": summary["courses"],
+            "balance": summary["balance"],
             "upcoming_exams": len(upcoming_exams)
         },
         upcoming_exams=upcoming_exams,
-        notices=notices
+        notices=notices,
+        calendar_url=url_for("users.student_calendar", token=ical.student_token(profile.id), _external=True)
     )
 
 
@@ -69,19 +61,47 @@ def my_courses():
     profile = current_user.student_profile
     if not profile: return redirect(url_for("users.dashboard"))
 
-    # 1. Get IDs of courses user is already enrolled in (or pending)
-    my_course_ids = [e.course_id for e in profile.enrollments]
-
-    # 2. Fetch courses the student is NOT in (for the "Browse" modal)
-    available_courses = Course.query.filter(Course.id.notin_(my_course_ids)).order_by(Course.title).all()
+    # Enrollments and the "Browse" modal come from the catalog snapshot and the
+    # student's cached enrollment bitmap (see app/users/services.py)
+    catalog = get_catalog()
+    available, _next = available_courses(profile.id, catalog=catalog)
 
     return render_template(
         "users/courses.html",
-        enrollments=profile.enrollments,
-        available_courses=available_courses
+        enrollments=enrolled_courses(profile.id, catalog),
+        available_courses=available
     )
 
 
+@users_bp.route("/api/courses/available")
+@login_required
+def api_available_courses():
+    """Page through the courses the student can still apply for (title order)."""
+    profile = get_student_profile()
+    if not profile:
+        return jsonify({"status": "error", "message": "No student profile"}), 404
+
+    try:
+        start = max(0, int(request.args.get("start", 0)))
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid start"}), 400
+    limit = parse_limit(request.args.get("limit"), default=20, maximum=100)
+
+    rows, next_start = available_courses(profile.id, start, limit)
+    return jsonify({
+        "status": "success",
+        "courses": [{
+            "id": c.id,
+            "code": c.code,
+            "title": c.title,
+            "credits": c.credits,
+            "fee": float(c.fee),
+            "department": c.department.name if c.department else None,
+        } for c in rows],
+        "next_start": next_start,
+    })
+
+
 @users_bp.route("/courses/enroll/<int:course_id>", methods=["POST"])
 @login_required
 def enroll_request(course_id):
@@ -112,10 +132,8 @@ def my_exams():
     profile = get_student_profile()
     if not profile: return redirect(url_for("users.dashboard"))
 
-    enrolled_course_ids = [e.course_id for e in profile.enrollments]
-
-    # Fetch all relevant exams
-    all_exams = Exam.query.filter(Exam.course_id.in_(enrolled_course_ids)).order_by(Exam.exam_date.desc()).all()
+    # Exams for enrolled courses with this student's results, in one query
+    records = exam_records(profile.id)
 
     # Separate into Upcoming vs Past/Results
     upcoming = []
@@ -123,17 +141,10 @@ def my_exams():
 
     today = date.today()
 
-    for exam in all_exams:
+    for _enrollment, exam, user_result in records:
         if exam.exam_date and exam.exam_date >= today:
             upcoming.append(exam)
         else:
-            # Check if result exists for this student
-            # We need the enrollment_id for this specific course
-            enrollment = next((e for e in profile.enrollments if e.course_id == exam.course_id), None)
-            user_result = None
-            if enrollment:
-                user_result = ExamResult.query.filter_by(exam_id=exam.id, enrollment_id=enrollment.id).first()
-
             results.append({
                 "exam": exam,
                 "score": user_result.marks_obtained if user_result else None,
@@ -144,23 +155,89 @@ def my_exams():
     return render_template("users/exams.html", upcoming=upcoming, results=results)
 
 
+@users_bp.route("/api/transcript")
+@login_required
+def api_transcript():
+    """All exams, marks, grades and per-course totals for the logged-in student."""
+    profile = get_student_profile()
+    if not profile:
+        return jsonify({"status": "error", "message": "No student profile"}), 404
+
+    transcript = get_transcript(profile.id)
+    return jsonify({
+        "status": "success",
+        "student": {
+            "id": profile.id,
+            "admission_no": profile.admission_no,
+            "name": current_user.full_name(),
+        },
+        **transcript,
+    })
+
+
+@users_bp.route("/exports/<kind>.<fmt>")
+@login_required
+def export_statement(kind, fmt):
+    """Download the student's own fee statement or transcript as CSV or printable HTML."""
+    profile = get_student_profile()
+    if not profile: return redirect(url_for("users.dashboard"))
+    if kind not in exports.KINDS or fmt not in exports.FORMATS:
+        abort(404)
+
+    return exports.respond(kind, fmt, StudentProfile.id == profile.id,
+                           filename=f"{kind}-{profile.admission_no}",
+                           subtitle=f"{current_user.full_name()} ({profile.admission_no})")
+
+
+def _ics_response(feed, private=False):
+    etag, body = feed
+    max_age = current_app.config.get("ICAL_MAX_AGE", 300)
+    if is_fresh(etag):
+        resp = not_modified(etag, max_age=max_age)
+    else:
+        resp = with_validators(Response(body, mimetype="text/calendar"), etag, max_age=max_age)
+    if private:
+        resp.cache_control.public = False
+        resp.cache_control.private = True
+    return resp
+
+
+@users_bp.route("/calendar/courses/<int:course_id>.ics")
+def course_calendar(course_id):
+    """Exam dates for one course as a subscribable iCalendar feed."""
+    feed = ical.course_feed(course_id)
+    if feed is None:
+        abort(404)
+    return _ics_response(feed)
+
+
+@users_bp.route("/calendar/<token>.ics")
+def student_calendar(token):
+    """A student's exam dates; addressed by a signed token because calendar apps can't log in."""
+    student_id = ical.student_from_token(token)
+    if student_id is None:
+        abort(404)
+    return _ics_response(ical.student_feed(student_id), private=True)
+
+
 @users_bp.route("/fees")
 @login_required
 def my_fees():
     profile = get_student_profile()
     if not profile: return redirect(url_for("users.dashboard"))
 
-    # Calculation
-    total_fee = sum(e.course.fee for e in profile.enrollments)
-    total_paid = sum(p.amount for p in profile.payments)
+    # Totals from the fee ledger (see app/ledger.py)
+    ledger = get_balance(profile.id)
+    total_fee = ledger.total_fee
+    total_paid = ledger.total_paid
 
     # Logic to handle overpayment
-    raw_balance = float(total_fee) - float(total_paid)
+    raw_balance = ledger.balance
     if raw_balance > 0:
         balance_due = raw_balance
-        credit = 0.0
+        credit = ZERO
     else:
-        balance_due = 0.0
+        balance_due = ZERO
         credit = abs(raw_balance)
 
     # History
@@ -174,30 +251,6 @@ def my_fees():
                            history=history)
 
 
-def save_picture(form_picture):
-    """Save profile picture with a random hex name."""
-    random_hex = secrets.token_hex(8)
-    _, f_ext = os.path.splitext(form_picture.filename)
-    picture_fn = random_hex + f_ext
-
-    # FIX: Point strictly to 'static/images/avatars'
-    folder_path = os.path.join(current_app.root_path, 'static/images/avatars')
-
-    # Create directory if it doesn't exist to prevent errors
-    if not os.path.exists(folder_path):
-        os.makedirs(folder_path)
-
-    picture_path = os.path.join(folder_path, picture_fn)
-
-    # Resize to 150x150 to save space
-    output_size = (150, 150)
-    i = Image.open(form_picture)
-    i.thumbnail(output_size)
-    i.save(picture_path)
-
-    return picture_fn
-
-
 @users_bp.route("/profile", methods=["GET", "POST"])
 @login_required
 def profile():
@@ -209,14 +262,18 @@ def profile():
         current_user.last_name = form.last_name.data
         current_user.phone = form.phone.data
 
-        # 2. Handle Image Upload
+        # 2. Handle Image Upload (resized off-request; see app/users/services.py)
+        avatar_pending = False
         if form.avatar.data:
             try:
-                picture_file = save_picture(form.avatar.data)
-                current_user.avatar = picture_file  # Save filename to DB
-            except Exception as e:
-                flash(f"Error saving image: {str(e)}", "danger")
+                picture_file = queue_avatar(current_user.id, form.avatar.data)
+            except ValueError as e:
+                flash(str(e), "danger")
                 return redirect(url_for('users.profile'))
+            if picture_file:
+                current_user.avatar = picture_file  # Save filename to DB
+            else:
+                avatar_pending = True
 
         # 3. Update Student Profile Data
         if current_user.student_profile:
@@ -226,6 +283,8 @@ def profile():
 
         db.session.commit()
         flash('Your profile has been updated!', 'success')
+        if avatar_pending:
+            flash('Your new picture is being processed and will appear shortly.', 'info')
         return redirect(url_for('users.profile'))
 
     elif request.method == 'GET':
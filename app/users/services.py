@@ -0,0 +1,327 @@
+# app/users/services.py
+"""
+Student-side services that don't belong in the request handlers.
+
+Dashboard
+---------
+``dashboard_summary`` answers the dashboard from the fee ledger (a primary-key
+lookup, see app/ledger.py) and one exam query, whatever the number of
+enrollments and payments.
+
+Enrolled courses
+----------------
+``enrollment_state`` caches, per student, a bitmap of their courses over the
+catalog snapshot's ordinals plus each enrollment's status. The courses page and
+the "available courses" browser are then answered from memory; commits touching
+the student's enrollments drop the entry, ENROLLMENT_CACHE_TTL bounds
+staleness across workers.
+
+Exams and transcripts
+---------------------
+``exam_records`` fetches a student's exams with their results in one joined
+query. ``get_transcript`` builds the per-course transcript from it and caches it
+per student; commits touching that student's results or enrollments (or any
+exam/course) drop the cached copy, and TRANSCRIPT_CACHE_TTL bounds staleness
+when another worker did the write.
+
+Avatars
+-------
+Uploads are decoded and resized on a process pool, off the request thread
+(``app.tasks.render_avatar``; the pool's children import no app code).
+Each upload is stored once per content hash as WebP renditions
+``<digest>-<size>.webp`` for every size in AVATAR_SIZES; ``User.avatar`` is
+pointed at the default size when the job finishes. Re-uploading a picture that
+was already processed (by anyone) skips the pool entirely.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+from datetime import date
+from typing import NamedTuple
+
+from flask import current_app
+from PIL import Image, UnidentifiedImageError
+from sqlalchemy import and_, select
+from sqlalchemy.orm import joinedload
+
+from app.cache import TTLCache, on_commit
+from app.catalog import CourseRow, get_catalog
+from app.extensions import db
+from app.ledger import get_balance
+from app.models import Course, Enrollment, Exam, ExamResult, User
+from app.tasks import AVATAR_SIZES, render_avatar, rendition_name, spawn_pool
+
+log = logging.getLogger(__name__)
+
+UPCOMING_EXAMS = 5
+
+
+# -------------------------
+# Dashboard
+# -------------------------
+def enrolled_course_ids(student_id):
+    return select(Enrollment.course_id).where(Enrollment.student_id == student_id)
+
+
+def dashboard_summary(student_id, today=None):
+    """Return enrolled count, total fee, total paid (Decimal) and the next exams for a student."""
+    ledger = get_balance(student_id)
+
+    upcoming = (
+        Exam.query.options(joinedload(Exam.course))
+        .filter(Exam.course_id.in_(enrolled_course_ids(student_id)),
+                Exam.exam_date >= (today or date.today()))
+        .order_by(Exam.exam_date, Exam.id)
+        .limit(UPCOMING_EXAMS)
+        .all()
+    )
+    return {
+        "courses": ledger.courses,
+        "total_fee": ledger.total_fee,
+        "total_paid": ledger.total_paid,
+        "balance": ledger.balance,
+        "upcoming_exams": upcoming,
+    }
+
+
+# -------------------------
+# Enrolled courses
+# -------------------------
+class EnrollmentState(NamedTuple):
+    catalog_version: int
+    mask: int          # bit i set = enrolled (or pending) in catalog.courses[i]
+    enrollments: tuple  # (course id, status) in enrollment order
+
+
+class EnrolledCourse(NamedTuple):
+    status: str
+    course: CourseRow
+
+
+enrollment_states = TTLCache(maxsize=4096, ttl=60)
+
+
+def _load_enrollment_state(student_id, catalog):
+    rows = tuple(
+        db.session.execute(
+            select(Enrollment.course_id, Enrollment.status)
+            .where(Enrollment.student_id == student_id)
+            .order_by(Enrollment.id)
+        ).tuples()
+    )
+    return EnrollmentState(catalog.version, catalog.mask(cid for cid, _status in rows), rows)
+
+
+def enrollment_state(student_id, catalog=None):
+    catalog = catalog or get_catalog()
+    state = enrollment_states.get(student_id)
+    # ordinals move whenever the catalog changes, so a mask is only valid for its version
+    if state is None or state.catalog_version != catalog.version:
+        state = _load_enrollment_state(student_id, catalog)
+        ttl = current_app.config.get("ENROLLMENT_CACHE_TTL", enrollment_states.ttl)
+        enrollment_states.set(student_id, state, ttl)
+    return state
+
+
+def enrolled_courses(student_id, catalog=None):
+    catalog = catalog or get_catalog()
+    state = enrollment_state(student_id, catalog)
+    return [EnrolledCourse(status, catalog.by_id[cid])
+            for cid, status in state.enrollments if cid in catalog.by_id]
+
+
+def available_courses(student_id, start=0, limit=None, catalog=None):
+    """Catalog courses (title order) the student isn't in. Returns (rows, next start or None)."""
+    catalog = catalog or get_catalog()
+    return catalog.unmasked(enrollment_state(student_id, catalog).mask, start, limit)
+
+
+# -------------------------
+# Exams and transcripts
+# -------------------------
+def exam_records(student_id):
+    """Return [(enrollment, exam, result or None)] for every exam in the student's courses, newest first."""
+    return (
+        db.session.query(Enrollment, Exam, ExamResult)
+        .join(Exam, Exam.course_id == Enrollment.course_id)
+        .outerjoin(ExamResult, and_(ExamResult.exam_id == Exam.id,
+                                    ExamResult.enrollment_id == Enrollment.id))
+        .options(joinedload(Exam.course))
+        .filter(Enrollment.student_id == student_id)
+        .order_by(Exam.exam_date.desc(), Exam.id.desc())
+        .all()
+    )
+
+
+transcripts = TTLCache(maxsize=1024, ttl=120)
+# enrollment id -> student id, so result writes can find the cached transcript;
+# sized for several enrollments per cached transcript and set with the same ttl
+_enrollment_owner = TTLCache(maxsize=transcripts.maxsize * 8, ttl=transcripts.ttl)
+
+
+def _percentage(obtained, total):
+    return round(obtained * 100 / total, 2) if total else None
+
+
+def build_transcript(student_id, ttl=None):
+    enrollments = (
+        Enrollment.query.options(joinedload(Enrollment.course))
+        .filter(Enrollment.student_id == student_id)
+        .all()
+    )
+    courses = {}
+    for e in sorted(enrollments, key=lambda e: (e.course.code, e.id)):
+        _enrollment_owner.set(e.id, student_id, ttl)
+        courses[e.id] = {
+            "course_id": e.course_id,
+            "code": e.course.code,
+            "title": e.course.title,
+            "credits": e.course.credits,
+            "status": e.status,
+            "exams": [],
+            "marks_obtained": 0.0,
+            "marks_total": 0,
+        }
+
+    for enrollment, exam, result in reversed(exam_records(student_id)):
+        course = courses[enrollment.id]
+        marks = result.marks_obtained if result else None
+        course["exams"].append({
+            "exam_id": exam.id,
+            "name": exam.name,
+            "date": exam.exam_date.isoformat() if exam.exam_date else None,
+            "total_marks": exam.total_marks,
+            "marks": marks,
+            "grade": result.grade if result else None,
+            "remarks": result.remarks if result else None,
+        })
+        # totals only cover exams that have been marked
+        if marks is not None:
+            course["marks_obtained"] += marks
+            course["marks_total"] += exam.total_marks or 0
+
+    obtained = total = credits = 0
+    for course in courses.values():
+        course["percentage"] = _percentage(course["marks_obtained"], course["marks_total"])
+        obtained += course["marks_obtained"]
+        total += course["marks_total"]
+        credits += course["credits"] or 0
+
+    return {
+        "courses": list(courses.values()),
+        "totals": {
+            "marks_obtained": obtained,
+            "marks_total": total,
+            "percentage": _percentage(obtained, total),
+            "credits": credits,
+        },
+    }
+
+
+def get_transcript(student_id):
+    ttl = current_app.config.get("TRANSCRIPT_CACHE_TTL", transcripts.ttl)
+    return transcripts.get_or_set(student_id, lambda: build_transcript(student_id, ttl), ttl)
+
+
+@on_commit(ExamResult, key=lambda r: r.enrollment_id)
+def _results_changed(enrollment_ids):
+    for enrollment_id in enrollment_ids:
+        student_id = _enrollment_owner.get(enrollment_id)
+        if student_id is not None:
+            transcripts.pop(student_id)
+
+
+@on_commit(Enrollment, key=lambda e: e.student_id)
+def _enrollments_changed(student_ids):
+    for student_id in student_ids:
+        transcripts.pop(student_id)
+        enrollment_states.pop(student_id)
+
+
+@on_commit(Exam, Course)
+def _exams_changed(keys):
+    transcripts.clear()
+
+
+# -------------------------
+# Avatar renditions
+# -------------------------
+def avatar_folder(app=None):
+    return os.path.join((app or current_app).root_path, "static", "images", "avatars")
+
+
+_pool = None
+_jobs = {}    # digest -> in-flight future, so identical uploads are processed once
+_latest = {}  # user id -> digest of their most recent upload
+_lock = threading.Lock()
+
+
+def _get_pool(workers):
+    """The shared pool, started on first use; the caller holds _lock."""
+    global _pool
+    if _pool is None:
+        _pool = spawn_pool(workers)  # renders with app.tasks.render_avatar, which imports no app code
+    return _pool
+
+
+def queue_avatar(user_id, upload):
+    """
+    Start processing an uploaded avatar for `user_id`.
+
+    Returns the new avatar filename when it is already available (duplicate
+    upload, or AVATAR_WORKERS = 0 which processes inline); otherwise returns None
+    and the user's avatar is updated when the pool finishes.
+    Raises ValueError if the upload isn't a readable image.
+    """
+    data = upload.read()
+    try:
+        with Image.open(io.BytesIO(data)) as img:  # header only; decoding happens in the pool
+            img.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError) as e:
+        raise ValueError("The uploaded file is not a valid image.") from e
+
+    app = current_app._get_current_object()
+    folder = avatar_folder(app)
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    if all(os.path.exists(os.path.join(folder, rendition_name(digest, s))) for s in AVATAR_SIZES):
+        return rendition_name(digest)
+
+    workers = app.config.get("AVATAR_WORKERS", 2)
+    if not workers:
+        return render_avatar(data, folder, digest)
+
+    with _lock:
+        _latest[user_id] = digest
+        future = _jobs.get(digest)
+        if future is None:
+            future = _jobs[digest] = _get_pool(workers).submit(render_avatar, data, folder, digest)
+    future.add_done_callback(lambda f: _avatar_done(app, user_id, digest, f))
+    return None
+
+
+def _avatar_done(app, user_id, digest, future):
+    with _lock:
+        _jobs.pop(digest, None)
+        # a newer upload from the same user supersedes this one
+        if _latest.get(user_id) != digest:
+            return
+        del _latest[user_id]
+
+    error = future.exception()
+    if error is not None:
+        log.error("Avatar processing failed for user %s", user_id, exc_info=error)
+        return
+
+    with app.app_context():
+        try:
+            user = db.session.get(User, user_id)
+            if user is not None:
+                user.avatar = future.result()
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
+            log.exception("Could not update avatar for user %s", user_id)
+        finally:
+            db.session.remove()
@@ -40,3 +40,131 @@ class Config:
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # -------------------------
+    # Site counters
+    # -------------------------
+    # How often each worker recounts the materialized counters (0 disables the timer;
+    # `flask counters reconcile` can then be run from cron instead).
+    COUNTERS_RECONCILE_SECONDS = int(env("COUNTERS_RECONCILE_SECONDS", "900"))
+
+    # -------------------------
+    # Public homepage
+    # -------------------------
+    # Upper bound (seconds) on how long a cached homepage section can lag a write made by another worker
+    HOME_FRAGMENT_TTL = int(env("HOME_FRAGMENT_TTL", "300"))
+
+    # -------------------------
+    # Catalog snapshot
+    # -------------------------
+    # How often a worker checks whether another worker changed departments/courses
+    CATALOG_CHECK_SECONDS = int(env("CATALOG_CHECK_SECONDS", "30"))
+
+    # -------------------------
+    # Write-behind ingestion (/apply, /contact)
+    # -------------------------
+    INGEST_SPOOL_PATH = env("INGEST_SPOOL_PATH")  # default: <instance>/ingest_spool.db
+    INGEST_BATCH_SIZE = int(env("INGEST_BATCH_SIZE", "50"))
+    INGEST_FLUSH_SECONDS = float(env("INGEST_FLUSH_SECONDS", "1.0"))
+    INGEST_CLAIM_TIMEOUT = float(env("INGEST_CLAIM_TIMEOUT", "60"))
+    INGEST_MAX_BACKOFF = float(env("INGEST_MAX_BACKOFF", "60"))  # cap on the retry delay while the DB is down
+
+    # -------------------------
+    # Admission control (unauthenticated POSTs)
+    # -------------------------
+    # Rates are tokens per second; bursts are bucket sizes. Concurrency is per worker.
+    # Per-IP buckets key on request.remote_addr: behind a reverse proxy set PROXY_FIX_HOPS
+    # to the number of proxies in front of the app, or every client shares one bucket.
+    PROXY_FIX_HOPS = int(env("PROXY_FIX_HOPS", "0"))
+    ADMISSION_CONTROL_ENABLED = env("ADMISSION_CONTROL_ENABLED", "1") == "1"
+    ADMISSION_LIMITS = {
+        "public.apply": {"ip_rate": 1 / 60, "ip_burst": 5, "global_rate": 20, "global_burst": 100, "concurrency": 16},
+        "public.contact": {"ip_rate": 1 / 60, "ip_burst": 5, "global_rate": 20, "global_burst": 100, "concurrency": 16},
+        "auth.register": {"ip_rate": 1 / 120, "ip_burst": 3, "global_rate": 5, "global_burst": 30, "concurrency": 4},
+    }
+
+    # -------------------------
+    # Password hashing
+    # -------------------------
+    # Werkzeug method string; hashes made with other parameters are upgraded at next login
+    PASSWORD_HASH_METHOD = env("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_SALT_LENGTH = int(env("PASSWORD_SALT_LENGTH", "16"))
+    PASSWORD_HASH_WORKERS = int(env("PASSWORD_HASH_WORKERS", "2"))   # per worker process; 0 hashes inline
+    PASSWORD_HASH_QUEUE = int(env("PASSWORD_HASH_QUEUE", "32"))      # waiting beyond this answers 503
+    PASSWORD_HASH_TIMEOUT = float(env("PASSWORD_HASH_TIMEOUT", "5"))
+
+    # -------------------------
+    # Bulk student import
+    # -------------------------
+    IMPORT_CHUNK_SIZE = int(env("IMPORT_CHUNK_SIZE", "500"))    # rows per transaction
+    IMPORT_MAX_ROWS = int(env("IMPORT_MAX_ROWS", "5000"))       # per uploaded file
+    # processes hashing initial passwords; unset = one per CPU, 0 hashes inline
+    IMPORT_HASH_WORKERS = int(env("IMPORT_HASH_WORKERS")) if env("IMPORT_HASH_WORKERS") else None
+    # Hash method for initial passwords; unset = PASSWORD_HASH_METHOD. A cheaper one speeds up
+    # large intakes and is upgraded at each student's first login (see PASSWORD_HASH_METHOD).
+    IMPORT_HASH_METHOD = env("IMPORT_HASH_METHOD")
+
+    # -------------------------
+    # Admin dashboard
+    # -------------------------
+    # Counter snapshot lifetime; local writes to the counted tables invalidate immediately
+    ADMIN_STATS_CACHE_TTL = int(env("ADMIN_STATS_CACHE_TTL", "15"))
+
+    # -------------------------
+    # Search indexes
+    # -------------------------
+    # How often a worker checks whether another worker changed the indexed rows
+    SEARCH_CHECK_SECONDS = int(env("SEARCH_CHECK_SECONDS", "30"))
+    # Admin search indexes are also rebuilt in the background this often (0 = never)
+    SEARCH_REBUILD_SECONDS = int(env("SEARCH_REBUILD_SECONDS", "900"))
+
+    # -------------------------
+    # Static assets
+    # -------------------------
+    # Serve fingerprinted files from app/static/dist (run `flask assets build`).
+    # Unset: on unless DEBUG.
+    ASSETS_USE_MANIFEST = {"1": True, "0": False}.get(env("ASSETS_USE_MANIFEST", ""))
+
+    # -------------------------
+    # Logged-in identity cache
+    # -------------------------
+    # How long a user/profile snapshot is reused across requests; local writes invalidate immediately
+    IDENTITY_CACHE_TTL = int(env("IDENTITY_CACHE_TTL", "30"))
+
+    # -------------------------
+    # Notice push channel (server-sent events)
+    # -------------------------
+    # Each open stream holds a request thread on sync/threaded workers, so streaming
+    # stays off unless the app runs under gevent/eventlet; pages poll /api/notices instead.
+    NOTIFY_STREAM_ENABLED = env("NOTIFY_STREAM_ENABLED", "0") == "1"
+    NOTIFY_HISTORY = int(env("NOTIFY_HISTORY", "256"))              # events kept for Last-Event-ID replay
+    NOTIFY_MAX_SUBSCRIBERS = int(env("NOTIFY_MAX_SUBSCRIBERS", "8"))  # open streams per worker; keep well below its thread count
+    NOTIFY_POLL_SECONDS = int(env("NOTIFY_POLL_SECONDS", "5"))      # how often to look for other workers' changes
+    NOTIFY_HEARTBEAT_SECONDS = int(env("NOTIFY_HEARTBEAT_SECONDS", "15"))
+    NOTIFY_STREAM_SECONDS = int(env("NOTIFY_STREAM_SECONDS", "600"))  # clients reconnect after this
+
+    # -------------------------
+    # Student enrollment cache
+    # -------------------------
+    # Per-student enrollment bitmap lifetime; local enrollment writes invalidate immediately
+    ENROLLMENT_CACHE_TTL = int(env("ENROLLMENT_CACHE_TTL", "60"))
+
+    # -------------------------
+    # Student transcripts
+    # -------------------------
+    # Per-student cache lifetime; local result writes invalidate immediately
+    TRANSCRIPT_CACHE_TTL = int(env("TRANSCRIPT_CACHE_TTL", "120"))
+
+    # -------------------------
+    # Exam calendar feeds (.ics)
+    # -------------------------
+    # Rendered-feed lifetime (local exam writes invalidate immediately) and the client max-age
+    ICAL_CACHE_TTL = int(env("ICAL_CACHE_TTL", "3600"))
+    ICAL_MAX_AGE = int(env("ICAL_MAX_AGE", "300"))
+    # Domain part of event UIDs; falls back to SERVER_NAME, never the request's Host header
+    ICAL_UID_DOMAIN = env("ICAL_UID_DOMAIN", "")
+
+    # -------------------------
+    # Avatar processing
+    # -------------------------
+    # Size of the process pool that resizes uploads; 0 processes inline (tests, tiny installs)
+    AVATAR_WORKERS = int(env("AVATAR_WORKERS", "2"))
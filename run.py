@@ -1,6 +1,7 @@
 from app import create_app
 
-app = create_app()
-
+# Only build the app when run as a script: the spawn-based process pools
+# (app/tasks.py) re-import this module in every child they start.
 if __name__ == "__main__":
+    app = create_app()
     app.run(debug=True)
@@ -0,0 +1,77 @@
+# tests/test_ingest.py
+import time
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app import create_app
+from app.extensions import db
+from config import Config
+
+INTERVAL = 0.2
+
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'app.db'}"
+        INGEST_SPOOL_PATH = str(tmp_path / "spool.db")
+        INGEST_BATCH_SIZE = 5
+        INGEST_FLUSH_SECONDS = INTERVAL
+        INGEST_MAX_BACKOFF = 10 * INTERVAL
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+@pytest.fixture
+def db_down(monkeypatch):
+    """Make every commit fail as if the database were unreachable; returns the list of attempts."""
+    attempts = []
+
+    def commit():
+        attempts.append(time.monotonic())
+        raise OperationalError("INSERT", {}, Exception("server has gone away"))
+
+    monkeypatch.setattr(db.session, "commit", commit)
+    return attempts
+
+
+def _spool_batch(pipeline):
+    for i in range(pipeline.batch_size):
+        pipeline.spool.append("contact", {"name": f"N{i}", "email": f"n{i}@x.com", "message": "hi"})
+
+
+def test_failed_flush_hands_the_batch_back(app, db_down):
+    pipeline = app.extensions["ingest"]
+    _spool_batch(pipeline)
+
+    assert pipeline.flush() == 0
+    assert len(db_down) == 1
+    assert pipeline.failures == 1
+    assert pipeline.spool.depth()[0] == pipeline.batch_size
+
+
+def test_flusher_backs_off_while_the_database_is_down(app, db_down):
+    pipeline = app.extensions["ingest"]
+    _spool_batch(pipeline)
+    pipeline.start()
+    time.sleep(6 * INTERVAL)
+
+    # first attempt right away, then INTERVAL, 2*INTERVAL, ... apart: never a tight loop
+    assert 1 <= len(db_down) <= 6
+    gaps = [b - a for a, b in zip(db_down, db_down[1:])]
+    assert all(gap >= INTERVAL * 0.9 for gap in gaps)
+
+
+def test_backoff_is_exponential_and_capped(app):
+    pipeline = app.extensions["ingest"]
+    delays = []
+    for failures in range(1, 8):
+        pipeline.failures = failures
+        delays.append(pipeline.backoff())
+    assert delays[:3] == [INTERVAL, 2 * INTERVAL, 4 * INTERVAL]
+    assert max(delays) == pipeline.max_backoff